@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from dataclasses import replace
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable
+
+# The local site is a test fixture; the benchmark runs from a repo checkout.
+from tests.fixture_site import FIXTURE_PASSWORD, FIXTURE_USER, FixtureSite
+
+from .rpa.config import Config, load_config
+from .transform_bench import _report_rows, _write_xlsx
+
+if TYPE_CHECKING:
+    from playwright.sync_api import Browser, Playwright
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m bot.browser_bench",
+        description="Mide el flujo del navegador del bot contra un portal local (http.server) con latencia simulada.",
+    )
+    parser.add_argument(
+        "suite",
+        nargs="?",
+        choices=sorted(SUITES),
+        default="session",
+        help=(
+            "session: login completo vs sesion reutilizada; lean: peticiones, KB y carga de la pagina "
+            "de reportes con y sin BROWSER_LEAN; core: cargue de las dos secciones del core en cada "
+            "CORE_UPLOAD_MODE (por defecto session)"
+        ),
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="Ejecuciones por variante (por defecto 5)")
+    parser.add_argument("--latency-ms", type=int, default=50, help="Latencia por peticion del sitio local (por defecto 50)")
+    parser.add_argument("--login-ms", type=int, default=800, help="Tiempo del servidor para validar un login (por defecto 800)")
+    parser.add_argument("--bandwidth-kbs", type=int, default=0, help="Ancho de banda por respuesta en KB/s; 0 sin limite (por defecto 0)")
+    parser.add_argument("--images", type=int, default=12, help="Imagenes en el inicio y en reportes (por defecto 12)")
+    parser.add_argument("--asset-kb", type=int, default=150, help="Tamano de cada imagen, fuente y script de analitica (por defecto 150)")
+    parser.add_argument("--process-ms", type=int, default=1500, help="Tiempo del core para procesar un archivo (por defecto 1500)")
+    parser.add_argument("--post-ms", type=int, default=1000, help="Tiempo del core para contabilizar una seccion (por defecto 1000)")
+    parser.add_argument("--report-rows", type=int, default=2000, help="Filas del reporte descargado (por defecto 2000)")
+    parser.add_argument(
+        "--workdir",
+        type=Path,
+        default=Path(tempfile.gettempdir()) / "rpa_browser_bench",
+        help="Carpeta para sesiones, descargas y el reporte generado",
+    )
+    return parser.parse_args()
+
+
+def _bench_config(site: FixtureSite, workdir: Path) -> Config:
+    # Variables set here win over a developer's .env (load_dotenv does not override).
+    os.environ.update(
+        {
+            "PORTAL_URL": f"{site.url}/portal/reportes",
+            "PORTAL_LOGIN_URL": f"{site.url}/portal/login",
+            "PORTAL_NEEDS_LOGIN": "true",
+            "PORTAL_USERNAME": FIXTURE_USER,
+            "PORTAL_PASSWORD": FIXTURE_PASSWORD,
+            "PORTAL_REPORT_TYPE_TEXT": "Desembolsos",
+            "PORTAL_API_MODE": "false",
+            "PORTAL_REPORT_JOBS_JSON": "",
+            "SESSION_REUSE": "false",
+            # The fixture cookies are throwaway; DPAPI only exists on Windows.
+            "SESSION_PLAINTEXT": "false" if os.name == "nt" else "true",
+            "SESSION_DIR": str(workdir / "sessions"),
+            "BROWSER_LEAN": "false",
+            "HEADLESS": "true",
+            "EVIDENCE_LEVEL": "off",
+            "CORE_LOGIN_URL": f"{site.url}/core/login",
+            "CORE_USERNAME": FIXTURE_USER,
+            "CORE_PASSWORD": FIXTURE_PASSWORD,
+            "CORE_SECTION1_URL": f"{site.url}/core/seccion1",
+            "CORE_SECTION2_URL": f"{site.url}/core/seccion2",
+            "CORE_SECTION1_FIELDS_JSON": '{"company": "001", "period": "202501"}',
+            "CORE_SECTION2_FIELDS_JSON": '{"company": "001", "period": "202501"}',
+            "CORE_UPLOAD_MODE": "sequential",
+            "DRY_RUN": "false",
+            "ENABLE_ORACLE": "false",
+            "ENABLE_LINIX": "false",
+        }
+    )
+    return load_config(workdir / "run")
+
+
+def _timed(func: Callable[[], object]) -> float:
+    started = time.perf_counter()
+    func()
+    return time.perf_counter() - started
+
+
+def _bench_session(playwright: Playwright, config: Config, site: FixtureSite, repeat: int) -> None:
+    from .main import _download_in_context
+    from .rpa.browser import launch_browser
+    from .rpa.download import PORTAL_SESSION
+    from .rpa.sessions import clear_session_state
+
+    browser = launch_browser(playwright, config)
+    try:
+        print(f"  {'':<15} {'1a descarga':>11} {'siguientes':>11} {'logins':>7}")
+        for label, reuse in (("login siempre", False), ("sesion reusada", True)):
+            run_config = replace(config, session_reuse=reuse)
+            clear_session_state(run_config, PORTAL_SESSION)
+            site.reset_counters()
+            timings = [
+                _timed(lambda: _download_in_context(browser, run_config, run_config.run_context))
+                for _ in range(repeat + 1)
+            ]
+            print(f"  {label:<15} {timings[0]:10.2f}s {statistics.median(timings[1:]):10.2f}s {site.logins:>7}")
+
+        # A session the portal no longer accepts must fall back to a full login.
+        site.expire_sessions()
+        site.reset_counters()
+        _download_in_context(browser, run_config, run_config.run_context)
+        print(f"  sesion vencida en el portal: {'login completo' if site.logins == 1 else 'SIN login'}")
+    finally:
+        browser.close()
+
+
+def _reports_page_load(browser: Browser, config: Config, site: FixtureSite) -> tuple[int, float, float, float]:
+    from .rpa.browser import _PAGE_METRICS_JS, apply_lean_routes
+    from .rpa.download import PORTAL_SESSION
+    from .rpa.sessions import new_browser_context
+
+    context = new_browser_context(browser, config, PORTAL_SESSION)
+    apply_lean_routes(context, config)
+    try:
+        page = context.new_page()
+        site.reset_counters()
+        page.goto(config.portal_url, wait_until="load")
+        metrics = page.evaluate(_PAGE_METRICS_JS)
+        page.wait_for_load_state("networkidle")
+        return site.requests, site.bytes_sent / 1024, metrics["domReadyMs"], metrics["loadMs"]
+    finally:
+        context.close()
+
+
+def _bench_lean(playwright: Playwright, config: Config, site: FixtureSite, repeat: int) -> None:
+    from .main import _download_in_context
+    from .rpa.browser import launch_browser
+
+    # The analytics script comes from "localhost"; lean mode blocks that host as
+    # it blocks the BROWSER_BLOCK_DOMAINS of the real portal.
+    base = replace(config, session_reuse=True, browser_block_domains=[*config.browser_block_domains, "localhost"])
+    print(f"  {'':<8} {'peticiones':>10} {'KB':>9} {'DOM listo':>10} {'carga':>9} {'descarga':>9}")
+    for label, lean in (("normal", False), ("liviano", True)):
+        run_config = replace(base, browser_lean=lean)
+        browser = launch_browser(playwright, run_config)
+        try:
+            # Logs in once; the measured runs reuse the saved session.
+            _download_in_context(browser, run_config, run_config.run_context)
+            runs = [
+                (
+                    *_reports_page_load(browser, run_config, site),
+                    _timed(lambda: _download_in_context(browser, run_config, run_config.run_context)),
+                )
+                for _ in range(repeat)
+            ]
+        finally:
+            browser.close()
+        requests, kb, dom_ms, load_ms, download_s = (statistics.median(column) for column in zip(*runs))
+        print(f"  {label:<8} {requests:>10.0f} {kb:>9.0f} {dom_ms:>8.0f}ms {load_ms:>7.0f}ms {download_s:>8.2f}s")
+
+
+def _core_upload(browser: Browser, config: Config, file_path: Path) -> None:
+    from .rpa.core_upload import CORE_SESSION, upload_to_core
+    from .rpa.sessions import new_browser_context
+
+    context = new_browser_context(browser, config, CORE_SESSION)
+    try:
+        page = context.new_page()
+        page.set_default_timeout(config.timeout_ms)
+        page.set_default_navigation_timeout(config.nav_timeout_ms)
+        upload_to_core(page, config, config.run_context, file_path)
+    finally:
+        context.close()
+
+
+def _bench_core(playwright: Playwright, config: Config, site: FixtureSite, repeat: int) -> None:
+    from .rpa.browser import launch_browser
+
+    file_path = config.run_context.outputs_dir / "cargue_core.csv"
+    file_path.write_text("cedula;valor\n1000001;1500000\n", encoding="utf-8")
+    base = replace(config, session_reuse=True)
+    browser = launch_browser(playwright, base)
+    try:
+        # Logs in once, so every mode is timed on the sections alone.
+        _core_upload(browser, base, file_path)
+        baseline = None
+        print(f"  {'':<11} {'mediana':>8}  {'vs seq':>6}  contabilizadas")
+        for mode in ("sequential", "parallel", "ordered"):
+            run_config = replace(base, core_upload_mode=mode)
+            timings = []
+            for _ in range(repeat):
+                site.reset_counters()
+                timings.append(_timed(lambda: _core_upload(browser, run_config, file_path)))
+            median = statistics.median(timings)
+            baseline = baseline or median
+            print(f"  {mode:<11} {median:7.2f}s  x{baseline / median:<5.1f}  {', '.join(site.posted)}")
+    finally:
+        browser.close()
+
+
+SUITES = {
+    "session": _bench_session,
+    "lean": _bench_lean,
+    "core": _bench_core,
+}
+
+
+def main() -> None:
+    args = _parse_args()
+    from playwright.sync_api import sync_playwright
+
+    from .rpa.logging_utils import configure_evidence
+
+    args.workdir.mkdir(parents=True, exist_ok=True)
+    report_path = args.workdir / f"reporte_{args.report_rows}.xlsx"
+    if not report_path.exists():
+        _write_xlsx(report_path, _report_rows(args.report_rows, 7))
+
+    site = FixtureSite(
+        report_path.read_bytes(),
+        args.latency_ms,
+        args.login_ms,
+        args.bandwidth_kbs,
+        args.images,
+        args.asset_kb,
+        args.process_ms,
+        args.post_ms,
+    )
+    with site:
+        config = _bench_config(site, args.workdir)
+        configure_evidence(config)
+        print(f"Sitio local {site.url}: latencia {args.latency_ms} ms, login {args.login_ms} ms")
+        with sync_playwright() as playwright:
+            SUITES[args.suite](playwright, config, site, max(1, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
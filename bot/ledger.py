@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import argparse
+import os
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+from .rpa.ledger import DEFAULT_LEDGER_PATH, STATUS_PENDING, STATUS_POSTED, Ledger
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m bot.ledger",
+        description="Consulta o reinicia el registro de desembolsos ya contabilizados.",
+    )
+    parser.add_argument("--path", type=Path, help="Archivo SQLite del ledger (por defecto LEDGER_PATH)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("show", help="Resumen por ejecucion y estado")
+
+    find = commands.add_parser("find", help="Registros de una cedula")
+    find.add_argument("cedula")
+
+    reset = commands.add_parser("reset", help="Elimina registros del ledger")
+    reset.add_argument("--run", help="Solo la ejecucion indicada (nombre de runs/<timestamp>)")
+    reset.add_argument("--status", choices=[STATUS_PENDING, STATUS_POSTED])
+    reset.add_argument("--all", action="store_true", help="Confirma el borrado sin filtros")
+    return parser.parse_args()
+
+
+def main() -> None:
+    load_dotenv()
+    args = _parse_args()
+    path = args.path or Path(os.getenv("LEDGER_PATH", "").strip() or DEFAULT_LEDGER_PATH)
+    ledger = Ledger(path)
+    try:
+        if args.command == "show":
+            rows = ledger.summary()
+            if not rows:
+                print(f"Ledger vacio: {path}")
+            for run_id, status, count, updated_at in rows:
+                print(f"{run_id}\t{status}\t{count}\t{updated_at}")
+        elif args.command == "find":
+            for row in ledger.find(args.cedula):
+                print("\t".join(row))
+        elif args.command == "reset":
+            if not (args.run or args.status or args.all):
+                raise SystemExit("Use --run, --status o --all para confirmar el borrado.")
+            deleted = ledger.reset(run_id=args.run, status=args.status)
+            print(f"Registros eliminados: {deleted}")
+    finally:
+        ledger.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,74 +1,729 @@
 ﻿from __future__ import annotations
 
+import argparse
+import logging
+import os
+import queue
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from datetime import date, datetime, timedelta
+from functools import partial
 from pathlib import Path
+from typing import TYPE_CHECKING, Callable
 
-from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
-from playwright.sync_api import sync_playwright
+from .rpa.checkpoint import Checkpoint
+from .rpa.config import (
+    Config,
+    ReportJob,
+    RunContext,
+    child_run_context,
+    load_config,
+    load_profiles,
+    load_transform_config,
+    new_run_context,
+)
+from .rpa.ledger import Ledger
+from .rpa.linix_shards import LinixShards
+from .rpa.logging_utils import (
+    add_log_file,
+    configure_evidence,
+    flush_evidence,
+    log_exception,
+    set_log_profile,
+    setup_logging,
+    setup_profile_logging,
+)
+from .rpa.metrics import reset_metrics, span, write_metrics
+from .rpa.pipeline import run_overlapped
+from .rpa.transform import (
+    EmptyReportError,
+    RecordFilter,
+    TransformError,
+    iter_chunks,
+    linix_output_path,
+    parse_linix_line,
+    read_linix_records,
+    stream_transform,
+    transform_file,
+)
 
-from .rpa.config import load_config
-from .rpa.download import DownloadError, download_portal_file
-from .rpa.logging_utils import log_exception, safe_screenshot, setup_logging
-from .rpa.linix_app import LinixError, run_linix_flow
-from .rpa.oracle_proc import OracleError, build_oracle_files
-from .rpa.transform import TransformError, transform_file
+if TYPE_CHECKING:
+    from playwright.sync_api import Browser
 
+    from .rpa.daemon import DaemonStatus, WarmBrowser
+    from .rpa.oracle_proc import OracleOutputs
 
-def main() -> None:
-    config = load_config()
-    run_ctx = config.run_context
-    logger = setup_logging(run_ctx.run_dir)
-    logger.info("Run started: %s", run_ctx.run_dir)
+# Browser, Oracle and LINIX modules (Playwright, cx_Oracle, pywinauto) are
+# imported only when their stage runs; their errors are looked up among the
+# modules that were actually loaded.
+_STAGE_ERRORS = (
+    (f"{__package__}.rpa.download", "DownloadError"),
+    (f"{__package__}.rpa.oracle_proc", "OracleError"),
+    (f"{__package__}.rpa.linix_app", "LinixError"),
+    ("playwright.sync_api", "TimeoutError"),
+)
+
+# LINIX is a single desktop window: profiles running in parallel take turns.
+_LINIX_LOCK = threading.Lock()
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m bot.main")
+    parser.add_argument(
+        "--resume",
+        type=Path,
+        metavar="RUN_DIR",
+        help="Retoma una ejecucion en runs/<timestamp>, omitiendo las etapas ya completadas",
+    )
+    parser.add_argument(
+        "--from",
+        dest="date_from",
+        type=date.fromisoformat,
+        metavar="YYYY-MM-DD",
+        help="Inicio de un rango a reprocesar (backfill), por bloques de BACKFILL_CHUNK_DAYS dias",
+    )
+    parser.add_argument(
+        "--to",
+        dest="date_to",
+        type=date.fromisoformat,
+        metavar="YYYY-MM-DD",
+        help="Fin del rango a reprocesar (incluido)",
+    )
+    parser.add_argument(
+        "--transform-only",
+        nargs="+",
+        type=Path,
+        metavar="REPORT",
+        help="Solo transforma los reportes indicados (sin navegador, Oracle ni LINIX)",
+    )
+    parser.add_argument(
+        "--profiles",
+        type=Path,
+        metavar="DIR",
+        help="Ejecuta en paralelo un perfil por cada archivo DIR/<nombre>.env (sobre el .env base)",
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Queda en ejecucion y corre el bot segun DAEMON_SCHEDULE, con navegador y Oracle precalentados",
+    )
+    args = parser.parse_args()
+    if args.transform_only and (args.resume or args.date_from):
+        parser.error("--transform-only no se combina con --resume ni con --from/--to")
+    if args.daemon and (args.resume or args.date_from or args.transform_only or args.profiles):
+        parser.error("--daemon no se combina con --resume, --from/--to, --transform-only ni --profiles")
+    if args.profiles and (args.date_from or args.transform_only):
+        parser.error("--profiles no se combina con --from/--to ni con --transform-only")
+    if (args.date_from is None) != (args.date_to is None):
+        parser.error("--from y --to deben usarse juntos")
+    if args.date_from and args.date_to < args.date_from:
+        parser.error("--to no puede ser anterior a --from")
+    return args
 
-    page = None
+
+def _known_errors() -> tuple[type[BaseException], ...]:
+    errors: list[type[BaseException]] = [TransformError]
+    for module_name, error_name in _STAGE_ERRORS:
+        module = sys.modules.get(module_name)
+        if module is not None:
+            errors.append(getattr(module, error_name))
+    return tuple(errors)
+
+
+def _download_in_context(browser: Browser, config: Config, run_ctx: RunContext) -> list[Path]:
+    from .rpa.browser import apply_lean_routes
+    from .rpa.download import PORTAL_SESSION, download_portal_file
+    from .rpa.sessions import new_browser_context
+
+    context = new_browser_context(browser, config, PORTAL_SESSION)
+    apply_lean_routes(context, config)
     try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=config.headless, slow_mo=config.slow_mo_ms)
-            context = browser.new_context(accept_downloads=True)
-            page = context.new_page()
-            page.set_default_timeout(config.timeout_ms)
-            page.set_default_navigation_timeout(config.nav_timeout_ms)
-
-            downloaded_path = download_portal_file(page, config, run_ctx)
-            context.close()
+        page = context.new_page()
+        page.set_default_timeout(config.timeout_ms)
+        page.set_default_navigation_timeout(config.nav_timeout_ms)
+        return [download_portal_file(page, config, run_ctx)]
+    finally:
+        context.close()
+
+
+def _run_download(config: Config, run_ctx: RunContext, browser: Browser | None = None) -> list[Path]:
+    if config.portal_report_jobs:
+        from .rpa.portal_jobs import download_portal_reports
+
+        return download_portal_reports(config, run_ctx, config.portal_report_jobs)
+
+    if config.portal_api_mode:
+        from .rpa.download import format_report_date
+        from .rpa.report_api import ReportApiError, fetch_report_via_api
+
+        try:
+            return [fetch_report_via_api(config, run_ctx, format_report_date(config))]
+        except ReportApiError as exc:
+            logging.getLogger("rpa").warning("API mode failed, falling back to browser: %s", exc)
+
+    if browser is not None:
+        return _download_in_context(browser, config, run_ctx)
+
+    from playwright.sync_api import sync_playwright
+
+    from .rpa.browser import launch_browser
+
+    with sync_playwright() as p:
+        browser = launch_browser(p, config)
+        try:
+            return _download_in_context(browser, config, run_ctx)
+        finally:
             browser.close()
-            page = None
 
-            transform_result = transform_file(
-                downloaded_path,
-                run_ctx.outputs_dir,
-                config.output_encoding,
-                config.periodicidad_default,
-            )
 
+def _run_streaming(
+    downloaded_paths: list[Path],
+    config: Config,
+    run_ctx: RunContext,
+    record_filter: RecordFilter | None,
+) -> tuple[Path, OracleOutputs | None]:
+    chunks = stream_transform(
+        downloaded_paths,
+        run_ctx.outputs_dir,
+        config.output_encoding,
+        config.periodicidad_default,
+        config.transform_chunk_size,
+        config.transform_xlsx_engine,
+        config.transform_columnar,
+        record_filter,
+    )
+    oracle_outputs = None
+    if config.enable_oracle:
+        from .rpa.oracle_proc import build_oracle_files_from_chunks
+
+        oracle_outputs = build_oracle_files_from_chunks(chunks, run_ctx.outputs_dir, config)
+    else:
+        for _ in chunks:
+            pass
+    return linix_output_path(run_ctx.outputs_dir), oracle_outputs
+
+
+def _drop_posted_by_other_runs(ledger: Ledger, config: Config, run_ctx: RunContext, linix_file: Path) -> int:
+    # A resumed run reuses its checkpointed LINIX file; records that another
+    # run posted in the meantime must not be loaded a second time.
+    dropped: set[bytes] = set()
+    kept: list[bytes] = []
+    with linix_file.open("rb") as handle:
+        for line in handle:
+            record = parse_linix_line(line.decode(config.output_encoding))
+            if ledger.posted_by_other_run(record, run_ctx.run_id):
+                dropped.add(line)
+            else:
+                kept.append(line)
+    if dropped:
+        tmp_path = linix_file.with_suffix(".tmp")
+        tmp_path.write_bytes(b"".join(kept))
+        tmp_path.replace(linix_file)
+        LinixShards(run_ctx.run_dir).drop_lines(dropped, linix_file)
+    return len(dropped)
+
+
+def run_pipeline(
+    config: Config,
+    run_ctx: RunContext,
+    checkpoint: Checkpoint,
+    ledger: Ledger | None,
+    download: Callable[[Config, RunContext], list[Path]] = _run_download,
+    allow_empty: bool = False,
+) -> None:
+    # allow_empty: reports without data rows give an empty LINIX file instead
+    # of an error (backfill chunks that only cover weekends or holidays).
+    logger = logging.getLogger("rpa")
+    # Once a stage runs again, every stage after it has stale inputs and runs too.
+    rerun = False
+
+    def completed(stage: str) -> bool:
+        if not rerun and checkpoint.is_complete(stage):
+            logger.info("Stage '%s' already completed; skipping.", stage)
+            return True
+        return False
+
+    record_filter = None
+    if ledger:
+        record_filter = partial(ledger.accept, run_id=run_ctx.run_id)
+
+    if completed("download"):
+        downloaded_paths = list(checkpoint.outputs("download").values())
+    else:
+        with span("stage.download"):
+            downloaded_paths = download(config, run_ctx)
+        checkpoint.mark_complete(
+            "download",
+            {f"report_{index}" if index else "report": path for index, path in enumerate(downloaded_paths)},
+        )
+        rerun = True
+
+    records = None
+    oracle_outputs = None
+    if completed("transform"):
+        linix_file = checkpoint.output("transform", "linix")
+    else:
+        try:
+            with span("stage.transform"):
+                if config.pipeline_overlap:
+                    linix_file, oracle_outputs = run_overlapped(downloaded_paths, config, run_ctx, record_filter)
+                elif config.transform_streaming:
+                    linix_file, oracle_outputs = _run_streaming(downloaded_paths, config, run_ctx, record_filter)
+                else:
+                    transform_result = transform_file(
+                        downloaded_paths,
+                        run_ctx.outputs_dir,
+                        config.output_encoding,
+                        config.periodicidad_default,
+                        config.transform_xlsx_engine,
+                        config.transform_columnar,
+                        record_filter,
+                    )
+                    linix_file = transform_result.linix_file
+                    records = transform_result.records
+        except EmptyReportError:
+            if not allow_empty:
+                raise
+            logger.info("No data rows in the downloaded reports; continuing with 0 records")
+            linix_file = linix_output_path(run_ctx.outputs_dir)
+            linix_file.write_bytes(b"")
+            records = []
             oracle_outputs = None
-            if config.enable_oracle:
-                oracle_outputs = build_oracle_files(
-                    transform_result.records,
-                    run_ctx.outputs_dir,
-                    config,
-                )
+        checkpoint.mark_complete("transform", {"linix": linix_file})
+        rerun = True
+
+    if ledger and rerun:
+        ledger.commit()
+        logger.info(
+            "Ledger: %s new records, %s already posted skipped",
+            ledger.staged,
+            ledger.skipped,
+        )
+    elif ledger and not checkpoint.is_complete("linix"):
+        dropped = _drop_posted_by_other_runs(ledger, config, run_ctx, linix_file)
+        if dropped:
+            logger.warning("Ledger: %s records already posted by another run removed from the LINIX file", dropped)
+            checkpoint.mark_complete("transform", {"linix": linix_file})
+            # The Oracle files must match the records that are left.
+            rerun = True
 
-            if config.enable_linix:
+    if config.enable_oracle:
+        from .rpa.oracle_proc import OracleOutputs, build_oracle_files, build_oracle_files_from_chunks
+
+        if oracle_outputs is None and completed("oracle"):
+            oracle_outputs = OracleOutputs(
+                documentos_file=checkpoint.output("oracle", "documentos"),
+                ahorros_file=checkpoint.output("oracle", "ahorros"),
+            )
+        else:
+            with span("stage.oracle"):
+                if oracle_outputs is None and records is not None:
+                    oracle_outputs = build_oracle_files(records, run_ctx.outputs_dir, config)
+                elif oracle_outputs is None:
+                    # The transform stage was skipped, so records come back from the LINIX file.
+                    oracle_outputs = build_oracle_files_from_chunks(
+                        iter_chunks(
+                            read_linix_records(linix_file, config.output_encoding),
+                            config.oracle_batch_size,
+                        ),
+                        run_ctx.outputs_dir,
+                        config,
+                    )
+            checkpoint.mark_complete(
+                "oracle",
+                {"documentos": oracle_outputs.documentos_file, "ahorros": oracle_outputs.ahorros_file},
+            )
+            rerun = True
+
+    if config.enable_linix and not completed("linix"):
+        if linix_file.stat().st_size == 0:
+            logger.info("No new records to load in LINIX.")
+        else:
+            from .rpa.linix_app import run_linix_flow
+
+            def mark_posted(loaded_file: Path) -> None:
+                # Records count as posted once LINIX ran Contabilizar on their
+                # file (or shard), even if a later step of the flow fails.
+                loaded = read_linix_records(loaded_file, config.output_encoding)
+                posted = ledger.mark_posted(run_ctx.run_id, loaded)
+                logger.info("Ledger: %s records of %s marked as posted", posted, loaded_file.name)
+
+            queued = time.perf_counter()
+            with _LINIX_LOCK, span("stage.linix"):
+                wait_s = time.perf_counter() - queued
+                if wait_s >= 1:
+                    logger.info("Waited %.1fs for LINIX (in use by another profile)", wait_s)
                 run_linix_flow(
                     config=config,
                     run_ctx=run_ctx,
-                    linix_file=transform_result.linix_file,
+                    linix_file=linix_file,
                     documentos_file=oracle_outputs.documentos_file if oracle_outputs else None,
                     ahorros_file=oracle_outputs.ahorros_file if oracle_outputs else None,
+                    on_loaded=mark_posted if ledger and not config.dry_run else None,
                 )
+        checkpoint.mark_complete("linix")
+
+
+def _date_chunks(date_from: date, date_to: date, days: int) -> list[tuple[date, date]]:
+    chunks = []
+    start = date_from
+    while start <= date_to:
+        end = min(start + timedelta(days=days - 1), date_to)
+        chunks.append((start, end))
+        start = end + timedelta(days=1)
+    return chunks
+
+
+def _chunk_jobs(config: Config, start: date, end: date) -> list[ReportJob]:
+    report_types = [job.report_type for job in config.portal_report_jobs] or [config.portal_report_type_text]
+    return [ReportJob(report_type, start, end) for report_type in dict.fromkeys(report_types)]
+
+
+def _download_ahead(
+    chunks: list[tuple[Config, RunContext, list[ReportJob]]],
+    handoff: queue.Queue,
+    stop: threading.Event,
+) -> None:
+    # Runs in its own thread with its own event loop, one chunk ahead of the
+    # transform/Oracle/LINIX work of the main thread.
+    from .rpa.portal_jobs import download_portal_reports
+
+    for chunk_config, chunk_ctx, jobs in chunks:
+        if stop.is_set():
+            return
+        result: list[Path] | Exception | None = None
+        if not Checkpoint(chunk_ctx.run_dir).is_complete("download"):
+            try:
+                result = download_portal_reports(chunk_config, chunk_ctx, jobs)
+            except Exception as exc:
+                result = exc
+        while not stop.is_set():
+            try:
+                handoff.put(result, timeout=1)
+                break
+            except queue.Full:
+                continue
+        if isinstance(result, Exception):
+            return
+
+
+def _count_lines(path: Path | None) -> int:
+    if path is None or not path.exists():
+        return 0
+    with path.open("rb") as handle:
+        return sum(1 for _ in handle)
 
-            logger.info("Run completed OK.")
-    except (DownloadError, TransformError, OracleError, LinixError, PlaywrightTimeoutError) as exc:
-        log_exception(logger, "Run failed: %s", exc)
-        if page:
-            safe_screenshot(page, run_ctx, "error")
-        sys.exit(1)
+
+def run_backfill(
+    config: Config,
+    run_ctx: RunContext,
+    ledger: Ledger | None,
+    date_from: date,
+    date_to: date,
+) -> None:
+    logger = logging.getLogger("rpa")
+    chunks = []
+    for start, end in _date_chunks(date_from, date_to, config.backfill_chunk_days):
+        chunk_ctx = child_run_context(run_ctx, f"chunk_{start:%Y%m%d}_{end:%Y%m%d}")
+        chunks.append((replace(config, run_context=chunk_ctx), chunk_ctx, _chunk_jobs(config, start, end)))
+    logger.info(
+        "Backfill %s to %s: %s chunks of up to %s days",
+        date_from,
+        date_to,
+        len(chunks),
+        config.backfill_chunk_days,
+    )
+
+    handoff: queue.Queue = queue.Queue(maxsize=1)
+    stop = threading.Event()
+    downloader = threading.Thread(
+        target=_download_ahead,
+        args=(chunks, handoff, stop),
+        name="backfill-download",
+        daemon=True,
+    )
+    started = time.perf_counter()
+    total_days = 0
+    total_records = 0
+    downloader.start()
+    try:
+        for chunk_config, chunk_ctx, jobs in chunks:
+            chunk_started = time.perf_counter()
+            downloaded = handoff.get()
+            if isinstance(downloaded, Exception):
+                raise downloaded
+            checkpoint = Checkpoint(chunk_ctx.run_dir)
+            run_pipeline(
+                chunk_config,
+                chunk_ctx,
+                checkpoint,
+                ledger,
+                download=lambda *_: downloaded,
+                allow_empty=True,
+            )
+            days = (jobs[0].end - jobs[0].start).days + 1
+            records = _count_lines(checkpoint.output("transform", "linix"))
+            elapsed = time.perf_counter() - chunk_started
+            total_days += days
+            total_records += records
+            logger.info(
+                "Backfill chunk %s: %s days, %s records, %.1fs (%.1f s/day)",
+                chunk_ctx.run_dir.name,
+                days,
+                records,
+                elapsed,
+                elapsed / days,
+            )
+    finally:
+        stop.set()
+        downloader.join(timeout=5)
+
+    elapsed = time.perf_counter() - started
+    logger.info(
+        "Backfill done: %s days, %s records in %.1fs (%.1f s/day, %.1f records/day)",
+        total_days,
+        total_records,
+        elapsed,
+        elapsed / total_days,
+        total_records / total_days,
+    )
+
+
+def run_transform_only(config: Config, run_ctx: RunContext, report_paths: list[Path]) -> Path:
+    with span("stage.transform"):
+        if config.transform_streaming:
+            linix_file, _ = _run_streaming(report_paths, replace(config, enable_oracle=False), run_ctx, None)
+        else:
+            linix_file = transform_file(
+                report_paths,
+                run_ctx.outputs_dir,
+                config.output_encoding,
+                config.periodicidad_default,
+                config.transform_xlsx_engine,
+                config.transform_columnar,
+            ).linix_file
+    return linix_file
+
+
+def _run_profile(config: Config) -> int:
+    set_log_profile(config.profile)
+    logger = logging.getLogger("rpa")
+    run_ctx = config.run_context
+    ledger = Ledger(config.ledger_path) if config.enable_ledger else None
+    started = time.perf_counter()
+    try:
+        with span("profile", profile=config.profile):
+            run_pipeline(config, run_ctx, Checkpoint(run_ctx.run_dir), ledger)
+        logger.info("Run completed OK.")
+        return 0
+    except Exception as exc:
+        if isinstance(exc, _known_errors()):
+            log_exception(logger, "Run failed: %s", exc)
+            return 1
+        log_exception(logger, "Unexpected error: %s", exc)
+        return 2
+    finally:
+        logger.info("Profile finished in %.1fs", time.perf_counter() - started)
+        if ledger:
+            ledger.close()
+
+
+def run_profiles(configs: list[Config]) -> dict[str, int]:
+    # Profiles share the process (and its concurrency limit) but not their
+    # browser, Oracle connections, run dir or ledger; only LINIX is serialized.
+    logger = logging.getLogger("rpa")
+    workers = min(configs[0].profiles_concurrency, len(configs))
+    logger.info("Running %s profiles, %s at a time", len(configs), workers)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="profile") as executor:
+        codes = dict(zip((config.profile for config in configs), executor.map(_run_profile, configs)))
+    for profile, code in codes.items():
+        logger.info("Profile %s: %s", profile, "ok" if code == 0 else "failed")
+    logger.info("Profiles done in %.1fs", time.perf_counter() - started)
+    return codes
+
+
+def _discard_run_dir(run_ctx: RunContext) -> None:
+    # load_config always creates a run dir; the daemon creates one per run instead.
+    for path in (run_ctx.downloads_dir, run_ctx.outputs_dir, run_ctx.screenshots_dir, run_ctx.run_dir):
+        try:
+            path.rmdir()
+        except OSError:
+            pass
+
+
+def _daemon_logging(daemon_log: logging.Handler, run_dir: Path | None = None) -> logging.Logger:
+    # daemon.log stays attached across runs; each run's bot.log is closed when
+    # the next one (or the idle console-only setup) replaces it.
+    for handler in logging.getLogger("rpa").handlers:
+        if handler is not daemon_log:
+            handler.close()
+    logger = setup_logging(run_dir)
+    logger.addHandler(daemon_log)
+    return logger
+
+
+def _daemon_run(
+    config: Config,
+    warm_browser: WarmBrowser,
+    status: DaemonStatus,
+    daemon_log: logging.Handler,
+) -> None:
+    run_config = replace(config, run_context=new_run_context())
+    run_ctx = run_config.run_context
+    logger = _daemon_logging(daemon_log, run_ctx.run_dir)
+    reset_metrics()
+    configure_evidence(run_config)
+    started = datetime.now()
+    status.update(state="running", current_run=str(run_ctx.run_dir))
+    logger.info("Run started: %s", run_ctx.run_dir)
+
+    ledger = Ledger(config.ledger_path) if config.enable_ledger else None
+    result = "failed"
+    try:
+        with span("daemon.health"):
+            download = _run_download
+            if not config.portal_report_jobs:
+                # Report jobs use the async API with their own browser.
+                download = partial(_run_download, browser=warm_browser.ensure())
+            if config.enable_oracle:
+                from .rpa.oracle_proc import ensure_shared_pool
+
+                ensure_shared_pool(config)
+        run_pipeline(run_config, run_ctx, Checkpoint(run_ctx.run_dir), ledger, download=download)
+        logger.info("Run completed OK.")
+        result = "ok"
+    except Exception as exc:
+        if isinstance(exc, _known_errors()):
+            log_exception(logger, "Run failed: %s", exc)
+        else:
+            log_exception(logger, "Unexpected error: %s", exc)
+            # Start the next run from a fresh browser rather than one in an unknown state.
+            warm_browser.close()
+    finally:
+        flush_evidence()
+        write_metrics(run_ctx.run_dir, config.metrics_trace)
+        if ledger:
+            ledger.close()
+        status.finish_run(
+            run_ctx.run_dir,
+            started,
+            result,
+            current_run=None,
+            browser_launches=warm_browser.launches,
+        )
+
+
+def run_daemon(config: Config) -> None:
+    from .rpa.daemon import DaemonStatus, WarmBrowser, sleep_until
+    from .rpa.schedule import next_run
+
+    if not config.daemon_schedule:
+        raise SystemExit("--daemon requiere DAEMON_SCHEDULE (expresiones cron separadas por ';')")
+    _discard_run_dir(config.run_context)
+    logger = setup_logging(None)
+    daemon_log = add_log_file(config.daemon_status_path.with_name("daemon.log"))
+    status = DaemonStatus(config.daemon_status_path, config.daemon_schedule)
+    warm_browser = WarmBrowser(config)
+    logger.info("Daemon started (pid %s): %s", os.getpid(), "; ".join(e.text for e in config.daemon_schedule))
+
+    try:
+        while True:
+            upcoming = next_run(config.daemon_schedule, datetime.now())
+            status.update(state="waiting", next_run=upcoming.isoformat(timespec="seconds"))
+            logger.info("Next run at %s", upcoming)
+            sleep_until(upcoming)
+            _daemon_run(config, warm_browser, status, daemon_log)
+            logger = _daemon_logging(daemon_log)
+    except KeyboardInterrupt:
+        logger.info("Daemon stopping")
+    finally:
+        warm_browser.close()
+        if config.enable_oracle:
+            from .rpa.oracle_proc import close_shared_pool
+
+            close_shared_pool()
+        status.update(state="stopped", next_run=None)
+        daemon_log.close()
+
+
+def main_profiles(profiles_dir: Path, resume: Path | None) -> None:
+    if not profiles_dir.is_dir():
+        raise SystemExit(f"No existe la carpeta de perfiles: {profiles_dir}")
+    parent, configs = load_profiles(profiles_dir, run_dir=resume)
+    logger = setup_profile_logging(
+        parent.run_dir,
+        {config.profile: config.run_context.run_dir for config in configs},
+    )
+    # Evidence and trace settings are process-wide: the first profile's apply.
+    configure_evidence(configs[0])
+    logger.info(
+        "Run %s: %s (profiles: %s)",
+        "resumed" if resume else "started",
+        parent.run_dir,
+        ", ".join(config.profile for config in configs),
+    )
+    try:
+        codes = run_profiles(configs)
+    finally:
+        flush_evidence()
+        write_metrics(parent.run_dir, configs[0].metrics_trace)
+    failed = [profile for profile, code in codes.items() if code]
+    if failed:
+        logger.error("Run failed: profiles %s", ", ".join(failed))
+        sys.exit(max(codes.values()))
+    logger.info("Run completed OK.")
+
+
+def main() -> None:
+    args = _parse_args()
+    if args.resume and not args.resume.is_dir():
+        raise SystemExit(f"No existe el directorio de ejecucion: {args.resume}")
+    missing = [path for path in args.transform_only or [] if not path.is_file()]
+    if missing:
+        raise SystemExit(f"No existe el reporte: {', '.join(map(str, missing))}")
+
+    if args.profiles:
+        main_profiles(args.profiles, args.resume)
+        return
+
+    if args.transform_only:
+        config = load_transform_config(run_dir=args.resume)
+    else:
+        config = load_config(run_dir=args.resume)
+    if args.daemon:
+        run_daemon(config)
+        return
+
+    run_ctx = config.run_context
+    logger = setup_logging(run_ctx.run_dir)
+    configure_evidence(config)
+    logger.info("Run %s: %s", "resumed" if args.resume else "started", run_ctx.run_dir)
+
+    ledger = Ledger(config.ledger_path) if config.enable_ledger and not args.transform_only else None
+    try:
+        if args.transform_only:
+            linix_file = run_transform_only(config, run_ctx, args.transform_only)
+            logger.info("Transform-only run: %s", linix_file)
+        elif args.date_from:
+            run_backfill(config, run_ctx, ledger, args.date_from, args.date_to)
+        else:
+            run_pipeline(config, run_ctx, Checkpoint(run_ctx.run_dir), ledger)
+        logger.info("Run completed OK.")
     except Exception as exc:
+        if isinstance(exc, _known_errors()):
+            log_exception(logger, "Run failed: %s", exc)
+            sys.exit(1)
         log_exception(logger, "Unexpected error: %s", exc)
-        if page:
-            safe_screenshot(page, run_ctx, "error_unexpected")
         sys.exit(2)
+    finally:
+        flush_evidence()
+        write_metrics(run_ctx.run_dir, config.metrics_trace)
+        if ledger:
+            ledger.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import argparse
+import logging
+from pathlib import Path
+
+from .rpa.run_history import scan_runs, trend_summary, write_report
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m bot.report",
+        description="Resume tiempos y volumenes de las ejecuciones en runs/ (CSV y HTML).",
+    )
+    parser.add_argument("--runs", type=Path, default=Path("runs"), help="Carpeta de ejecuciones (por defecto runs)")
+    parser.add_argument("--out", type=Path, help="Carpeta de salida (por defecto <runs>/report)")
+    parser.add_argument(
+        "--window",
+        type=int,
+        default=10,
+        help="Ejecuciones recientes comparadas con las anteriores (por defecto 10)",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=20.0,
+        help="Aumento porcentual de la mediana que se marca como regresion (por defecto 20)",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = _parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if not args.runs.is_dir():
+        raise SystemExit(f"No existe la carpeta de ejecuciones: {args.runs}")
+    runs = scan_runs(args.runs)
+    trends = trend_summary(runs, max(1, args.window), args.threshold / 100)
+    path = write_report(runs, trends, args.out or args.runs / "report")
+    print(f"Ejecuciones: {len(runs)}")
+    for row in trends:
+        flag = "  <-- regresion" if row["regression"] else ""
+        change = "-" if row["change_pct"] is None else f"{row['change_pct']:+.1f}%"
+        print(f"{row['metric']}\tp50={row['p50']}\tp95={row['p95']}\tcambio={change}{flag}")
+    print(f"Reporte: {path}")
+
+
+if __name__ == "__main__":
+    main()
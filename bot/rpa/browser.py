@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING, Callable
+from urllib.parse import urlsplit
+
+from .config import Config
+
+if TYPE_CHECKING:
+    from playwright.async_api import BrowserContext as AsyncBrowserContext
+    from playwright.async_api import Route as AsyncRoute
+    from playwright.sync_api import Browser, BrowserContext, Page, Playwright, Request, Route
+
+LEAN_CHROMIUM_ARGS = [
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-features=Translate,MediaRouter,OptimizationHints",
+    "--no-first-run",
+    "--mute-audio",
+]
+
+_PAGE_METRICS_JS = """
+() => {
+    const nav = performance.getEntriesByType("navigation")[0];
+    const resources = performance.getEntriesByType("resource");
+    return {
+        domReadyMs: nav ? nav.domContentLoadedEventEnd - nav.startTime : null,
+        loadMs: nav ? nav.loadEventEnd - nav.startTime : null,
+        documentBytes: nav ? nav.transferSize : 0,
+        resourceBytes: resources.reduce((total, entry) => total + (entry.transferSize || 0), 0),
+        resources: resources.length,
+    };
+}
+"""
+
+
+def launch_browser(playwright: Playwright, config: Config) -> Browser:
+    args = LEAN_CHROMIUM_ARGS if config.browser_lean else []
+    return playwright.chromium.launch(headless=config.headless, slow_mo=config.slow_mo_ms, args=args)
+
+
+def _host_blocked(url: str, domains: list[str]) -> bool:
+    host = urlsplit(url).hostname or ""
+    return any(host == domain or host.endswith(f".{domain}") for domain in domains)
+
+
+def _lean_filter(config: Config) -> Callable[[Request], bool]:
+    logger = logging.getLogger("rpa")
+    blocked_types = set(config.browser_block_resource_types)
+    blocked_domains = config.browser_block_domains
+    logger.info(
+        "Lean mode: blocking resource types %s and domains %s",
+        ",".join(sorted(blocked_types)) or "-",
+        ",".join(blocked_domains) or "-",
+    )
+    return lambda request: (
+        request.resource_type in blocked_types or _host_blocked(request.url, blocked_domains)
+    )
+
+
+def apply_lean_routes(context: BrowserContext, config: Config) -> None:
+    if not config.browser_lean:
+        return
+    logger = logging.getLogger("rpa")
+    blocked = _lean_filter(config)
+    counts = {"blocked": 0}
+
+    def handle(route: Route) -> None:
+        if blocked(route.request):
+            counts["blocked"] += 1
+            route.abort()
+        else:
+            route.continue_()
+
+    context.route("**/*", handle)
+    context.on("close", lambda _: logger.info("Lean mode: %s requests blocked", counts["blocked"]))
+
+
+async def apply_lean_routes_async(context: AsyncBrowserContext, config: Config) -> None:
+    if not config.browser_lean:
+        return
+    logger = logging.getLogger("rpa")
+    blocked = _lean_filter(config)
+    counts = {"blocked": 0}
+
+    async def handle(route: AsyncRoute) -> None:
+        if blocked(route.request):
+            counts["blocked"] += 1
+            await route.abort()
+        else:
+            await route.continue_()
+
+    await context.route("**/*", handle)
+    context.on("close", lambda _: logger.info("Lean mode: %s requests blocked", counts["blocked"]))
+
+
+def log_page_metrics(page: Page, label: str) -> None:
+    # Navigation/Resource Timing of the current document; cross-origin resources
+    # without Timing-Allow-Origin report 0 bytes, so totals are a lower bound.
+    try:
+        metrics = page.evaluate(_PAGE_METRICS_JS)
+    except Exception:
+        logging.getLogger("rpa").warning("Could not read page metrics: %s", label)
+        return
+    logging.getLogger("rpa").info(
+        "Page %s: dom ready %.0f ms, load %.0f ms, %s resources, %.1f KB transferred",
+        label,
+        metrics["domReadyMs"] or 0,
+        metrics["loadMs"] or 0,
+        metrics["resources"],
+        (metrics["documentBytes"] + metrics["resourceBytes"]) / 1024,
+    )
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+from datetime import datetime
+from pathlib import Path
+
+MANIFEST_NAME = "checkpoint.json"
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for block in iter(lambda: handle.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class Checkpoint:
+    def __init__(self, run_dir: Path) -> None:
+        self.run_dir = run_dir
+        self.path = run_dir / MANIFEST_NAME
+        self._stages: dict[str, dict] = {}
+        if self.path.exists():
+            self._stages = json.loads(self.path.read_text(encoding="utf-8")).get("stages", {})
+
+    def is_complete(self, stage: str) -> bool:
+        entry = self._stages.get(stage)
+        if not entry or entry.get("status") != "done":
+            return False
+        for name, output in entry.get("outputs", {}).items():
+            path = self.run_dir / output["path"]
+            if not path.exists():
+                logging.getLogger("rpa").warning("Checkpoint %s: missing output %s", stage, path)
+                return False
+            if file_sha256(path) != output["sha256"]:
+                logging.getLogger("rpa").warning("Checkpoint %s: checksum mismatch for %s", stage, path)
+                return False
+        return True
+
+    def output(self, stage: str, name: str) -> Path | None:
+        output = self._stages.get(stage, {}).get("outputs", {}).get(name)
+        if not output:
+            return None
+        return self.run_dir / output["path"]
+
+    def outputs(self, stage: str) -> dict[str, Path]:
+        outputs = self._stages.get(stage, {}).get("outputs", {})
+        return {name: self.run_dir / output["path"] for name, output in outputs.items()}
+
+    def mark_complete(self, stage: str, outputs: dict[str, Path | None] | None = None) -> None:
+        self._stages[stage] = {
+            "status": "done",
+            "completed_at": datetime.now().isoformat(timespec="seconds"),
+            "outputs": {
+                name: {
+                    "path": path.relative_to(self.run_dir).as_posix(),
+                    "sha256": file_sha256(path),
+                }
+                for name, path in (outputs or {}).items()
+                if path is not None
+            },
+        }
+        self._save()
+
+    def _save(self) -> None:
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps({"stages": self._stages}, indent=2), encoding="utf-8")
+        tmp_path.replace(self.path)
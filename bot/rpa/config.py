@@ -1,22 +1,35 @@
 ﻿from __future__ import annotations
 
+import codecs
 import json
 import os
+from contextvars import ContextVar
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import date, datetime
 from pathlib import Path
+from typing import Mapping
 
-from dotenv import load_dotenv
+from dotenv import dotenv_values, load_dotenv
+
+from .schedule import CronExpr, parse_schedule
 
 
 @dataclass(frozen=True)
 class RunContext:
+    run_id: str
     run_dir: Path
     downloads_dir: Path
     outputs_dir: Path
     screenshots_dir: Path
 
 
+@dataclass(frozen=True)
+class ReportJob:
+    report_type: str
+    start: date | None = None
+    end: date | None = None
+
+
 @dataclass(frozen=True)
 class Config:
     headless: bool
@@ -24,7 +37,15 @@ class Config:
     timeout_ms: int
     nav_timeout_ms: int
     slow_mo_ms: int
-    post_action_wait_ms: int
+    evidence_level: str
+    evidence_format: str
+    evidence_quality: int
+    evidence_full_page: bool
+    evidence_error_context: int
+    metrics_trace: bool
+    browser_lean: bool
+    browser_block_resource_types: list[str]
+    browser_block_domains: list[str]
     portal_url: str
     portal_login_url: str
     portal_needs_login: bool
@@ -32,8 +53,31 @@ class Config:
     portal_password: str
     portal_report_type_text: str
     portal_date_format: str
+    portal_api_mode: bool
+    portal_report_jobs: list[ReportJob]
+    portal_download_concurrency: int
+    backfill_chunk_days: int
+    core_login_url: str
+    core_username: str
+    core_password: str
+    core_section1_url: str
+    core_section2_url: str
+    core_section1_fields: dict
+    core_section2_fields: dict
+    core_upload_mode: str
+    core_upload_wait_max_ms: int
+    session_reuse: bool
+    session_plaintext: bool
+    session_dir: Path
+    session_max_age_min: int
     output_encoding: str
     periodicidad_default: str
+    transform_streaming: bool
+    transform_chunk_size: int
+    transform_xlsx_engine: str
+    transform_columnar: bool
+    pipeline_overlap: bool
+    pipeline_queue_chunks: int
     enable_linix: bool
     linix_app_path: str
     linix_window_title: str
@@ -42,38 +86,69 @@ class Config:
     linix_destinacion: str
     linix_contabilizar: str
     linix_tipo_movimiento: str
+    linix_poll_interval_ms: int
+    linix_wait_max_ms: int
+    linix_cpu_idle_percent: float
+    linix_shard_size: int
     enable_oracle: bool
     oracle_user: str
     oracle_password: str
     oracle_dsn: str
     oracle_lib_dir: str
     oracle_schema: str
+    oracle_batch_mode: bool
+    oracle_batch_size: int
+    oracle_batch_table: str
+    oracle_pool_size: int
+    enable_ledger: bool
+    ledger_path: Path
+    daemon_schedule: list[CronExpr]
+    daemon_status_path: Path
+    profiles_concurrency: int
+    profile: str
     run_context: RunContext
 
 
+# Set while a profile is loaded: the base .env overlaid with the profile file,
+# so profiles never write to os.environ.
+_PROFILE_ENV: ContextVar[Mapping[str, str] | None] = ContextVar("profile_env", default=None)
+
+
+def _getenv(name: str, default: str | None = None) -> str | None:
+    env = _PROFILE_ENV.get()
+    if env is None:
+        return os.getenv(name, default)
+    return env.get(name, default)
+
+
 def _env_bool(name: str, default: bool = False) -> bool:
-    value = os.getenv(name)
+    value = _getenv(name)
     if value is None:
         return default
     return value.strip().lower() in {"1", "true", "yes", "y", "on"}
 
 
 def _env_int(name: str, default: int) -> int:
-    value = os.getenv(name)
+    value = _getenv(name)
     if value is None or value.strip() == "":
         return default
     return int(value)
 
 
+def _env_list(name: str, default: str = "") -> list[str]:
+    value = _getenv(name, default)
+    return [item.strip().lower() for item in value.split(",") if item.strip()]
+
+
 def _env_required(name: str) -> str:
-    value = os.getenv(name)
+    value = _getenv(name)
     if value is None or value.strip() == "":
         raise ValueError(f"Missing required env var: {name}")
     return value
 
 
 def _env_json_dict(name: str) -> dict:
-    value = os.getenv(name, "").strip()
+    value = _getenv(name, "").strip()
     if not value:
         return {}
     try:
@@ -85,17 +160,43 @@ def _env_json_dict(name: str) -> dict:
     return parsed
 
 
-def _create_run_context() -> RunContext:
-    runs_dir = Path("runs")
-    runs_dir.mkdir(parents=True, exist_ok=True)
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    run_dir = runs_dir / ts
+def _env_report_jobs(name: str) -> list[ReportJob]:
+    value = _getenv(name, "").strip()
+    if not value:
+        return []
+    try:
+        parsed = json.loads(value)
+    except json.JSONDecodeError as exc:
+        raise ValueError(f"Invalid JSON in {name}") from exc
+    if not isinstance(parsed, list) or not all(isinstance(item, dict) for item in parsed):
+        raise ValueError(f"{name} must be a JSON list of objects")
+    jobs = []
+    for item in parsed:
+        start = date.fromisoformat(item["from"]) if item.get("from") else None
+        end = date.fromisoformat(item["to"]) if item.get("to") else start
+        if start and end and end < start:
+            raise ValueError(f"{name}: 'to' is before 'from' in {item}")
+        job = ReportJob(report_type=str(item.get("type", "")).strip(), start=start, end=end)
+        # The same report twice would be merged, and posted, twice.
+        if job in jobs:
+            raise ValueError(f"{name}: duplicated report job {item}")
+        jobs.append(job)
+    return jobs
+
+
+def _create_run_context(run_dir: Path | None = None, run_id: str | None = None) -> RunContext:
+    if run_dir is None:
+        runs_dir = Path("runs")
+        runs_dir.mkdir(parents=True, exist_ok=True)
+        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+        run_dir = runs_dir / ts
     downloads_dir = run_dir / "downloads"
     outputs_dir = run_dir / "outputs"
     screenshots_dir = run_dir / "screenshots"
     for path in (run_dir, downloads_dir, outputs_dir, screenshots_dir):
         path.mkdir(parents=True, exist_ok=True)
     return RunContext(
+        run_id=run_id or run_dir.name,
         run_dir=run_dir,
         downloads_dir=downloads_dir,
         outputs_dir=outputs_dir,
@@ -103,28 +204,118 @@ def _create_run_context() -> RunContext:
     )
 
 
-def load_config() -> Config:
+def new_run_context() -> RunContext:
+    return _create_run_context()
+
+
+def child_run_context(parent: RunContext, name: str) -> RunContext:
+    # Child ids include the parent so the ledger tells apart runs of the same
+    # chunk or profile.
+    return _create_run_context(parent.run_dir / name, f"{parent.run_id}/{name}")
+
+
+def load_config(run_dir: Path | None = None) -> Config:
     load_dotenv()
+    return _build_config(_create_run_context(run_dir))
+
 
-    run_context = _create_run_context()
+# --transform-only reads reports already on disk: the portal, core, Oracle,
+# LINIX, ledger, evidence and daemon settings are not used, so they are set to
+# neutral values instead of being required and validated.
+_TRANSFORM_ONLY_ENV = {
+    "PORTAL_URL": "-",
+    "PORTAL_NEEDS_LOGIN": "false",
+    "PORTAL_API_MODE": "false",
+    "PORTAL_REPORT_JOBS_JSON": "",
+    "SESSION_REUSE": "false",
+    "CORE_UPLOAD_MODE": "sequential",
+    "CORE_SECTION1_FIELDS_JSON": "",
+    "CORE_SECTION2_FIELDS_JSON": "",
+    "ENABLE_LINIX": "false",
+    "ENABLE_ORACLE": "false",
+    "ENABLE_LEDGER": "false",
+    "EVIDENCE_LEVEL": "off",
+    "EVIDENCE_FORMAT": "png",
+    "DAEMON_SCHEDULE": "",
+}
+
+
+def load_transform_config(run_dir: Path | None = None) -> Config:
+    load_dotenv()
+    token = _PROFILE_ENV.set({**os.environ, **_TRANSFORM_ONLY_ENV})
+    try:
+        return _build_config(_create_run_context(run_dir))
+    finally:
+        _PROFILE_ENV.reset(token)
 
+
+def load_profiles(profiles_dir: Path, run_dir: Path | None = None) -> tuple[RunContext, list[Config]]:
+    # One Config per <name>.env in profiles_dir, each read over the base .env,
+    # with its own run dir under a shared runs/<timestamp>/.
+    load_dotenv()
+    profile_files = sorted(profiles_dir.glob("*.env"))
+    if not profile_files:
+        raise ValueError(f"No profiles (*.env) found in {profiles_dir}")
+    parent = _create_run_context(run_dir)
+    configs = []
+    for path in profile_files:
+        values = {key: value for key, value in dotenv_values(path).items() if value is not None}
+        token = _PROFILE_ENV.set({**os.environ, **values})
+        try:
+            configs.append(_build_config(child_run_context(parent, path.stem), profile=path.stem))
+        except ValueError as exc:
+            raise ValueError(f"Profile {path.name}: {exc}") from exc
+        finally:
+            _PROFILE_ENV.reset(token)
+    return parent, configs
+
+
+def _build_config(run_context: RunContext, profile: str = "") -> Config:
     portal_needs_login = _env_bool("PORTAL_NEEDS_LOGIN", True)
-    portal_username = os.getenv("PORTAL_USERNAME", "")
-    portal_password = os.getenv("PORTAL_PASSWORD", "")
+    portal_username = _getenv("PORTAL_USERNAME", "")
+    portal_password = _getenv("PORTAL_PASSWORD", "")
     if portal_needs_login and (not portal_username or not portal_password):
         raise ValueError("PORTAL_USERNAME and PORTAL_PASSWORD are required when PORTAL_NEEDS_LOGIN=true")
+    evidence_level = _getenv("EVIDENCE_LEVEL", "all").strip().lower()
+    if evidence_level not in {"off", "on_error", "key", "all"}:
+        raise ValueError("EVIDENCE_LEVEL must be one of: off, on_error, key, all")
+    evidence_format = _getenv("EVIDENCE_FORMAT", "png").strip().lower()
+    if evidence_format not in {"png", "jpeg"}:
+        raise ValueError("EVIDENCE_FORMAT must be png or jpeg")
+
+    transform_xlsx_engine = _getenv("TRANSFORM_XLSX_ENGINE", "openpyxl").strip().lower()
+    if transform_xlsx_engine not in {"openpyxl", "xml"}:
+        raise ValueError("TRANSFORM_XLSX_ENGINE must be openpyxl or xml")
+    output_encoding = _getenv("OUTPUT_ENCODING", "utf-8").strip()
+    try:
+        codecs.lookup(output_encoding)
+    except LookupError as exc:
+        raise ValueError(f"Unknown OUTPUT_ENCODING: {output_encoding}") from exc
+
+    core_upload_mode = _getenv("CORE_UPLOAD_MODE", "sequential").strip().lower()
+    if core_upload_mode not in {"sequential", "parallel", "ordered"}:
+        raise ValueError("CORE_UPLOAD_MODE must be one of: sequential, parallel, ordered")
+
+    portal_api_mode = _env_bool("PORTAL_API_MODE", False)
+    session_reuse = _env_bool("SESSION_REUSE", False)
+    if portal_api_mode and portal_needs_login and not session_reuse:
+        raise ValueError("PORTAL_API_MODE requires SESSION_REUSE=true when PORTAL_NEEDS_LOGIN=true")
+    # Saved sessions are encrypted with DPAPI, which only exists on Windows.
+    session_plaintext = _env_bool("SESSION_PLAINTEXT", False)
+    if session_reuse and not session_plaintext and os.name != "nt":
+        raise ValueError("SESSION_REUSE encrypts the session with DPAPI (Windows); set SESSION_PLAINTEXT=true elsewhere")
 
     enable_linix = _env_bool("ENABLE_LINIX", True)
     enable_oracle = _env_bool("ENABLE_ORACLE", True)
 
-    linix_app_path = os.getenv("LINIX_APP_PATH", "")
-    linix_window_title = os.getenv("LINIX_WINDOW_TITLE", "")
+    linix_app_path = _getenv("LINIX_APP_PATH", "")
+    linix_window_title = _getenv("LINIX_WINDOW_TITLE", "")
     if enable_linix and (not linix_app_path or not linix_window_title):
         raise ValueError("LINIX_APP_PATH and LINIX_WINDOW_TITLE are required when ENABLE_LINIX=true")
 
-    oracle_user = os.getenv("ORACLE_USER", "")
-    oracle_password = os.getenv("ORACLE_PASSWORD", "")
-    oracle_dsn = os.getenv("ORACLE_DSN", "")
+    oracle_user = _getenv("ORACLE_USER", "")
+    oracle_password = _getenv("ORACLE_PASSWORD", "")
+    oracle_dsn = _getenv("ORACLE_DSN", "")
     if enable_oracle and (not oracle_user or not oracle_password or not oracle_dsn):
         raise ValueError("ORACLE_USER, ORACLE_PASSWORD and ORACLE_DSN are required when ENABLE_ORACLE=true")
 
@@ -134,29 +325,79 @@ def load_config() -> Config:
         timeout_ms=_env_int("TIMEOUT_MS", 30000),
         nav_timeout_ms=_env_int("NAV_TIMEOUT_MS", 60000),
         slow_mo_ms=_env_int("SLOW_MO_MS", 0),
-        post_action_wait_ms=_env_int("POST_ACTION_WAIT_MS", 1500),
+        evidence_level=evidence_level,
+        evidence_format=evidence_format,
+        evidence_quality=min(100, max(1, _env_int("EVIDENCE_QUALITY", 70))),
+        evidence_full_page=_env_bool("EVIDENCE_FULL_PAGE", True),
+        evidence_error_context=max(0, _env_int("EVIDENCE_ERROR_CONTEXT", 3)),
+        metrics_trace=_env_bool("METRICS_TRACE", False),
+        browser_lean=_env_bool("BROWSER_LEAN", False),
+        browser_block_resource_types=_env_list("BROWSER_BLOCK_RESOURCE_TYPES", "image,media,font"),
+        browser_block_domains=_env_list(
+            "BROWSER_BLOCK_DOMAINS",
+            "google-analytics.com,googletagmanager.com,doubleclick.net,facebook.net,hotjar.com",
+        ),
         portal_url=_env_required("PORTAL_URL"),
-        portal_login_url=os.getenv("PORTAL_LOGIN_URL", ""),
+        portal_login_url=_getenv("PORTAL_LOGIN_URL", ""),
         portal_needs_login=portal_needs_login,
         portal_username=portal_username,
         portal_password=portal_password,
-        portal_report_type_text=os.getenv("PORTAL_REPORT_TYPE_TEXT", "").strip(),
-        portal_date_format=os.getenv("PORTAL_DATE_FORMAT", "%m/%d/%Y").strip(),
-        output_encoding=os.getenv("OUTPUT_ENCODING", "utf-8").strip(),
-        periodicidad_default=os.getenv("PERIODICIDAD_DEFAULT", "1").strip(),
+        portal_report_type_text=_getenv("PORTAL_REPORT_TYPE_TEXT", "").strip(),
+        portal_date_format=_getenv("PORTAL_DATE_FORMAT", "%m/%d/%Y").strip(),
+        portal_api_mode=portal_api_mode,
+        portal_report_jobs=_env_report_jobs("PORTAL_REPORT_JOBS_JSON"),
+        portal_download_concurrency=max(1, _env_int("PORTAL_DOWNLOAD_CONCURRENCY", 3)),
+        backfill_chunk_days=max(1, _env_int("BACKFILL_CHUNK_DAYS", 7)),
+        core_login_url=_getenv("CORE_LOGIN_URL", "").strip(),
+        core_username=_getenv("CORE_USERNAME", ""),
+        core_password=_getenv("CORE_PASSWORD", ""),
+        core_section1_url=_getenv("CORE_SECTION1_URL", "").strip(),
+        core_section2_url=_getenv("CORE_SECTION2_URL", "").strip(),
+        core_section1_fields=_env_json_dict("CORE_SECTION1_FIELDS_JSON"),
+        core_section2_fields=_env_json_dict("CORE_SECTION2_FIELDS_JSON"),
+        core_upload_mode=core_upload_mode,
+        core_upload_wait_max_ms=max(0, _env_int("CORE_UPLOAD_WAIT_MAX_MS", 10000)),
+        session_reuse=session_reuse,
+        session_plaintext=session_plaintext,
+        session_dir=Path(_getenv("SESSION_DIR", "").strip() or "runs/.sessions") / profile,
+        session_max_age_min=_env_int("SESSION_MAX_AGE_MIN", 480),
+        output_encoding=output_encoding,
+        periodicidad_default=_getenv("PERIODICIDAD_DEFAULT", "1").strip(),
+        transform_streaming=_env_bool("TRANSFORM_STREAMING", False),
+        transform_chunk_size=max(1, _env_int("TRANSFORM_CHUNK_SIZE", 500)),
+        transform_xlsx_engine=transform_xlsx_engine,
+        transform_columnar=_env_bool("TRANSFORM_COLUMNAR", False),
+        pipeline_overlap=_env_bool("PIPELINE_OVERLAP", False),
+        pipeline_queue_chunks=max(1, _env_int("PIPELINE_QUEUE_CHUNKS", 4)),
         enable_linix=enable_linix,
         linix_app_path=linix_app_path,
         linix_window_title=linix_window_title,
-        linix_descripcion=os.getenv("LINIX_DESCRIPCION", "Desembolso Credito Digital").strip(),
-        linix_modalidad=os.getenv("LINIX_MODALIDAD", "112").strip(),
-        linix_destinacion=os.getenv("LINIX_DESTINACION", "PSC").strip(),
-        linix_contabilizar=os.getenv("LINIX_CONTABILIZAR", "101").strip(),
-        linix_tipo_movimiento=os.getenv("LINIX_TIPO_MOVIMIENTO", "NCV").strip(),
+        linix_descripcion=_getenv("LINIX_DESCRIPCION", "Desembolso Credito Digital").strip(),
+        linix_modalidad=_getenv("LINIX_MODALIDAD", "112").strip(),
+        linix_destinacion=_getenv("LINIX_DESTINACION", "PSC").strip(),
+        linix_contabilizar=_getenv("LINIX_CONTABILIZAR", "101").strip(),
+        linix_tipo_movimiento=_getenv("LINIX_TIPO_MOVIMIENTO", "NCV").strip(),
+        linix_poll_interval_ms=_env_int("LINIX_POLL_INTERVAL_MS", 200),
+        linix_wait_max_ms=_env_int("LINIX_WAIT_MAX_MS", 15000),
+        linix_cpu_idle_percent=float(_getenv("LINIX_CPU_IDLE_PERCENT", "5").strip() or 5),
+        linix_shard_size=max(0, _env_int("LINIX_SHARD_SIZE", 0)),
         enable_oracle=enable_oracle,
         oracle_user=oracle_user,
         oracle_password=oracle_password,
         oracle_dsn=oracle_dsn,
-        oracle_lib_dir=os.getenv("ORACLE_LIB_DIR", "").strip(),
-        oracle_schema=os.getenv("ORACLE_SCHEMA", "").strip(),
+        oracle_lib_dir=_getenv("ORACLE_LIB_DIR", "").strip(),
+        oracle_schema=_getenv("ORACLE_SCHEMA", "").strip(),
+        oracle_batch_mode=_env_bool("ORACLE_BATCH_MODE", False),
+        oracle_batch_size=max(1, _env_int("ORACLE_BATCH_SIZE", 500)),
+        oracle_batch_table=_getenv("ORACLE_BATCH_TABLE", "RPA_DESEMBOLSOS_TMP").strip(),
+        oracle_pool_size=max(1, _env_int("ORACLE_POOL_SIZE", 1)),
+        enable_ledger=_env_bool("ENABLE_LEDGER", False),
+        ledger_path=Path(
+            _getenv("LEDGER_PATH", "").strip() or (f"runs/ledger_{profile}.sqlite3" if profile else "runs/ledger.sqlite3")
+        ),
+        daemon_schedule=parse_schedule(_getenv("DAEMON_SCHEDULE", "")),
+        daemon_status_path=Path(_getenv("DAEMON_STATUS_PATH", "").strip() or "runs/daemon_status.json"),
+        profiles_concurrency=max(1, _env_int("PROFILES_CONCURRENCY", 2)),
+        profile=profile,
         run_context=run_context,
     )
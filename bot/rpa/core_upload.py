@@ -1,12 +1,16 @@
 ﻿from __future__ import annotations
 
 import logging
+import time
+from dataclasses import dataclass
 from pathlib import Path
-
-from playwright.sync_api import Page
+from typing import TYPE_CHECKING
+from urllib.parse import urlsplit
 
 from .config import Config, RunContext
-from .logging_utils import safe_screenshot
+from .logging_utils import EVIDENCE_ERROR, EVIDENCE_KEY, safe_screenshot
+from .metrics import record_latency, span
+from .sessions import save_session_state, session_is_active
 from .selectors import (
     CORE_LOGIN_PASSWORD,
     CORE_LOGIN_SUBMIT,
@@ -15,18 +19,73 @@ from .selectors import (
     CORE_SECTION1_CONTABILIZAR_BUTTON,
     CORE_SECTION1_FIELD_SELECTORS,
     CORE_SECTION1_SUCCESS_MESSAGE,
+    CORE_SECTION1_UPLOAD_DONE,
     CORE_SECTION1_UPLOAD_INPUT,
     CORE_SECTION2_CONTABILIZAR_BUTTON,
     CORE_SECTION2_FIELD_SELECTORS,
     CORE_SECTION2_SUCCESS_MESSAGE,
+    CORE_SECTION2_UPLOAD_DONE,
     CORE_SECTION2_UPLOAD_INPUT,
 )
 
+if TYPE_CHECKING:
+    from playwright.sync_api import Page, Request
+
 
 class CoreUploadError(Exception):
     pass
 
 
+class CoreSectionsError(CoreUploadError):
+    # Raised after every section ran; each failed one already logged its error
+    # and took its own screenshot.
+    pass
+
+
+CORE_SESSION = "core"
+UPLOAD_POLL_MS = 100
+# Requests the page itself makes while processing an upload.
+UPLOAD_RESOURCE_TYPES = {"xhr", "fetch", "document"}
+
+
+@dataclass(frozen=True)
+class _Section:
+    name: str
+    url: str
+    fields: dict
+    selectors: dict
+    upload_selector: str
+    contabilizar_selector: str
+    success_selector: str
+    upload_done_selector: str
+
+
+def _sections(config: Config) -> list[_Section]:
+    return [
+        _Section(
+            name="core_section1",
+            url=config.core_section1_url,
+            fields=config.core_section1_fields,
+            selectors=CORE_SECTION1_FIELD_SELECTORS,
+            upload_selector=CORE_SECTION1_UPLOAD_INPUT,
+            contabilizar_selector=CORE_SECTION1_CONTABILIZAR_BUTTON,
+            success_selector=CORE_SECTION1_SUCCESS_MESSAGE,
+            upload_done_selector=CORE_SECTION1_UPLOAD_DONE,
+        ),
+        _Section(
+            name="core_section2",
+            url=config.core_section2_url,
+            fields=config.core_section2_fields,
+            selectors=CORE_SECTION2_FIELD_SELECTORS,
+            upload_selector=CORE_SECTION2_UPLOAD_INPUT,
+            contabilizar_selector=CORE_SECTION2_CONTABILIZAR_BUTTON,
+            success_selector=CORE_SECTION2_SUCCESS_MESSAGE,
+            upload_done_selector=CORE_SECTION2_UPLOAD_DONE,
+        ),
+    ]
+
+
+@span("core.login")
 def _core_login(page: Page, config: Config, run_ctx: RunContext) -> None:
     logger = logging.getLogger("rpa")
     logger.info("Core login: %s", config.core_login_url)
@@ -51,77 +110,273 @@ def _fill_fields(page: Page, fields: dict, selectors: dict, section_name: str) -
         page.fill(selector, str(value))
 
 
+_FORM_TARGET_JS = """
+(input) => input.form && input.form.getAttribute("action")
+    ? {action: input.form.action, method: input.form.method.toUpperCase()}
+    : null
+"""
+
+
+def _origin(url: str) -> tuple[str, str]:
+    parts = urlsplit(url)
+    return parts.scheme, parts.netloc
+
+
+class _UploadTraffic:
+    # Tracks the upload requests a page starts after the file is attached, so
+    # the wait can end as soon as they finish. Listeners are attached before
+    # set_input_files to catch requests fired by it. Other traffic (long-poll,
+    # keep-alive, analytics) never finishes in time and is not counted: when
+    # the file input is in a form with an action, only requests to that action
+    # with its method count; otherwise, only non-GET requests to the page's
+    # own origin.
+    def __init__(self, page: Page, upload_selector: str) -> None:
+        self.page = page
+        self.pending: set[Request] = set()
+        self.started = 0
+        self.origin = _origin(page.url)
+        self.target = page.locator(upload_selector).first.evaluate(_FORM_TARGET_JS)
+        page.on("request", self._start)
+        page.on("requestfinished", self._end)
+        page.on("requestfailed", self._end)
+
+    def _is_upload(self, request: Request) -> bool:
+        if request.resource_type not in UPLOAD_RESOURCE_TYPES:
+            return False
+        if self.target:
+            return request.method == self.target["method"] and request.url.split("#")[0] == self.target["action"]
+        return request.method != "GET" and _origin(request.url) == self.origin
+
+    def _start(self, request: Request) -> None:
+        if self._is_upload(request):
+            self.pending.add(request)
+            self.started += 1
+
+    def _end(self, request: Request) -> None:
+        self.pending.discard(request)
+
+    def close(self) -> None:
+        self.page.remove_listener("request", self._start)
+        self.page.remove_listener("requestfinished", self._end)
+        self.page.remove_listener("requestfailed", self._end)
+
+
+def _upload_ready(page: Page, section: _Section, traffic: _UploadTraffic, polled: bool) -> bool:
+    if traffic.pending:
+        return False
+    if section.upload_done_selector and not page.locator(section.upload_done_selector).first.is_visible():
+        return False
+    button = page.locator(section.contabilizar_selector)
+    if button.count() == 0 or not button.first.is_enabled():
+        return False
+    # Contabilizar may be enabled before the upload starts. The calls above
+    # dispatch request events, so pending is checked again, and the upload is
+    # not taken as done before its first request or a first poll.
+    return not traffic.pending and (traffic.started > 0 or polled)
+
+
+def _wait_upload_processed(page: Page, config: Config, section: _Section, traffic: _UploadTraffic) -> None:
+    # Replaces the fixed POST_ACTION_WAIT_MS sleep: polls until the upload
+    # requests finished, the optional "upload done" element shows and
+    # Contabilizar is enabled. Past CORE_UPLOAD_WAIT_MAX_MS the flow goes on,
+    # as it did after the old sleep.
+    logger = logging.getLogger("rpa")
+    started = time.perf_counter()
+    deadline = started + config.core_upload_wait_max_ms / 1000
+    ready = _upload_ready(page, section, traffic, polled=False)
+    while not ready and time.perf_counter() < deadline:
+        # Playwright only dispatches request events while a call is running.
+        page.wait_for_timeout(UPLOAD_POLL_MS)
+        ready = _upload_ready(page, section, traffic, polled=True)
+    elapsed = time.perf_counter() - started
+    record_latency("core.upload_wait", elapsed)
+    if ready:
+        logger.info("%s: upload processed in %.2fs (%s requests)", section.name, elapsed, traffic.started)
+    else:
+        logger.warning(
+            "%s: upload not confirmed after %.2fs (%s requests still open); continuing",
+            section.name,
+            elapsed,
+            len(traffic.pending),
+        )
+
+
+def _attach_file(page: Page, config: Config, section: _Section, file_path: Path) -> None:
+    traffic = _UploadTraffic(page, section.upload_selector)
+    try:
+        page.set_input_files(section.upload_selector, str(file_path))
+        _wait_upload_processed(page, config, section, traffic)
+    finally:
+        traffic.close()
+
+
+@span("core.section")
 def _upload_section(
     page: Page,
     config: Config,
     run_ctx: RunContext,
-    section_name: str,
-    url: str,
-    fields: dict,
-    selectors: dict,
-    upload_selector: str,
-    contabilizar_selector: str,
-    success_selector: str,
+    section: _Section,
     file_path: Path,
 ) -> None:
     logger = logging.getLogger("rpa")
-    logger.info("Opening %s: %s", section_name, url)
+    logger.info("Opening %s: %s", section.name, section.url)
 
-    page.goto(url, wait_until="domcontentloaded")
-    page.wait_for_selector(upload_selector)
+    page.goto(section.url, wait_until="domcontentloaded")
+    page.wait_for_selector(section.upload_selector)
 
-    _fill_fields(page, fields, selectors, section_name)
-    page.set_input_files(upload_selector, str(file_path))
-    page.wait_for_timeout(config.post_action_wait_ms)
+    _fill_fields(page, section.fields, section.selectors, section.name)
+    _attach_file(page, config, section, file_path)
 
-    safe_screenshot(page, run_ctx, f"{section_name}_before_contabilizar")
+    safe_screenshot(page, run_ctx, f"{section.name}_before_contabilizar", EVIDENCE_KEY)
 
     if config.dry_run:
-        logger.info("DRY_RUN enabled. Skipping contabilizar in %s.", section_name)
+        logger.info("DRY_RUN enabled. Skipping contabilizar in %s.", section.name)
         return
 
-    page.click(contabilizar_selector)
-    page.wait_for_selector(success_selector, timeout=config.nav_timeout_ms)
-    safe_screenshot(page, run_ctx, f"{section_name}_after_success")
+    page.click(section.contabilizar_selector)
+    page.wait_for_selector(section.success_selector, timeout=config.nav_timeout_ms)
+    safe_screenshot(page, run_ctx, f"{section.name}_after_success", EVIDENCE_KEY)
 
 
-def upload_to_core(
+class _SectionRun:
+    def __init__(self, section: _Section, page: Page) -> None:
+        self.section = section
+        self.page = page
+        self.error: Exception | None = None
+        self.traffic: _UploadTraffic | None = None
+        self.started = time.perf_counter()
+
+
+def _each(runs: list[_SectionRun], run_ctx: RunContext, step: str, action) -> None:
+    # Runs one step on every section still alive; a failure only stops its own
+    # section, with its own error screenshot.
+    for run in runs:
+        if run.error is not None:
+            continue
+        try:
+            action(run)
+        except Exception as exc:
+            run.error = exc
+            logging.getLogger("rpa").exception("%s failed (%s)", run.section.name, step)
+            safe_screenshot(run.page, run_ctx, f"{run.section.name}_error", EVIDENCE_ERROR)
+
+
+@span("core.sections")
+def _upload_sections_interleaved(
     page: Page,
     config: Config,
     run_ctx: RunContext,
+    sections: list[_Section],
     file_path: Path,
 ) -> None:
+    # The sync API drives one page at a time, so sections advance step by step
+    # in their own pages: while one call blocks, the other page keeps loading
+    # or the server keeps processing its upload.
+    logger = logging.getLogger("rpa")
+    ordered = config.core_upload_mode == "ordered"
+    runs = [_SectionRun(sections[0], page)]
+    runs.extend(_SectionRun(section, page.context.new_page()) for section in sections[1:])
     try:
-        _core_login(page, config, run_ctx)
+        for run in runs:
+            logger.info("Opening %s: %s", run.section.name, run.section.url)
+        _each(runs, run_ctx, "open", lambda run: run.page.goto(run.section.url, wait_until="commit"))
 
-        _upload_section(
-            page=page,
-            config=config,
-            run_ctx=run_ctx,
-            section_name="core_section1",
-            url=config.core_section1_url,
-            fields=config.core_section1_fields,
-            selectors=CORE_SECTION1_FIELD_SELECTORS,
-            upload_selector=CORE_SECTION1_UPLOAD_INPUT,
-            contabilizar_selector=CORE_SECTION1_CONTABILIZAR_BUTTON,
-            success_selector=CORE_SECTION1_SUCCESS_MESSAGE,
-            file_path=file_path,
+        def prepare(run: _SectionRun) -> None:
+            run.page.wait_for_selector(run.section.upload_selector)
+            _fill_fields(run.page, run.section.fields, run.section.selectors, run.section.name)
+            run.traffic = _UploadTraffic(run.page, run.section.upload_selector)
+            run.page.set_input_files(run.section.upload_selector, str(file_path))
+
+        _each(runs, run_ctx, "upload", prepare)
+        # Both uploads are processed meanwhile; the second wait is usually short.
+        _each(
+            runs,
+            run_ctx,
+            "upload wait",
+            lambda run: _wait_upload_processed(run.page, config, run.section, run.traffic),
         )
+        for run in runs:
+            if run.error is None:
+                safe_screenshot(run.page, run_ctx, f"{run.section.name}_before_contabilizar", EVIDENCE_KEY)
 
-        _upload_section(
-            page=page,
-            config=config,
-            run_ctx=run_ctx,
-            section_name="core_section2",
-            url=config.core_section2_url,
-            fields=config.core_section2_fields,
-            selectors=CORE_SECTION2_FIELD_SELECTORS,
-            upload_selector=CORE_SECTION2_UPLOAD_INPUT,
-            contabilizar_selector=CORE_SECTION2_CONTABILIZAR_BUTTON,
-            success_selector=CORE_SECTION2_SUCCESS_MESSAGE,
-            file_path=file_path,
+        if config.dry_run:
+            logger.info("DRY_RUN enabled. Skipping contabilizar in %s.", ", ".join(s.name for s in sections))
+        else:
+
+            def confirm(run: _SectionRun) -> None:
+                run.page.wait_for_selector(run.section.success_selector, timeout=config.nav_timeout_ms)
+                safe_screenshot(run.page, run_ctx, f"{run.section.name}_after_success", EVIDENCE_KEY)
+
+            def contabilizar(run: _SectionRun) -> None:
+                run.page.click(run.section.contabilizar_selector)
+                if ordered:
+                    confirm(run)
+
+            if ordered:
+                # Uploads are prepared together; each section is posted only after
+                # the previous one confirmed, and a failure stops the ones after it.
+                blocked_by = None
+                for run in runs:
+                    if blocked_by is not None and run.error is None:
+                        run.error = CoreUploadError(f"not posted because {blocked_by} failed")
+                    _each([run], run_ctx, "contabilizar", contabilizar)
+                    if run.error is not None and blocked_by is None:
+                        blocked_by = run.section.name
+            else:
+                # Sections are posted together, so none is posted when any
+                # of them failed before reaching Contabilizar.
+                failed_before = [run.section.name for run in runs if run.error is not None]
+                if failed_before:
+                    for run in runs:
+                        if run.error is None:
+                            run.error = CoreUploadError(f"not posted because {', '.join(failed_before)} failed")
+                _each(runs, run_ctx, "contabilizar", contabilizar)
+                _each(runs, run_ctx, "confirm", confirm)
+
+        for run in runs:
+            if run.error is None:
+                logger.info("%s done in %.2fs", run.section.name, time.perf_counter() - run.started)
+    finally:
+        for run in runs:
+            if run.traffic is not None:
+                run.traffic.close()
+        for run in runs[1:]:
+            run.page.close()
+
+    failed = [run for run in runs if run.error is not None]
+    if failed:
+        raise CoreSectionsError(
+            f"{len(failed)} of {len(runs)} core sections failed: "
+            + "; ".join(f"{run.section.name}: {run.error}" for run in failed)
         )
+
+
+def upload_to_core(
+    page: Page,
+    config: Config,
+    run_ctx: RunContext,
+    file_path: Path,
+) -> None:
+    sections = _sections(config)
+    try:
+        session_reused = config.session_reuse and session_is_active(
+            page, config.core_section1_url, CORE_LOGIN_USERNAME, CORE_SECTION1_UPLOAD_INPUT
+        )
+        if session_reused:
+            logging.getLogger("rpa").info("Core session reused; skipping login")
+        else:
+            _core_login(page, config, run_ctx)
+            save_session_state(page.context, config, CORE_SESSION)
+
+        if config.core_upload_mode == "sequential":
+            for section in sections:
+                _upload_section(page, config, run_ctx, section, file_path)
+        else:
+            _upload_sections_interleaved(page, config, run_ctx, sections, file_path)
+    except CoreSectionsError:
+        logging.getLogger("rpa").error("Core upload failed")
+        raise
     except Exception as exc:
         logging.getLogger("rpa").exception("Core upload failed")
-        safe_screenshot(page, run_ctx, "core_error")
+        safe_screenshot(page, run_ctx, "core_error", EVIDENCE_ERROR)
         raise CoreUploadError(str(exc)) from exc
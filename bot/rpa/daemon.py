@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from playwright.sync_api import sync_playwright
+
+from .browser import launch_browser
+from .config import Config
+from .schedule import CronExpr
+
+if TYPE_CHECKING:
+    from playwright.sync_api import Browser, Playwright
+
+
+class WarmBrowser:
+    # One Chromium process kept between daemon runs; every run still gets its
+    # own context, so cookies and downloads stay per run.
+    def __init__(self, config: Config) -> None:
+        self._config = config
+        self._playwright: Playwright | None = None
+        self._browser: Browser | None = None
+        self.launches = 0
+
+    def _healthy(self) -> bool:
+        if self._browser is None or not self._browser.is_connected():
+            return False
+        try:
+            self._browser.new_context().close()
+        except Exception:
+            logging.getLogger("rpa").warning("Warm browser did not answer", exc_info=True)
+            return False
+        return True
+
+    def ensure(self) -> Browser:
+        logger = logging.getLogger("rpa")
+        started = time.perf_counter()
+        if self._healthy():
+            logger.info("Warm browser healthy (%.0f ms)", (time.perf_counter() - started) * 1000)
+            return self._browser
+        if self._browser is not None:
+            logger.warning("Warm browser lost; relaunching")
+            self.close()
+        self._playwright = sync_playwright().start()
+        self._browser = launch_browser(self._playwright, self._config)
+        self.launches += 1
+        logger.info("Browser launched in %.2fs", time.perf_counter() - started)
+        return self._browser
+
+    def close(self) -> None:
+        try:
+            if self._browser is not None and self._browser.is_connected():
+                self._browser.close()
+            if self._playwright is not None:
+                self._playwright.stop()
+        except Exception:
+            logging.getLogger("rpa").warning("Warm browser did not close cleanly", exc_info=True)
+        self._browser = None
+        self._playwright = None
+
+
+class DaemonStatus:
+    def __init__(self, path: Path, schedule: list[CronExpr]) -> None:
+        self.path = path
+        self._data: dict = {
+            "pid": os.getpid(),
+            "started_at": _stamp(datetime.now()),
+            "schedule": [expr.text for expr in schedule],
+            "state": "starting",
+            "next_run": None,
+            "last_run": None,
+            "runs_ok": 0,
+            "runs_failed": 0,
+            "browser_launches": 0,
+        }
+
+    def update(self, **fields: object) -> None:
+        self._data.update(fields)
+        self._data["updated_at"] = _stamp(datetime.now())
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self._data, indent=2), encoding="utf-8")
+        tmp_path.replace(self.path)
+
+    def finish_run(self, run_dir: Path, started: datetime, status: str, **fields: object) -> None:
+        finished = datetime.now()
+        counter = "runs_ok" if status == "ok" else "runs_failed"
+        self.update(
+            last_run={
+                "run_dir": str(run_dir),
+                "started_at": _stamp(started),
+                "finished_at": _stamp(finished),
+                "duration_s": round((finished - started).total_seconds(), 1),
+                "status": status,
+            },
+            **{counter: self._data[counter] + 1},
+            **fields,
+        )
+
+
+def _stamp(value: datetime) -> str:
+    return value.isoformat(timespec="seconds")
+
+
+def sleep_until(moment: datetime) -> None:
+    # Short naps keep Ctrl+C responsive and follow clock changes.
+    while (remaining := (moment - datetime.now()).total_seconds()) > 0:
+        time.sleep(min(remaining, 30))
@@ -1,13 +1,16 @@
 ﻿from __future__ import annotations
 
 import logging
-from datetime import datetime
+from datetime import date, datetime
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-from playwright.sync_api import Page
-
+from .browser import log_page_metrics
 from .config import Config, RunContext
-from .logging_utils import safe_screenshot
+from .logging_utils import EVIDENCE_ERROR, EVIDENCE_KEY, safe_screenshot
+from .metrics import span
+from .report_api import record_report_request
+from .sessions import save_session_state, session_is_active
 from .selectors import (
     PORTAL_LOGIN_PASSWORD,
     PORTAL_LOGIN_SUBMIT,
@@ -20,11 +23,18 @@ from .selectors import (
     PORTAL_REPORT_TYPE_SELECT,
 )
 
+if TYPE_CHECKING:
+    from playwright.sync_api import Page
+
 
 class DownloadError(Exception):
     pass
 
 
+PORTAL_SESSION = "portal"
+
+
+@span("portal.login")
 def _portal_login(page: Page, config: Config, run_ctx: RunContext) -> None:
     logger = logging.getLogger("rpa")
     login_url = config.portal_login_url or config.portal_url
@@ -37,18 +47,25 @@ def _portal_login(page: Page, config: Config, run_ctx: RunContext) -> None:
     safe_screenshot(page, run_ctx, "portal_before_login_submit")
     page.click(PORTAL_LOGIN_SUBMIT)
     page.wait_for_selector(PORTAL_LOGIN_SUCCESS)
+    log_page_metrics(page, "portal_login")
     safe_screenshot(page, run_ctx, "portal_after_login")
 
 
-def _format_report_date(config: Config) -> str:
-    return datetime.now().strftime(config.portal_date_format)
+def format_report_date(config: Config, day: date | None = None) -> str:
+    return (day or datetime.now()).strftime(config.portal_date_format)
 
 
-def _open_reports(page: Page, config: Config, run_ctx: RunContext) -> None:
+def _reports_ready_selector() -> str:
+    return PORTAL_MENU_REPORTS or PORTAL_REPORT_TYPE_SELECT
+
+
+@span("portal.open_reports")
+def _open_reports(page: Page, config: Config, run_ctx: RunContext, navigate: bool = True) -> str:
     logger = logging.getLogger("rpa")
     logger.info("Opening reports page")
 
-    page.goto(config.portal_url, wait_until="domcontentloaded")
+    if navigate:
+        page.goto(config.portal_url, wait_until="domcontentloaded")
     if PORTAL_MENU_REPORTS:
         page.wait_for_selector(PORTAL_MENU_REPORTS)
         page.click(PORTAL_MENU_REPORTS)
@@ -57,30 +74,47 @@ def _open_reports(page: Page, config: Config, run_ctx: RunContext) -> None:
     if config.portal_report_type_text:
         page.select_option(PORTAL_REPORT_TYPE_SELECT, label=config.portal_report_type_text)
 
-    report_date = _format_report_date(config)
+    report_date = format_report_date(config)
     page.fill(PORTAL_REPORT_START_DATE, report_date)
     page.fill(PORTAL_REPORT_END_DATE, report_date)
+    log_page_metrics(page, "portal_reports")
     safe_screenshot(page, run_ctx, "portal_reports_ready")
+    return report_date
 
 
 def download_portal_file(page: Page, config: Config, run_ctx: RunContext) -> Path:
     logger = logging.getLogger("rpa")
     try:
+        session_reused = False
         if config.portal_needs_login:
-            _portal_login(page, config, run_ctx)
-        _open_reports(page, config, run_ctx)
-
-        with page.expect_download(timeout=config.nav_timeout_ms) as download_info:
+            session_reused = config.session_reuse and session_is_active(
+                page, config.portal_url, PORTAL_LOGIN_USERNAME, _reports_ready_selector()
+            )
+            if session_reused:
+                logger.info("Portal session reused; skipping login")
+            else:
+                _portal_login(page, config, run_ctx)
+                save_session_state(page.context, config, PORTAL_SESSION)
+        report_date = _open_reports(page, config, run_ctx, navigate=not session_reused)
+
+        requests = []
+        on_request = requests.append
+        if config.portal_api_mode:
+            page.on("request", on_request)
+        with span("portal.download"), page.expect_download(timeout=config.nav_timeout_ms) as download_info:
             page.click(PORTAL_REPORT_GENERATE_BUTTON)
         download = download_info.value
+        if config.portal_api_mode:
+            page.remove_listener("request", on_request)
+            record_report_request(requests, download.url, report_date, config)
 
         suggested = download.suggested_filename or "reporte.xlsx"
         dest = run_ctx.downloads_dir / f"{run_ctx.run_dir.name}_{suggested}"
         download.save_as(dest)
         logger.info("Downloaded file saved: %s", dest)
-        safe_screenshot(page, run_ctx, "portal_after_download")
+        safe_screenshot(page, run_ctx, "portal_after_download", EVIDENCE_KEY)
         return dest
     except Exception as exc:
         logger.exception("Download failed")
-        safe_screenshot(page, run_ctx, "portal_error")
+        safe_screenshot(page, run_ctx, "portal_error", EVIDENCE_ERROR)
         raise DownloadError(str(exc)) from exc
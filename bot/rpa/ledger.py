@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable
+
+from .transform import ReportRecord
+
+DEFAULT_LEDGER_PATH = Path("runs") / "ledger.sqlite3"
+# Staged records are written in groups in short transactions, so profiles
+# sharing LEDGER_PATH never wait on a write lock held for a whole transform.
+COMMIT_EVERY = 500
+BUSY_TIMEOUT_S = 30
+
+STATUS_PENDING = "pending"
+STATUS_POSTED = "posted"
+
+
+def record_key(record: ReportRecord) -> str:
+    raw = "|".join((record.cedula, record.monto, record.plazo, record.fecha))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class Ledger:
+    def __init__(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.skipped = 0
+        self.staged = 0
+        self._pending_rows: list[tuple] = []
+        # With PIPELINE_OVERLAP the record filter runs in the transform thread;
+        # the connection is still used by one thread at a time.
+        self._conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_S, check_same_thread=False)
+        # WAL lets other runs read the ledger while one of them writes.
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS ledger (
+                key TEXT PRIMARY KEY,
+                cedula TEXT NOT NULL,
+                monto TEXT NOT NULL,
+                plazo TEXT NOT NULL,
+                fecha TEXT NOT NULL,
+                run_id TEXT NOT NULL,
+                status TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def accept(self, record: ReportRecord, run_id: str) -> bool:
+        # Records already posted by a previous run are skipped; anything else is
+        # (re)staged as pending for this run.
+        key = record_key(record)
+        row = self._conn.execute("SELECT status FROM ledger WHERE key = ?", (key,)).fetchone()
+        if row and row[0] == STATUS_POSTED:
+            self.skipped += 1
+            return False
+        self._pending_rows.append(
+            (
+                key,
+                record.cedula,
+                record.monto,
+                record.plazo,
+                record.fecha,
+                run_id,
+                STATUS_PENDING,
+                _now(),
+            )
+        )
+        self.staged += 1
+        if len(self._pending_rows) >= COMMIT_EVERY:
+            self.commit()
+        return True
+
+    def posted_by_other_run(self, record: ReportRecord, run_id: str) -> bool:
+        row = self._conn.execute(
+            "SELECT run_id, status FROM ledger WHERE key = ?", (record_key(record),)
+        ).fetchone()
+        return bool(row) and row[1] == STATUS_POSTED and row[0] != run_id
+
+    def commit(self) -> None:
+        # A record another run posted since accept() looked it up stays posted.
+        with self._conn:
+            self._conn.executemany(
+                f"""
+                INSERT INTO ledger VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET
+                    run_id = excluded.run_id,
+                    status = excluded.status,
+                    updated_at = excluded.updated_at
+                WHERE ledger.status <> '{STATUS_POSTED}'
+                """,
+                self._pending_rows,
+            )
+        self._pending_rows = []
+
+    def mark_posted(self, run_id: str, records: Iterable[ReportRecord]) -> int:
+        # Marks the records this run loaded, even if a later run re-staged them
+        # as its own pending records in the meantime.
+        now = _now()
+        cursor = self._conn.executemany(
+            "UPDATE ledger SET status = ?, run_id = ?, updated_at = ? WHERE key = ?",
+            ((STATUS_POSTED, run_id, now, record_key(record)) for record in records),
+        )
+        self._conn.commit()
+        return cursor.rowcount
+
+    def summary(self) -> list[tuple[str, str, int, str]]:
+        return self._conn.execute(
+            """
+            SELECT run_id, status, COUNT(*), MAX(updated_at)
+            FROM ledger
+            GROUP BY run_id, status
+            ORDER BY run_id, status
+            """
+        ).fetchall()
+
+    def find(self, cedula: str) -> list[tuple]:
+        return self._conn.execute(
+            "SELECT cedula, monto, plazo, fecha, run_id, status, updated_at FROM ledger "
+            "WHERE cedula = ? ORDER BY updated_at",
+            (cedula,),
+        ).fetchall()
+
+    def reset(self, run_id: str | None = None, status: str | None = None) -> int:
+        clauses = []
+        params: list[str] = []
+        if run_id:
+            clauses.append("run_id = ?")
+            params.append(run_id)
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        cursor = self._conn.execute(f"DELETE FROM ledger{where}", params)
+        self._conn.commit()
+        return cursor.rowcount
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
@@ -2,11 +2,14 @@ from __future__ import annotations
 
 import logging
 import time
+from collections import defaultdict
 from pathlib import Path
+from typing import Callable
 
 from pywinauto import Application, Desktop, keyboard
 from pywinauto.base_wrapper import BaseWrapper
 
+from . import linix_selectors
 from .config import Config, RunContext
 from .linix_selectors import (
     LINIX_BUTTON_AHORROS_CARGAR_ARCHIVO,
@@ -26,12 +29,88 @@ from .linix_selectors import (
     LINIX_TAB_AHORROS,
     LINIX_TAB_DOCUMENTO_SOPORTE,
 )
+from .linix_shards import STATUS_DONE, STATUS_FAILED, LinixShards
+from .metrics import span
 
 
 class LinixError(Exception):
     pass
 
 
+class _Waiter:
+    # Polls the UIA tree until a condition holds instead of sleeping a fixed time.
+
+    def __init__(self, app: Application, window: BaseWrapper, config: Config) -> None:
+        self.app = app
+        self.window = window
+        self.poll_sec = max(0.05, config.linix_poll_interval_ms / 1000)
+        self.max_sec = max(self.poll_sec, config.linix_wait_max_ms / 1000)
+        self.cpu_idle_percent = config.linix_cpu_idle_percent
+
+    def until(self, condition: Callable[[], bool], label: str, timeout_sec: float | None = None) -> bool:
+        logger = logging.getLogger("rpa")
+        timeout_sec = self.max_sec if timeout_sec is None else timeout_sec
+        started = time.perf_counter()
+        with span("linix.wait", label=label) as wait_span:
+            while True:
+                try:
+                    ready = condition()
+                except Exception:
+                    ready = False
+                elapsed = time.perf_counter() - started
+                if ready:
+                    logger.info("LINIX wait '%s': %.2fs", label, elapsed)
+                    return True
+                if elapsed >= timeout_sec:
+                    wait_span.set(timed_out=True)
+                    logger.warning("LINIX wait '%s' timed out after %.2fs", label, elapsed)
+                    return False
+                time.sleep(self.poll_sec)
+
+    def _app_idle(self) -> bool:
+        # cpu_usage blocks for the sampling interval, which doubles as the poll delay.
+        return self.app.cpu_usage(interval=self.poll_sec) < self.cpu_idle_percent
+
+    def idle(self, label: str, expect: dict | None = None) -> bool:
+        # The top window rather than the main one: modal confirmations disable it.
+        # Idle is sampled right after a keystroke, before LINIX may have started
+        # handling it, so it has to hold on two polls in a row.
+        streak = 0
+
+        def settled() -> bool:
+            nonlocal streak
+            previous, streak = streak, 0
+            if self.app.top_window().is_enabled() and self._app_idle():
+                streak = previous + 1
+            return streak >= 2
+
+        idle = self.until(settled, f"idle: {label}")
+        if expect is not None:
+            return self.focused(expect, label)
+        if not idle:
+            logging.getLogger("rpa").warning("LINIX '%s': continuing without confirming the step finished", label)
+        return idle
+
+    def focused(self, spec: dict, label: str) -> bool:
+        # Post-condition of a keyboard step: the field it moves to has focus.
+        # Checked once: the screen is already idle, and legacy screens may not
+        # expose the field over UIA at all.
+        if not self.window.child_window(**spec).exists(timeout=0):
+            logging.getLogger("rpa").warning("LINIX '%s': field not found over UIA; focus not verified", label)
+            return False
+        if not self.until(lambda: _child(self.window, spec).has_keyboard_focus(), f"focus: {label}"):
+            raise LinixError(f"LINIX no paso al campo '{label}'; se detiene para no escribir en otro campo.")
+        return True
+
+    def control(self, spec: dict, label: str) -> bool:
+        # exists(timeout=0) probes without the implicit find timeout of a lookup.
+        probe = self.window.child_window(**spec)
+        return self.until(
+            lambda: probe.exists(timeout=0) and _child(self.window, spec).is_enabled(),
+            f"control: {label}",
+        )
+
+
 def _connect_app(config: Config) -> Application:
     try:
         app = Application(backend="uia").connect(path=config.linix_app_path)
@@ -49,8 +128,81 @@ def _get_window(app: Application, config: Config, timeout_sec: int) -> BaseWrapp
     return window
 
 
+def _spec_key(spec: dict) -> tuple:
+    return tuple(sorted(spec.items()))
+
+
+def _selector_names() -> dict[tuple, str]:
+    names: dict[tuple, list[str]] = defaultdict(list)
+    for name, value in vars(linix_selectors).items():
+        if name.startswith("LINIX_") and isinstance(value, dict):
+            names[_spec_key(value)].append(name)
+    return {key: "/".join(values) for key, values in names.items()}
+
+
+class _ElementCache:
+    # Resolved UIA wrappers keyed by selector spec. Entries are dropped when the
+    # window or tab changes, and re-resolved when a cached element goes stale.
+
+    def __init__(self) -> None:
+        self._elements: dict[tuple, BaseWrapper] = {}
+        self._window_handle: int | None = None
+        self._latencies: dict[tuple, list[float]] = defaultdict(list)
+        self._hits: dict[tuple, int] = defaultdict(int)
+
+    def reset(self) -> None:
+        self._elements.clear()
+        self._window_handle = None
+        self._latencies.clear()
+        self._hits.clear()
+
+    def invalidate(self, reason: str) -> None:
+        if self._elements:
+            logging.getLogger("rpa").info("LINIX element cache cleared: %s", reason)
+        self._elements.clear()
+
+    def resolve(self, window: BaseWrapper, spec: dict) -> BaseWrapper:
+        handle = window.handle
+        if handle != self._window_handle:
+            self.invalidate("window changed")
+            self._window_handle = handle
+
+        key = _spec_key(spec)
+        ctrl = self._elements.get(key)
+        if ctrl is not None:
+            try:
+                if ctrl.is_visible():
+                    self._hits[key] += 1
+                    return ctrl
+            except Exception:
+                pass
+
+        started = time.perf_counter()
+        ctrl = window.child_window(**spec).wrapper_object()
+        self._latencies[key].append(time.perf_counter() - started)
+        self._elements[key] = ctrl
+        return ctrl
+
+    def log_summary(self) -> None:
+        logger = logging.getLogger("rpa")
+        names = _selector_names()
+        by_slowest = sorted(self._latencies.items(), key=lambda item: max(item[1]), reverse=True)
+        for key, latencies in by_slowest:
+            logger.info(
+                "LINIX selector %s: %s lookups, %s cache hits, %.3fs max, %.3fs total",
+                names.get(key, dict(key)),
+                len(latencies),
+                self._hits.get(key, 0),
+                max(latencies),
+                sum(latencies),
+            )
+
+
+_ELEMENT_CACHE = _ElementCache()
+
+
 def _child(window: BaseWrapper, spec: dict) -> BaseWrapper:
-    return window.child_window(**spec)
+    return _ELEMENT_CACHE.resolve(window, spec)
 
 
 def _set_text(window: BaseWrapper, spec: dict, value: str) -> None:
@@ -67,20 +219,24 @@ def _click(window: BaseWrapper, spec: dict) -> None:
     ctrl = _child(window, spec)
     ctrl.set_focus()
     ctrl.click()
+    if spec.get("control_type") == "TabItem":
+        _ELEMENT_CACHE.invalidate(f"tab {spec.get('title', '')}")
 
 
 def _menu_select(window: BaseWrapper, path: str) -> None:
     if not path:
         return
+    _ELEMENT_CACHE.invalidate(f"menu {path}")
     try:
         window.menu_select(path)
     except Exception:
         logging.getLogger("rpa").warning("No se pudo usar menu_select con '%s'", path)
 
 
-def _upload_file_dialog(file_path: Path, timeout_sec: int) -> None:
+def _upload_file_dialog(file_path: Path, timeout_sec: int, waiter: _Waiter) -> None:
     dialog = Desktop(backend="uia").window(title_re="(Abrir|Open)")
-    dialog.wait("visible", timeout=timeout_sec)
+    if not waiter.until(lambda: dialog.exists(timeout=0) and dialog.is_visible(), "file dialog open", timeout_sec):
+        raise LinixError(f"No se abrio el dialogo de archivo para {file_path.name}")
 
     # Some legacy dialogs filter by file type; force "All files" when available.
     try:
@@ -97,93 +253,166 @@ def _upload_file_dialog(file_path: Path, timeout_sec: int) -> None:
         file_name_edit.set_edit_text(str(file_path))
 
     dialog.child_window(title_re="(Abrir|Open)", control_type="Button").click()
+    if not waiter.until(lambda: not dialog.exists(timeout=0), "file dialog closed", timeout_sec):
+        raise LinixError(f"El dialogo de archivo no se cerro al cargar {file_path.name}")
+    waiter.idle(f"load {file_path.name}")
 
 
 def _send_text(value: str) -> None:
     keyboard.send_keys(value, with_spaces=True)
 
 
-def _open_section1_and_fill(config: Config, window: BaseWrapper, wait_sec: int) -> None:
+def _open_section1_and_fill(config: Config, window: BaseWrapper, waiter: _Waiter) -> None:
     # Keyboard-first flow for legacy LINIX windows without stable UIA identifiers.
     window.set_focus()
     keyboard.send_keys("{ENTER}")
-    time.sleep(wait_sec)
+    waiter.idle("menu")
     keyboard.send_keys("{ENTER}")
-    time.sleep(wait_sec)
+    waiter.idle("solicitudes resumidas")
     keyboard.send_keys("{TAB}{TAB}")
-    time.sleep(wait_sec)
+    waiter.idle("modalidad", expect=LINIX_FIELD_MODALIDAD)
 
     _send_text(config.linix_modalidad)
     keyboard.send_keys("{TAB}")
-    time.sleep(wait_sec)
+    waiter.idle("destinacion", expect=LINIX_FIELD_DESTINACION)
 
     # User flow indicates typing "P" autocompletes to PSC.
     _send_text(config.linix_destinacion[:1] if config.linix_destinacion else "P")
     keyboard.send_keys("{TAB}")
-    time.sleep(wait_sec)
+    waiter.idle("contabilizar", expect=LINIX_FIELD_CONTABILIZAR)
 
     _send_text(config.linix_contabilizar)
     keyboard.send_keys("{TAB}{TAB}")
-    time.sleep(wait_sec)
+    waiter.idle("descripcion", expect=LINIX_FIELD_DESCRIPCION)
 
     _send_text(config.linix_descripcion)
     keyboard.send_keys("{F10}")
-    time.sleep(wait_sec)
+    waiter.idle("F10 solicitudes")
     keyboard.send_keys("{ENTER}")
-    time.sleep(wait_sec)
+    waiter.idle("confirmacion solicitudes")
+
+
+def _load_solicitudes(
+    config: Config,
+    window: BaseWrapper,
+    waiter: _Waiter,
+    file_path: Path,
+    timeout_sec: int,
+) -> None:
+    waiter.control(LINIX_BUTTON_CARGUE_ARCHIVO, "Cargue Archivo")
+    _click(window, LINIX_BUTTON_CARGUE_ARCHIVO)
+    _upload_file_dialog(file_path, timeout_sec, waiter)
 
+    if config.dry_run:
+        logging.getLogger("rpa").info("DRY_RUN habilitado. Se omite 'Contabilizar'.")
+    else:
+        waiter.control(LINIX_BUTTON_CONTABILIZAR, "Contabilizar")
+        _click(window, LINIX_BUTTON_CONTABILIZAR)
+        waiter.idle("contabilizar solicitudes")
 
+
+def _load_shards(
+    config: Config,
+    window: BaseWrapper,
+    waiter: _Waiter,
+    shards: LinixShards,
+    pending: list[Path],
+    timeout_sec: int,
+    on_loaded: Callable[[Path], None] | None,
+) -> None:
+    # Shards go one after another through the same Cargue Archivo/Contabilizar
+    # cycle; the first failure stops the flow (the LINIX window is in an
+    # unknown state) and leaves the remaining shards pending for a retry.
+    # on_loaded gets each shard as soon as it is posted, so shards
+    # loaded before a failure are not posted again by a later run.
+    logger = logging.getLogger("rpa")
+    for index, shard in enumerate(pending, start=1):
+        started = time.perf_counter()
+        logger.info("LINIX: shard %s (%s of %s pending)", shard.name, index, len(pending))
+        with span("linix.shard", shard=shard.name):
+            try:
+                _load_solicitudes(config, window, waiter, shard, timeout_sec)
+            except Exception as exc:
+                shards.mark(shard, STATUS_FAILED, str(exc))
+                raise
+        if not config.dry_run:
+            shards.mark(shard, STATUS_DONE)
+            if on_loaded is not None:
+                on_loaded(shard)
+        logger.info("LINIX: shard %s loaded in %.1fs", shard.name, time.perf_counter() - started)
+
+
+@span("linix.flow")
 def run_linix_flow(
     config: Config,
     run_ctx: RunContext,
     linix_file: Path,
     documentos_file: Path | None,
     ahorros_file: Path | None,
+    on_loaded: Callable[[Path], None] | None = None,
 ) -> None:
+    # on_loaded is called with each file (the LINIX file or one of its shards)
+    # once Contabilizar ran for its solicitudes, before the rest of the flow.
+    # First, so the summary in finally never reports an earlier run's lookups.
+    _ELEMENT_CACHE.reset()
     logger = logging.getLogger("rpa")
     try:
         timeout_sec = max(10, int(config.nav_timeout_ms / 1000))
-        wait_sec = max(1, int(config.post_action_wait_ms / 1000))
+
+        shards = None
+        if config.linix_shard_size:
+            shards = LinixShards(run_ctx.run_dir)
+            shards.plan(linix_file, config.linix_shard_size)
+            if not shards.pending() and shards.step_done("movimientos"):
+                logger.info("LINIX: every shard and the movimientos step are already done")
+                return
 
         app = _connect_app(config)
         window = _get_window(app, config, timeout_sec)
-
-        logger.info("LINIX: Paso 1 (Solicitudes resumidas)")
-        _open_section1_and_fill(config, window, wait_sec)
-
-        _click(window, LINIX_BUTTON_CARGUE_ARCHIVO)
-        _upload_file_dialog(linix_file, timeout_sec)
-        time.sleep(wait_sec)
-
-        if config.dry_run:
-            logger.info("DRY_RUN habilitado. Se omite 'Contabilizar'.")
-        else:
-            _click(window, LINIX_BUTTON_CONTABILIZAR)
-            time.sleep(wait_sec)
+        waiter = _Waiter(app, window, config)
+
+        pending = shards.pending() if shards else [linix_file]
+        if pending:
+            logger.info("LINIX: Paso 1 (Solicitudes resumidas)")
+            _open_section1_and_fill(config, window, waiter)
+            if shards:
+                _load_shards(config, window, waiter, shards, pending, timeout_sec, on_loaded)
+            else:
+                _load_solicitudes(config, window, waiter, linix_file, timeout_sec)
+                if on_loaded is not None and not config.dry_run:
+                    on_loaded(linix_file)
 
         logger.info("LINIX: Paso 2 (Contabilizacion de movimientos)")
         _menu_select(window, LINIX_MENU_CONTAB_MOV_PATH)
-        time.sleep(wait_sec)
+        waiter.control(LINIX_FIELD_PROCESO, "Proceso")
 
         _set_text(window, LINIX_FIELD_PROCESO, config.linix_descripcion)
         _set_text(window, LINIX_FIELD_TIPO_MOVIMIENTO, config.linix_tipo_movimiento)
         keyboard.send_keys("{F10}")
-        time.sleep(wait_sec)
+        _ELEMENT_CACHE.invalidate("F10 movimientos")
+        waiter.idle("F10 movimientos")
 
         if documentos_file:
+            waiter.control(LINIX_TAB_DOCUMENTO_SOPORTE, "Documento soporte")
             _click(window, LINIX_TAB_DOCUMENTO_SOPORTE)
             try:
                 _click(window, LINIX_CHECK_DOCS_EXISTENTES)
             except Exception:
                 logger.warning("No se encontro el checkbox de documentos existentes.")
+            waiter.control(LINIX_BUTTON_DOC_CARGAR_ARCHIVO, "Cargar Archivo documentos")
             _click(window, LINIX_BUTTON_DOC_CARGAR_ARCHIVO)
-            _upload_file_dialog(documentos_file, timeout_sec)
-            time.sleep(wait_sec)
+            _upload_file_dialog(documentos_file, timeout_sec, waiter)
 
         if ahorros_file:
+            waiter.control(LINIX_TAB_AHORROS, "Ahorros")
             _click(window, LINIX_TAB_AHORROS)
+            waiter.control(LINIX_BUTTON_AHORROS_CARGAR_ARCHIVO, "Cargar Archivo ahorros")
             _click(window, LINIX_BUTTON_AHORROS_CARGAR_ARCHIVO)
-            _upload_file_dialog(ahorros_file, timeout_sec)
-            time.sleep(wait_sec)
+            _upload_file_dialog(ahorros_file, timeout_sec, waiter)
+
+        if shards and not config.dry_run:
+            shards.mark_step("movimientos")
     except Exception as exc:
         raise LinixError(str(exc)) from exc
+    finally:
+        _ELEMENT_CACHE.log_summary()
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import json
+import logging
+from datetime import datetime
+from pathlib import Path
+
+from .checkpoint import file_sha256
+
+MANIFEST_NAME = "linix_shards.json"
+
+STATUS_PENDING = "pending"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+def shard_path(linix_file: Path, index: int) -> Path:
+    return linix_file.with_name(f"{linix_file.stem}_{index:03d}{linix_file.suffix}")
+
+
+def write_shards(linix_file: Path, shard_size: int) -> list[tuple[Path, int]]:
+    # Splits the LINIX file into numbered files of up to shard_size records,
+    # keeping input order; lines are copied as bytes, untouched.
+    shards: list[list] = []
+    handle = None
+    try:
+        with linix_file.open("rb") as source:
+            for line in source:
+                if handle is None or shards[-1][1] == shard_size:
+                    if handle is not None:
+                        handle.close()
+                    path = shard_path(linix_file, len(shards) + 1)
+                    handle = path.open("wb")
+                    shards.append([path, 0])
+                handle.write(line)
+                shards[-1][1] += 1
+    finally:
+        if handle is not None:
+            handle.close()
+    return [(path, records) for path, records in shards]
+
+
+class LinixShards:
+    # Per-shard load status in run_dir/linix_shards.json, so a retry of the
+    # LINIX stage (--resume) only loads the shards that are not done yet.
+
+    def __init__(self, run_dir: Path) -> None:
+        self.run_dir = run_dir
+        self.path = run_dir / MANIFEST_NAME
+        self._data: dict = {}
+        if self.path.exists():
+            self._data = json.loads(self.path.read_text(encoding="utf-8"))
+
+    def plan(self, linix_file: Path, shard_size: int) -> None:
+        logger = logging.getLogger("rpa")
+        digest = file_sha256(linix_file)
+        shards = self._data.get("shards", [])
+        if (
+            self._data.get("source_sha256") == digest
+            and self._data.get("shard_size") == shard_size
+            and all((self.run_dir / shard["file"]).exists() for shard in shards)
+        ):
+            done = sum(1 for shard in shards if shard["status"] == STATUS_DONE)
+            logger.info("LINIX shards: reusing plan, %s of %s already loaded", done, len(shards))
+            return
+
+        # The LINIX file or the shard size changed: earlier shards are stale.
+        for shard in shards:
+            (self.run_dir / shard["file"]).unlink(missing_ok=True)
+        written = write_shards(linix_file, shard_size)
+        self._data = {
+            "source": linix_file.relative_to(self.run_dir).as_posix(),
+            "source_sha256": digest,
+            "shard_size": shard_size,
+            "shards": [
+                {
+                    "file": path.relative_to(self.run_dir).as_posix(),
+                    "records": records,
+                    "status": STATUS_PENDING,
+                }
+                for path, records in written
+            ],
+            "steps": {},
+        }
+        self._save()
+        logger.info("LINIX shards: %s files of up to %s records", len(written), shard_size)
+
+    def drop_lines(self, lines: set[bytes], linix_file: Path) -> None:
+        # Keeps an existing plan in step with a LINIX file that lost some lines:
+        # pending shards lose them too, loaded shards stay as they were.
+        if not self._data or not lines:
+            return
+        shards = []
+        for shard in self._data["shards"]:
+            path = self.run_dir / shard["file"]
+            if shard["status"] != STATUS_DONE and path.exists():
+                kept = [line for line in path.read_bytes().splitlines(keepends=True) if line not in lines]
+                if not kept:
+                    path.unlink()
+                    continue
+                path.write_bytes(b"".join(kept))
+                shard["records"] = len(kept)
+            shards.append(shard)
+        self._data["shards"] = shards
+        self._data["source_sha256"] = file_sha256(linix_file)
+        self._save()
+
+    def pending(self) -> list[Path]:
+        return [
+            self.run_dir / shard["file"]
+            for shard in self._data.get("shards", [])
+            if shard["status"] != STATUS_DONE
+        ]
+
+    def mark(self, path: Path, status: str, error: str | None = None) -> None:
+        name = path.relative_to(self.run_dir).as_posix()
+        for shard in self._data["shards"]:
+            if shard["file"] == name:
+                shard["status"] = status
+                shard["updated_at"] = datetime.now().isoformat(timespec="seconds")
+                if error:
+                    shard["error"] = error
+                else:
+                    shard.pop("error", None)
+        self._save()
+
+    def step_done(self, step: str) -> bool:
+        return self._data.get("steps", {}).get(step) == STATUS_DONE
+
+    def mark_step(self, step: str) -> None:
+        self._data.setdefault("steps", {})[step] = STATUS_DONE
+        self._save()
+
+    def _save(self) -> None:
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self._data, indent=2), encoding="utf-8")
+        tmp_path.replace(self.path)
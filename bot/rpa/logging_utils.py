@@ -1,39 +1,204 @@
 ﻿from __future__ import annotations
 
 import logging
+import queue
+import threading
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import datetime
 from pathlib import Path
 
-from .config import RunContext
+from .config import Config, RunContext
 
+EVIDENCE_STEP = "step"
+EVIDENCE_KEY = "key"
+EVIDENCE_ERROR = "error"
 
-def setup_logging(run_dir: Path) -> logging.Logger:
-    log_file = run_dir / "bot.log"
+# Kinds written right away for each EVIDENCE_LEVEL; error captures are always kept.
+EVIDENCE_LEVELS = {
+    "off": set(),
+    "on_error": set(),
+    "key": {EVIDENCE_KEY},
+    "all": {EVIDENCE_STEP, EVIDENCE_KEY},
+}
+
+
+@dataclass(frozen=True)
+class EvidencePolicy:
+    level: str = "all"
+    image_format: str = "png"
+    quality: int = 70
+    full_page: bool = True
+    error_context: int = 3
+
+
+class _EvidenceWriter:
+    # Screenshots are taken on the Playwright thread (the sync API is not
+    # thread-safe); only the disk writes move to this background thread.
+    def __init__(self) -> None:
+        self._queue: queue.Queue[tuple[Path, bytes]] = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self.written = 0
+        self.bytes_written = 0
+
+    def submit(self, path: Path, data: bytes) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="evidence", daemon=True)
+                self._thread.start()
+        self._queue.put((path, data))
+
+    def _run(self) -> None:
+        while True:
+            path, data = self._queue.get()
+            try:
+                path.write_bytes(data)
+                self.written += 1
+                self.bytes_written += len(data)
+            except Exception:
+                logging.getLogger("rpa").exception("Failed to write screenshot: %s", path)
+            finally:
+                self._queue.task_done()
+
+    def flush(self) -> None:
+        self._queue.join()
+
+
+_POLICY = EvidencePolicy()
+_WRITER = _EvidenceWriter()
+# on_error: where the last steps were (time, step, URL, title), logged with an error.
+_RECENT: deque[str] = deque(maxlen=_POLICY.error_context)
+
+
+LOG_FORMAT = "%(asctime)s | %(levelname)s | %(message)s"
+PROFILE_LOG_FORMAT = "%(asctime)s | %(levelname)s | %(profile_tag)s%(message)s"
+
+# Profile whose work is running in the current thread (multi-profile runs).
+_LOG_PROFILE: ContextVar[str] = ContextVar("log_profile", default="")
+
+
+class _ProfileFilter(logging.Filter):
+    def __init__(self, only: str | None = None) -> None:
+        super().__init__()
+        self.only = only
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        profile = _LOG_PROFILE.get()
+        record.profile_tag = f"[{profile}] " if profile else ""
+        return self.only is None or profile == self.only
+
+
+def _handler(handler: logging.Handler) -> logging.Handler:
+    handler.setLevel(logging.INFO)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    return handler
+
+
+def setup_logging(run_dir: Path | None) -> logging.Logger:
+    # Without a run dir (daemon between runs) only the console is set up.
     logger = logging.getLogger("rpa")
     logger.setLevel(logging.INFO)
     logger.handlers.clear()
+    if run_dir is not None:
+        logger.addHandler(_handler(logging.FileHandler(run_dir / "bot.log", encoding="utf-8")))
+    logger.addHandler(_handler(logging.StreamHandler()))
+    return logger
 
-    formatter = logging.Formatter("%(asctime)s | %(levelname)s | %(message)s")
 
-    file_handler = logging.FileHandler(log_file, encoding="utf-8")
-    file_handler.setLevel(logging.INFO)
-    file_handler.setFormatter(formatter)
+def add_log_file(path: Path) -> logging.Handler:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    handler = _handler(logging.FileHandler(path, encoding="utf-8"))
+    logging.getLogger("rpa").addHandler(handler)
+    return handler
 
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.INFO)
-    console_handler.setFormatter(formatter)
 
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+def setup_profile_logging(run_dir: Path, profile_dirs: dict[str, Path]) -> logging.Logger:
+    # The shared bot.log and the console tag every line with its profile; each
+    # profile also gets a bot.log of its own in its run dir.
+    logger = setup_logging(run_dir)
+    for handler in logger.handlers:
+        handler.setFormatter(logging.Formatter(PROFILE_LOG_FORMAT))
+        handler.addFilter(_ProfileFilter())
+    for profile, profile_dir in profile_dirs.items():
+        handler = _handler(logging.FileHandler(profile_dir / "bot.log", encoding="utf-8"))
+        handler.addFilter(_ProfileFilter(profile))
+        logger.addHandler(handler)
     return logger
 
 
+def set_log_profile(profile: str) -> None:
+    _LOG_PROFILE.set(profile)
+
+
 def log_exception(logger: logging.Logger, message: str, *args: object) -> None:
     logger.exception(message, *args)
 
 
-def safe_screenshot(page, run_ctx: RunContext, name: str) -> None:
+def configure_evidence(config: Config) -> None:
+    global _POLICY, _RECENT
+    _POLICY = EvidencePolicy(
+        level=config.evidence_level,
+        image_format=config.evidence_format,
+        quality=config.evidence_quality,
+        full_page=config.evidence_full_page,
+        error_context=config.evidence_error_context,
+    )
+    _RECENT = deque(maxlen=_POLICY.error_context)
+
+
+def should_capture(kind: str) -> bool:
+    return kind == EVIDENCE_ERROR or kind in EVIDENCE_LEVELS[_POLICY.level]
+
+
+def screenshot_options() -> dict:
+    options = {"type": _POLICY.image_format, "full_page": _POLICY.full_page}
+    if _POLICY.image_format == "jpeg":
+        options["quality"] = _POLICY.quality
+    return options
+
+
+def store_evidence(run_ctx: RunContext, name: str, data: bytes, kind: str = EVIDENCE_STEP) -> None:
+    suffix = "jpg" if _POLICY.image_format == "jpeg" else "png"
+    path = run_ctx.screenshots_dir / f"{name}.{suffix}"
+    if kind == EVIDENCE_ERROR and _RECENT:
+        logger = logging.getLogger("rpa")
+        logger.info("Last steps before %s:", name)
+        while _RECENT:
+            logger.info("  %s", _RECENT.popleft())
+    _WRITER.submit(path, data)
+
+
+def flush_evidence() -> None:
+    _WRITER.flush()
+    if _WRITER.written:
+        logging.getLogger("rpa").info(
+            "Evidence: %s screenshots written (%.1f KB)",
+            _WRITER.written,
+            _WRITER.bytes_written / 1024,
+        )
+    # Counters start over for the next run of a long-lived (daemon) process.
+    _WRITER.written = 0
+    _WRITER.bytes_written = 0
+
+
+def _remember_step(page, name: str) -> None:
+    # A screenshot per step costs far more than the step itself; on_error only
+    # keeps where the flow was.
+    try:
+        title = page.title()
+    except Exception:
+        title = "?"
+    _RECENT.append(f"{datetime.now():%H:%M:%S} {name} {page.url} {title!r}")
+
+
+def safe_screenshot(page, run_ctx: RunContext, name: str, kind: str = EVIDENCE_STEP) -> None:
+    if not should_capture(kind):
+        if _POLICY.level == "on_error":
+            _remember_step(page, name)
+        return
     try:
-        path = run_ctx.screenshots_dir / f"{name}.png"
-        page.screenshot(path=path, full_page=True)
+        store_evidence(run_ctx, name, page.screenshot(**screenshot_options()), kind)
     except Exception:
         logging.getLogger("rpa").exception("Failed to capture screenshot: %s", name)
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import ContextDecorator
+from datetime import datetime
+from pathlib import Path
+
+METRICS_NAME = "metrics.json"
+TRACE_NAME = "trace.json"
+
+
+class _Recorder:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.origin = time.perf_counter()
+            self.started_at = datetime.now()
+            self.spans: list[dict] = []
+            self.latencies: dict[str, list[float]] = defaultdict(list)
+
+    def add_span(self, name: str, start: float, end: float, attrs: dict) -> None:
+        entry = {
+            "name": name,
+            "start": start - self.origin,
+            "duration": end - start,
+            "thread": threading.current_thread().name,
+            "tid": threading.get_ident(),
+            "attrs": attrs,
+        }
+        with self._lock:
+            self.spans.append(entry)
+
+    def add_latency(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.latencies[name].append(seconds)
+
+    def snapshot(self) -> tuple[list[dict], dict[str, list[float]]]:
+        with self._lock:
+            return list(self.spans), {name: list(values) for name, values in self.latencies.items()}
+
+
+_RECORDER = _Recorder()
+
+
+class span(ContextDecorator):
+    # Times a block or a function call; attributes set on the span while it is
+    # open (e.g. ``s.set(rows=n)``) end up in metrics.json and the trace.
+    def __init__(self, name: str, **attrs: object) -> None:
+        self.name = name
+        self.attrs = dict(attrs)
+        self._start = 0.0
+
+    def _recreate_cm(self) -> span:
+        # A fresh span per decorated call keeps nested and threaded calls apart.
+        return span(self.name, **self.attrs)
+
+    def set(self, **attrs: object) -> None:
+        self.attrs.update(attrs)
+
+    def __enter__(self) -> span:
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if exc_type is not None and issubclass(exc_type, Exception):
+            self.attrs["error"] = exc_type.__name__
+        _RECORDER.add_span(self.name, self._start, time.perf_counter(), self.attrs)
+        return False
+
+
+def record_latency(name: str, seconds: float) -> None:
+    _RECORDER.add_latency(name, seconds)
+
+
+def reset_metrics() -> None:
+    _RECORDER.reset()
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _span_summary(spans: list[dict]) -> dict:
+    summary: dict[str, dict] = {}
+    for entry in spans:
+        item = summary.setdefault(entry["name"], {"count": 0, "total_s": 0.0, "max_s": 0.0, "rows": 0})
+        item["count"] += 1
+        item["total_s"] += entry["duration"]
+        item["max_s"] = max(item["max_s"], entry["duration"])
+        item["rows"] += int(entry["attrs"].get("rows", 0) or 0)
+    for item in summary.values():
+        item["rows_per_s"] = round(item["rows"] / item["total_s"], 1) if item["rows"] and item["total_s"] else None
+        item["total_s"] = round(item["total_s"], 3)
+        item["max_s"] = round(item["max_s"], 3)
+    return summary
+
+
+def _latency_summary(latencies: dict[str, list[float]]) -> dict:
+    return {
+        name: {
+            "count": len(values),
+            "avg_ms": round(sum(values) / len(values) * 1000, 2),
+            "p50_ms": round(percentile(values, 50) * 1000, 2),
+            "p95_ms": round(percentile(values, 95) * 1000, 2),
+            "max_ms": round(max(values) * 1000, 2),
+        }
+        for name, values in sorted(latencies.items())
+        if values
+    }
+
+
+def _chrome_trace(spans: list[dict]) -> dict:
+    pid = os.getpid()
+    events = [
+        {
+            "name": entry["name"],
+            "ph": "X",
+            "ts": round(entry["start"] * 1_000_000),
+            "dur": round(entry["duration"] * 1_000_000),
+            "pid": pid,
+            "tid": entry["tid"],
+            "args": {key: str(value) for key, value in entry["attrs"].items()},
+        }
+        for entry in spans
+    ]
+    threads = {entry["tid"]: entry["thread"] for entry in spans}
+    events.extend(
+        {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+        for tid, name in threads.items()
+    )
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def write_metrics(run_dir: Path, chrome_trace: bool = False) -> Path:
+    spans, latencies = _RECORDER.snapshot()
+    metrics = {
+        "run": run_dir.name,
+        "started_at": _RECORDER.started_at.isoformat(timespec="seconds"),
+        "total_s": round(time.perf_counter() - _RECORDER.origin, 3),
+        "spans": _span_summary(spans),
+        "latencies": _latency_summary(latencies),
+    }
+    path = run_dir / METRICS_NAME
+    path.write_text(json.dumps(metrics, indent=2), encoding="utf-8")
+    logging.getLogger("rpa").info("Run metrics saved: %s", path)
+    if chrome_trace:
+        trace_path = run_dir / TRACE_NAME
+        trace_path.write_text(json.dumps(_chrome_trace(spans)), encoding="utf-8")
+        logging.getLogger("rpa").info("Chrome trace saved: %s", trace_path)
+    return path
@@ -1,19 +1,36 @@
 from __future__ import annotations
 
+import contextvars
 import logging
+import math
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Iterable, Iterator, TextIO
 
 import cx_Oracle
 
 from .config import Config
-from .transform import ReportRecord
+from .metrics import record_latency, span
+from .transform import ReportRecord, iter_chunks
 
 
 class OracleError(Exception):
     pass
 
 
+BATCH_FETCH_ARRAYSIZE = 1000
+
+_CLIENT_READY = False
+_CLIENT_LOCK = threading.Lock()
+# Kept open between runs in daemon mode; builds borrow sessions from it
+# instead of connecting (and it is never closed by a build).
+_SHARED_POOL: cx_Oracle.SessionPool | None = None
+
+
 @dataclass(frozen=True)
 class OracleOutputs:
     documentos_file: Path
@@ -21,8 +38,62 @@ class OracleOutputs:
 
 
 def _init_oracle_client(config: Config) -> None:
-    if config.oracle_lib_dir:
-        cx_Oracle.init_oracle_client(lib_dir=config.oracle_lib_dir)
+    # The client library can only be initialized once per process.
+    global _CLIENT_READY
+    with _CLIENT_LOCK:
+        if config.oracle_lib_dir and not _CLIENT_READY:
+            cx_Oracle.init_oracle_client(lib_dir=config.oracle_lib_dir)
+            _CLIENT_READY = True
+
+
+def _create_pool(config: Config) -> cx_Oracle.SessionPool:
+    try:
+        return cx_Oracle.SessionPool(
+            user=config.oracle_user,
+            password=config.oracle_password,
+            dsn=config.oracle_dsn,
+            min=1,
+            max=config.oracle_pool_size,
+            increment=1,
+            threaded=True,
+            getmode=cx_Oracle.SPOOL_ATTRVAL_WAIT,
+        )
+    except cx_Oracle.DatabaseError as exc:
+        raise OracleError(f"Error conectando a Oracle: {exc}") from exc
+
+
+def ensure_shared_pool(config: Config) -> None:
+    # Health check before a daemon run: ping one pooled session and reopen the
+    # pool if the database or the network dropped it since the last run.
+    global _SHARED_POOL
+    logger = logging.getLogger("rpa")
+    if _SHARED_POOL is not None:
+        started = time.perf_counter()
+        try:
+            conn = _SHARED_POOL.acquire()
+            try:
+                conn.ping()
+            finally:
+                _SHARED_POOL.release(conn)
+            logger.info("Oracle pool healthy (ping %.0f ms)", (time.perf_counter() - started) * 1000)
+            return
+        except cx_Oracle.DatabaseError as exc:
+            logger.warning("Oracle pool health check failed, reopening: %s", exc)
+            close_shared_pool()
+    _init_oracle_client(config)
+    _SHARED_POOL = _create_pool(config)
+    logger.info("Oracle pool opened: up to %s sessions", config.oracle_pool_size)
+
+
+def close_shared_pool() -> None:
+    global _SHARED_POOL
+    if _SHARED_POOL is None:
+        return
+    try:
+        _SHARED_POOL.close(force=True)
+    except cx_Oracle.DatabaseError:
+        logging.getLogger("rpa").warning("Oracle pool did not close cleanly", exc_info=True)
+    _SHARED_POOL = None
 
 
 def _proc_name(config: Config, base_name: str) -> str:
@@ -31,54 +102,218 @@ def _proc_name(config: Config, base_name: str) -> str:
     return base_name
 
 
-def _call_proc_rows(cursor: cx_Oracle.Cursor, proc: str, params: list) -> list[tuple]:
+def _call_proc_rows(
+    cursor: cx_Oracle.Cursor,
+    proc: str,
+    params: list,
+    arraysize: int | None = None,
+) -> list[tuple]:
+    started = time.perf_counter()
     out_cursor = cursor.connection.cursor()
+    if arraysize:
+        out_cursor.arraysize = arraysize
     cursor.callproc(proc, params + [out_cursor])
-    return out_cursor.fetchall()
+    rows = out_cursor.fetchall()
+    record_latency(f"oracle.{proc.rsplit('.', 1)[-1]}", time.perf_counter() - started)
+    return rows
 
 
-def build_oracle_files(
-    records: list[ReportRecord],
-    output_dir: Path,
+def _record_params(record: ReportRecord) -> list[int]:
+    return [int(record.cedula), int(record.monto)]
+
+
+def _load_batch(cursor: cx_Oracle.Cursor, config: Config, records: list[ReportRecord]) -> None:
+    # The batch table is a global temporary table, so rows are private to this session.
+    table = _proc_name(config, config.oracle_batch_table)
+    cursor.execute(f"DELETE FROM {table}")
+    cursor.executemany(
+        f"INSERT INTO {table} (SEQ, CEDULA, VALOR) VALUES (:1, :2, :3)",
+        [[seq] + _record_params(record) for seq, record in enumerate(records, start=1)],
+    )
+
+
+def _fetch_proc_chunk(
+    cursor: cx_Oracle.Cursor,
     config: Config,
-) -> OracleOutputs:
-    logger = logging.getLogger("rpa")
-    _init_oracle_client(config)
+    base_proc: str,
+    records: list[ReportRecord],
+) -> list[tuple]:
+    if config.oracle_batch_mode:
+        # *_LOTE wrappers (sql/02_rpa_lote.sql) run the per-record procedure for
+        # every row of the batch table and return the rows ordered by SEQ, so
+        # output matches the per-record path line for line.
+        _load_batch(cursor, config, records)
+        return _call_proc_rows(
+            cursor, _proc_name(config, f"{base_proc}_LOTE"), [], BATCH_FETCH_ARRAYSIZE
+        )
+    proc = _proc_name(config, base_proc)
+    rows: list[tuple] = []
+    for record in records:
+        rows.extend(_call_proc_rows(cursor, proc, _record_params(record)))
+    return rows
+
 
-    documentos_rows: list[tuple] = []
-    ahorros_rows: list[tuple] = []
+def _write_rows(handle: TextIO, rows: list[tuple]) -> None:
+    for row in rows:
+        handle.write("|".join("" if value is None else str(value) for value in row) + "\n")
 
+
+def _fetch_single(
+    config: Config,
+    chunks: Iterable[list[ReportRecord]],
+    documentos_handle: TextIO,
+    ahorros_handle: TextIO,
+) -> None:
+    logger = logging.getLogger("rpa")
+    pool = _SHARED_POOL
     try:
-        conn = cx_Oracle.connect(config.oracle_user, config.oracle_password, config.oracle_dsn)
+        if pool is not None:
+            conn = pool.acquire()
+        else:
+            conn = cx_Oracle.connect(config.oracle_user, config.oracle_password, config.oracle_dsn)
     except cx_Oracle.DatabaseError as exc:
         raise OracleError(f"Error conectando a Oracle: {exc}") from exc
 
+    if config.oracle_batch_mode:
+        logger.info("Oracle batch mode: batches of up to %s records", config.oracle_batch_size)
+
     try:
         cursor = conn.cursor()
-        proc_docs = _proc_name(config, "SP_DOCUMENTOSOPO")
-        proc_ahorros = _proc_name(config, "SP_CTAHORRO")
-
-        for record in records:
-            cedula = int(record.cedula)
-            valor = int(record.monto)
-            documentos_rows.extend(_call_proc_rows(cursor, proc_docs, [cedula, valor]))
-            ahorros_rows.extend(_call_proc_rows(cursor, proc_ahorros, [cedula, valor]))
-    except cx_Oracle.DatabaseError as exc:
-        raise OracleError(f"Error ejecutando procedimientos Oracle: {exc}") from exc
+        for chunk in chunks:
+            _write_rows(documentos_handle, _fetch_proc_chunk(cursor, config, "SP_DOCUMENTOSOPO", chunk))
+            _write_rows(ahorros_handle, _fetch_proc_chunk(cursor, config, "SP_CTAHORRO", chunk))
     finally:
-        conn.close()
+        if pool is not None:
+            pool.release(conn)
+        else:
+            conn.close()
+
+
+def _pooled_task(
+    pool: cx_Oracle.SessionPool,
+    config: Config,
+    base_proc: str,
+    chunk_idx: int,
+    records: list[ReportRecord],
+) -> tuple[list[tuple], str, float]:
+    started = time.perf_counter()
+    conn = pool.acquire()
+    try:
+        with span("oracle.chunk", proc=base_proc, chunk=chunk_idx, rows=len(records)):
+            rows = _fetch_proc_chunk(conn.cursor(), config, base_proc, records)
+    finally:
+        pool.release(conn)
+    elapsed = time.perf_counter() - started
+    worker = threading.current_thread().name
+    logging.getLogger("rpa").info(
+        "Oracle %s: %s chunk %s (%s records) in %.2fs",
+        worker,
+        base_proc,
+        chunk_idx,
+        len(records),
+        elapsed,
+    )
+    return rows, worker, elapsed
+
+
+def _fetch_pooled(
+    config: Config,
+    chunks: Iterable[list[ReportRecord]],
+    documentos_handle: TextIO,
+    ahorros_handle: TextIO,
+) -> None:
+    logger = logging.getLogger("rpa")
+    pool_size = config.oracle_pool_size
+    logger.info("Oracle pool: %s sessions", pool_size)
+    pool = _SHARED_POOL or _create_pool(config)
+
+    busy: dict[str, list[float]] = defaultdict(list)
+    pending: deque[tuple[Future, Future]] = deque()
+
+    def drain_oldest() -> None:
+        # Chunks are written in submission order to keep input order in the output.
+        for future, handle in zip(pending.popleft(), (documentos_handle, ahorros_handle)):
+            rows, worker, elapsed = future.result()
+            _write_rows(handle, rows)
+            busy[worker].append(elapsed)
+
+    try:
+        with ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="oracle") as executor:
+
+            def submit(base_proc: str, idx: int, chunk: list[ReportRecord]) -> Future:
+                # Each task runs in a copy of the caller's context (log profile).
+                context = contextvars.copy_context()
+                return executor.submit(context.run, _pooled_task, pool, config, base_proc, idx, chunk)
+
+            for idx, chunk in enumerate(chunks):
+                pending.append(
+                    (
+                        submit("SP_DOCUMENTOSOPO", idx, chunk),
+                        submit("SP_CTAHORRO", idx, chunk),
+                    )
+                )
+                # Bound the chunks held in memory while upstream keeps producing.
+                if len(pending) >= pool_size * 2:
+                    drain_oldest()
+            while pending:
+                drain_oldest()
+    finally:
+        if pool is not _SHARED_POOL:
+            pool.close(force=True)
+
+    for worker, timings in sorted(busy.items()):
+        logger.info(
+            "Oracle %s: %s tasks, %.2fs busy, %.2fs avg",
+            worker,
+            len(timings),
+            sum(timings),
+            sum(timings) / len(timings),
+        )
+
+
+def _counted(chunks: Iterable[list[ReportRecord]], counter: span) -> Iterator[list[ReportRecord]]:
+    for chunk in chunks:
+        counter.set(rows=counter.attrs.get("rows", 0) + len(chunk))
+        yield chunk
+
+
+def build_oracle_files_from_chunks(
+    chunks: Iterable[list[ReportRecord]],
+    output_dir: Path,
+    config: Config,
+) -> OracleOutputs:
+    logger = logging.getLogger("rpa")
+    _init_oracle_client(config)
 
     documentos_file = output_dir / "documentos_soporte.csv"
     ahorros_file = output_dir / "ahorros.csv"
 
-    with documentos_file.open("w", encoding=config.output_encoding, newline="\n") as handle:
-        for row in documentos_rows:
-            handle.write("|".join("" if value is None else str(value) for value in row) + "\n")
-
-    with ahorros_file.open("w", encoding=config.output_encoding, newline="\n") as handle:
-        for row in ahorros_rows:
-            handle.write("|".join("" if value is None else str(value) for value in row) + "\n")
+    try:
+        with (
+            span("oracle.build", pool_size=config.oracle_pool_size) as build_span,
+            documentos_file.open("w", encoding=config.output_encoding, newline="\n") as documentos_handle,
+            ahorros_file.open("w", encoding=config.output_encoding, newline="\n") as ahorros_handle,
+        ):
+            chunks = _counted(chunks, build_span)
+            if config.oracle_pool_size > 1:
+                _fetch_pooled(config, chunks, documentos_handle, ahorros_handle)
+            else:
+                _fetch_single(config, chunks, documentos_handle, ahorros_handle)
+    except cx_Oracle.DatabaseError as exc:
+        raise OracleError(f"Error ejecutando procedimientos Oracle: {exc}") from exc
 
     logger.info("Oracle output saved: %s", documentos_file)
     logger.info("Oracle output saved: %s", ahorros_file)
     return OracleOutputs(documentos_file=documentos_file, ahorros_file=ahorros_file)
+
+
+def build_oracle_files(
+    records: list[ReportRecord],
+    output_dir: Path,
+    config: Config,
+) -> OracleOutputs:
+    chunk_size = config.oracle_batch_size
+    if config.oracle_pool_size > 1:
+        # Split small reports evenly across workers; large ones are capped at the batch size.
+        chunk_size = min(chunk_size, max(1, math.ceil(len(records) / config.oracle_pool_size)))
+    return build_oracle_files_from_chunks(iter_chunks(records, chunk_size), output_dir, config)
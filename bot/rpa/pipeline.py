@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import contextvars
+import logging
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator, Sequence
+
+from .config import Config, RunContext
+from .transform import RecordFilter, ReportRecord, linix_output_path, stream_transform
+
+if TYPE_CHECKING:
+    from .oracle_proc import OracleOutputs
+
+_DONE = object()
+
+
+class _Producer(threading.Thread):
+    # Parses the report (and writes the LINIX file) ahead of the consumer,
+    # handing chunks over through a bounded queue.
+    def __init__(self, chunks: Iterator[list[ReportRecord]], handoff: queue.Queue) -> None:
+        super().__init__(name="transform", daemon=True)
+        self.chunks = chunks
+        self.handoff = handoff
+        self.stop = threading.Event()
+        self.blocked = 0.0
+        self.elapsed = 0.0
+        # Log lines from this thread keep the caller's profile.
+        self._context = contextvars.copy_context()
+
+    def _put(self, item: object) -> bool:
+        started = time.perf_counter()
+        try:
+            while not self.stop.is_set():
+                try:
+                    self.handoff.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        finally:
+            self.blocked += time.perf_counter() - started
+
+    def run(self) -> None:
+        self._context.run(self._produce)
+
+    def _produce(self) -> None:
+        started = time.perf_counter()
+        try:
+            for chunk in self.chunks:
+                if not self._put(chunk):
+                    self.chunks.close()
+                    return
+            item = _DONE
+        except BaseException as exc:
+            item = exc
+        try:
+            self._put(item)
+        finally:
+            self.elapsed = time.perf_counter() - started
+
+
+def _consume(handoff: queue.Queue) -> Iterator[list[ReportRecord]]:
+    while True:
+        item = handoff.get()
+        if item is _DONE:
+            return
+        if isinstance(item, BaseException):
+            raise item
+        yield item
+
+
+def run_overlapped(
+    input_paths: Path | Sequence[Path],
+    config: Config,
+    run_ctx: RunContext,
+    record_filter: RecordFilter | None = None,
+) -> tuple[Path, OracleOutputs | None]:
+    logger = logging.getLogger("rpa")
+    chunks = stream_transform(
+        input_paths,
+        run_ctx.outputs_dir,
+        config.output_encoding,
+        config.periodicidad_default,
+        config.transform_chunk_size,
+        config.transform_xlsx_engine,
+        config.transform_columnar,
+        record_filter,
+    )
+    producer = _Producer(chunks, queue.Queue(maxsize=config.pipeline_queue_chunks))
+    started = time.perf_counter()
+    producer.start()
+    oracle_outputs = None
+    try:
+        if config.enable_oracle:
+            from .oracle_proc import build_oracle_files_from_chunks
+
+            oracle_outputs = build_oracle_files_from_chunks(
+                _consume(producer.handoff), run_ctx.outputs_dir, config
+            )
+        else:
+            for _ in _consume(producer.handoff):
+                pass
+    finally:
+        producer.stop.set()
+        producer.join()
+
+    # Parse time excludes the time spent waiting for room in the queue, so it
+    # can be compared with the total to see which side is the bottleneck.
+    logger.info(
+        "Overlapped pipeline: parse %.2fs (%.2fs waiting on Oracle), total %.2fs",
+        producer.elapsed - producer.blocked,
+        producer.blocked,
+        time.perf_counter() - started,
+    )
+    return linix_output_path(run_ctx.outputs_dir), oracle_outputs
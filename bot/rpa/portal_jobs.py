@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+import time
+from datetime import date
+from pathlib import Path
+
+from playwright.async_api import BrowserContext, Page, async_playwright
+
+from .browser import LEAN_CHROMIUM_ARGS, apply_lean_routes_async
+from .config import Config, ReportJob, RunContext
+from .download import PORTAL_SESSION, DownloadError, format_report_date
+from .logging_utils import EVIDENCE_ERROR, screenshot_options, should_capture, store_evidence
+from .metrics import span
+from .sessions import load_session_state, save_session_state_async, session_is_active_async
+from .selectors import (
+    PORTAL_LOGIN_PASSWORD,
+    PORTAL_LOGIN_SUBMIT,
+    PORTAL_LOGIN_SUCCESS,
+    PORTAL_LOGIN_USERNAME,
+    PORTAL_MENU_REPORTS,
+    PORTAL_REPORT_END_DATE,
+    PORTAL_REPORT_GENERATE_BUTTON,
+    PORTAL_REPORT_START_DATE,
+    PORTAL_REPORT_TYPE_SELECT,
+)
+
+
+def _job_dates(job: ReportJob) -> tuple[date, date]:
+    start = job.start or date.today()
+    return start, job.end or start
+
+
+def job_stem(job: ReportJob, run_ctx: RunContext, index: int) -> str:
+    # The position in the job list keeps names apart when two types slug alike
+    # ("Desembolsos A" / "desembolsos-a") and sorts files in job order.
+    start, end = _job_dates(job)
+    slug = re.sub(r"[^0-9a-z]+", "_", job.report_type.lower()).strip("_") or "reporte"
+    return f"{run_ctx.run_dir.name}_{index + 1:02d}_{slug}_{start:%Y%m%d}_{end:%Y%m%d}"
+
+
+async def _screenshot(page: Page, run_ctx: RunContext, name: str, kind: str = EVIDENCE_ERROR) -> None:
+    if not should_capture(kind):
+        return
+    try:
+        store_evidence(run_ctx, name, await page.screenshot(**screenshot_options()), kind)
+    except Exception:
+        logging.getLogger("rpa").exception("Failed to capture screenshot: %s", name)
+
+
+async def _ensure_login(context: BrowserContext, config: Config, run_ctx: RunContext) -> None:
+    logger = logging.getLogger("rpa")
+    page = await context.new_page()
+    try:
+        if config.session_reuse and await session_is_active_async(
+            page, config.portal_url, PORTAL_LOGIN_USERNAME, PORTAL_MENU_REPORTS or PORTAL_REPORT_TYPE_SELECT
+        ):
+            logger.info("Portal session reused; skipping login")
+            return
+        login_url = config.portal_login_url or config.portal_url
+        logger.info("Portal login: %s", login_url)
+        await page.goto(login_url, wait_until="domcontentloaded")
+        await page.fill(PORTAL_LOGIN_USERNAME, config.portal_username)
+        await page.fill(PORTAL_LOGIN_PASSWORD, config.portal_password)
+        await page.click(PORTAL_LOGIN_SUBMIT)
+        await page.wait_for_selector(PORTAL_LOGIN_SUCCESS)
+        await save_session_state_async(context, config, PORTAL_SESSION)
+    except Exception:
+        await _screenshot(page, run_ctx, "portal_error_login")
+        raise
+    finally:
+        await page.close()
+
+
+async def _download_job(
+    context: BrowserContext,
+    semaphore: asyncio.Semaphore,
+    job: ReportJob,
+    index: int,
+    config: Config,
+    run_ctx: RunContext,
+) -> Path:
+    logger = logging.getLogger("rpa")
+    stem = job_stem(job, run_ctx, index)
+    async with semaphore:
+        with span("portal.report_job", job=stem):
+            started = time.perf_counter()
+            page = await context.new_page()
+            try:
+                await page.goto(config.portal_url, wait_until="domcontentloaded")
+                if PORTAL_MENU_REPORTS:
+                    await page.click(PORTAL_MENU_REPORTS)
+                await page.wait_for_selector(PORTAL_REPORT_TYPE_SELECT)
+                if job.report_type:
+                    await page.select_option(PORTAL_REPORT_TYPE_SELECT, label=job.report_type)
+                start, end = _job_dates(job)
+                await page.fill(PORTAL_REPORT_START_DATE, format_report_date(config, start))
+                await page.fill(PORTAL_REPORT_END_DATE, format_report_date(config, end))
+
+                async with page.expect_download(timeout=config.nav_timeout_ms) as download_info:
+                    await page.click(PORTAL_REPORT_GENERATE_BUTTON)
+                download = await download_info.value
+                suffix = Path(download.suggested_filename or "reporte.xlsx").suffix or ".xlsx"
+                dest = run_ctx.downloads_dir / f"{stem}{suffix}"
+                await download.save_as(dest)
+                logger.info("Report job %s downloaded in %.2fs: %s", stem, time.perf_counter() - started, dest)
+                return dest
+            except Exception:
+                logger.exception("Report job failed: %s", stem)
+                await _screenshot(page, run_ctx, f"portal_error_{stem}")
+                raise
+            finally:
+                await page.close()
+
+
+async def _download_reports(config: Config, run_ctx: RunContext, jobs: list[ReportJob]) -> list[Path]:
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(
+            headless=config.headless,
+            slow_mo=config.slow_mo_ms,
+            args=LEAN_CHROMIUM_ARGS if config.browser_lean else [],
+        )
+        context = await browser.new_context(
+            accept_downloads=True,
+            storage_state=load_session_state(config, PORTAL_SESSION),
+        )
+        try:
+            context.set_default_timeout(config.timeout_ms)
+            context.set_default_navigation_timeout(config.nav_timeout_ms)
+            await apply_lean_routes_async(context, config)
+            if config.portal_needs_login:
+                await _ensure_login(context, config, run_ctx)
+            # One login, then every job gets its own page in the same context.
+            semaphore = asyncio.Semaphore(config.portal_download_concurrency)
+            results = await asyncio.gather(
+                *(
+                    _download_job(context, semaphore, job, index, config, run_ctx)
+                    for index, job in enumerate(jobs)
+                ),
+                return_exceptions=True,
+            )
+        finally:
+            await context.close()
+            await browser.close()
+
+    failed = [
+        job_stem(job, run_ctx, index)
+        for index, (job, result) in enumerate(zip(jobs, results))
+        if isinstance(result, BaseException)
+    ]
+    if failed:
+        raise DownloadError(f"{len(failed)} of {len(jobs)} report jobs failed: {', '.join(failed)}")
+    return results
+
+
+def download_portal_reports(config: Config, run_ctx: RunContext, jobs: list[ReportJob]) -> list[Path]:
+    logger = logging.getLogger("rpa")
+    logger.info(
+        "Downloading %s report jobs (concurrency %s)",
+        len(jobs),
+        config.portal_download_concurrency,
+    )
+    started = time.perf_counter()
+    try:
+        paths = asyncio.run(_download_reports(config, run_ctx, jobs))
+    except DownloadError:
+        raise
+    except Exception as exc:
+        logger.exception("Download failed")
+        raise DownloadError(str(exc)) from exc
+    logger.info("Report jobs downloaded in %.2fs", time.perf_counter() - started)
+    return paths
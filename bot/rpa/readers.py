@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import csv
+import re
+import zipfile
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterator
+from xml.etree.ElementTree import iterparse, parse
+
+from openpyxl import load_workbook
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format
+from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900, from_excel
+
+RowReader = Callable[[Path], Iterator[tuple]]
+
+_NS_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_NS_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_NS_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+_CELL_REF_RE = re.compile(r"([A-Z]+)(\d+)")
+_CSV_DELIMITERS = ",;|\t"
+_CSV_SAMPLE_BYTES = 64 * 1024
+# Plain decimals only: "1.500.000" (thousands separators) has no single point.
+_CSV_DECIMAL_RE = re.compile(r"-?\d+\.\d+")
+
+
+def read_rows_openpyxl(input_path: Path) -> Iterator[tuple]:
+    wb = load_workbook(input_path, read_only=True, data_only=True)
+    try:
+        yield from wb.active.iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+
+def _column_index(letters: str) -> int:
+    index = 0
+    for char in letters:
+        index = index * 26 + (ord(char) - 64)
+    return index - 1
+
+
+def _zip_path(target: str) -> str:
+    if target.startswith("/"):
+        return target.lstrip("/")
+    return f"xl/{target}"
+
+
+def _active_sheet_path(archive: zipfile.ZipFile) -> tuple[str, datetime]:
+    with archive.open("xl/workbook.xml") as handle:
+        workbook = parse(handle).getroot()
+    sheets = workbook.findall(f"{_NS_MAIN}sheets/{_NS_MAIN}sheet")
+    view = workbook.find(f"{_NS_MAIN}bookViews/{_NS_MAIN}workbookView")
+    active = int(view.get("activeTab", "0")) if view is not None else 0
+    sheet = sheets[min(active, len(sheets) - 1)]
+
+    props = workbook.find(f"{_NS_MAIN}workbookPr")
+    date1904 = props is not None and props.get("date1904", "").lower() in {"1", "true"}
+    epoch = CALENDAR_MAC_1904 if date1904 else CALENDAR_WINDOWS_1900
+
+    with archive.open("xl/_rels/workbook.xml.rels") as handle:
+        rels = parse(handle).getroot()
+    targets = {rel.get("Id"): rel.get("Target", "") for rel in rels.iter(f"{_NS_PKG_REL}Relationship")}
+    return _zip_path(targets[sheet.get(f"{_NS_REL}id")]), epoch
+
+
+def _shared_strings(archive: zipfile.ZipFile) -> list[str]:
+    if "xl/sharedStrings.xml" not in archive.namelist():
+        return []
+    strings: list[str] = []
+    with archive.open("xl/sharedStrings.xml") as handle:
+        for _, elem in iterparse(handle, events=("end",)):
+            if elem.tag != f"{_NS_MAIN}si":
+                continue
+            # Plain strings keep text in <t>; rich text splits it across <r><t>.
+            # Phonetic runs (<rPh>) are not part of the value.
+            parts = [child.text or "" for child in elem if child.tag == f"{_NS_MAIN}t"]
+            for run in elem.iterfind(f"{_NS_MAIN}r"):
+                parts.extend(t.text or "" for t in run.iterfind(f"{_NS_MAIN}t"))
+            strings.append("".join(parts))
+            elem.clear()
+    return strings
+
+
+def _date_styles(archive: zipfile.ZipFile) -> set[int]:
+    if "xl/styles.xml" not in archive.namelist():
+        return set()
+    with archive.open("xl/styles.xml") as handle:
+        styles = parse(handle).getroot()
+    formats = {int(key): value for key, value in BUILTIN_FORMATS.items()}
+    for num_fmt in styles.iterfind(f"{_NS_MAIN}numFmts/{_NS_MAIN}numFmt"):
+        formats[int(num_fmt.get("numFmtId", "0"))] = num_fmt.get("formatCode", "")
+    date_styles: set[int] = set()
+    for idx, xf in enumerate(styles.iterfind(f"{_NS_MAIN}cellXfs/{_NS_MAIN}xf")):
+        if is_date_format(formats.get(int(xf.get("numFmtId", "0")))):
+            date_styles.add(idx)
+    return date_styles
+
+
+def _cast_number(text: str) -> int | float:
+    # Same rule openpyxl uses for numeric cells.
+    if "." in text or "E" in text or "e" in text:
+        return float(text)
+    return int(text)
+
+
+def read_rows_xlsx_xml(input_path: Path) -> Iterator[tuple]:
+    with zipfile.ZipFile(input_path) as archive:
+        sheet_path, epoch = _active_sheet_path(archive)
+        shared = _shared_strings(archive)
+        date_styles = _date_styles(archive)
+
+        row_tag = f"{_NS_MAIN}row"
+        value_tag = f"{_NS_MAIN}v"
+        inline_tag = f"{_NS_MAIN}is"
+        text_tag = f"{_NS_MAIN}t"
+
+        expected_row = 1
+        with archive.open(sheet_path) as handle:
+            for _, elem in iterparse(handle, events=("end",)):
+                if elem.tag != row_tag:
+                    continue
+                row_number = int(elem.get("r", expected_row))
+                # Gaps in the sheet are empty rows, as openpyxl reports them.
+                while expected_row < row_number:
+                    yield ()
+                    expected_row += 1
+
+                values: dict[int, object] = {}
+                next_col = 0
+                for cell in elem:
+                    match = _CELL_REF_RE.match(cell.get("r", ""))
+                    col = _column_index(match.group(1)) if match else next_col
+                    next_col = col + 1
+
+                    cell_type = cell.get("t", "n")
+                    if cell_type == "inlineStr":
+                        inline = cell.find(inline_tag)
+                        if inline is not None:
+                            values[col] = "".join(t.text or "" for t in inline.iter(text_tag))
+                        continue
+                    value_elem = cell.find(value_tag)
+                    if value_elem is None or value_elem.text is None:
+                        continue
+                    text = value_elem.text
+                    if cell_type == "s":
+                        values[col] = shared[int(text)]
+                    elif cell_type == "b":
+                        values[col] = text == "1"
+                    elif cell_type in {"str", "e"}:
+                        values[col] = text
+                    elif cell_type == "d":
+                        values[col] = datetime.fromisoformat(text)
+                    else:
+                        number = _cast_number(text)
+                        if int(cell.get("s", "0")) in date_styles:
+                            values[col] = from_excel(number, epoch)
+                        else:
+                            values[col] = number
+
+                width = max(values) + 1 if values else 0
+                yield tuple(values.get(i) for i in range(width))
+                expected_row = row_number + 1
+                elem.clear()
+
+
+def _csv_encoding(sample: bytes) -> str:
+    try:
+        sample.decode("utf-8-sig")
+    except UnicodeDecodeError as exc:
+        # A multi-byte character cut at the end of the sample is still UTF-8.
+        if exc.start < len(sample) - 3:
+            return "cp1252"
+    return "utf-8-sig"
+
+
+def _csv_cell(cell: str) -> object:
+    # Empty CSV fields map to None, as empty XLSX cells do, and decimals to a
+    # float, as numeric XLSX cells do; "1500000.00" as text would lose the point
+    # but keep the cents when digits are extracted.
+    if cell == "":
+        return None
+    if _CSV_DECIMAL_RE.fullmatch(cell):
+        return float(cell)
+    return cell
+
+
+def read_rows_csv(input_path: Path) -> Iterator[tuple]:
+    with input_path.open("rb") as raw:
+        sample = raw.read(_CSV_SAMPLE_BYTES)
+    encoding = _csv_encoding(sample)
+    text_sample = sample.decode(encoding, errors="ignore")
+    # csv.Sniffer gives up on reports with a title line above the header, so the
+    # most frequent candidate delimiter wins instead.
+    delimiter = max(_CSV_DELIMITERS, key=text_sample.count)
+    if not text_sample.count(delimiter):
+        delimiter = ","
+
+    with input_path.open("r", encoding=encoding, newline="") as handle:
+        for row in csv.reader(handle, delimiter=delimiter):
+            yield tuple(_csv_cell(cell) for cell in row)
+
+
+ROW_READERS: dict[str, RowReader] = {
+    "openpyxl": read_rows_openpyxl,
+    "xml": read_rows_xlsx_xml,
+    "csv": read_rows_csv,
+}
+
+
+def select_reader(input_path: Path, xlsx_engine: str) -> str:
+    if input_path.suffix.lower() in {".csv", ".txt"}:
+        return "csv"
+    if zipfile.is_zipfile(input_path):
+        return xlsx_engine if xlsx_engine in ROW_READERS and xlsx_engine != "csv" else "openpyxl"
+    return "csv"
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import time
+from email.message import Message
+from pathlib import Path
+from typing import TYPE_CHECKING
+from urllib.error import URLError
+from urllib.parse import quote, quote_plus, urlsplit
+from urllib.request import Request, urlopen
+
+from .config import Config, RunContext
+from .metrics import span
+from .sessions import load_session_state
+
+if TYPE_CHECKING:
+    from playwright.sync_api import Request as PlaywrightRequest
+
+REPORT_REQUEST_NAME = "portal_report_request.json"
+DATE_PLACEHOLDER = "{report_date}"
+REPLAY_HEADERS = {"accept", "content-type", "origin", "referer", "user-agent"}
+
+
+class ReportApiError(Exception):
+    pass
+
+
+def _request_path(config: Config) -> Path:
+    return config.session_dir / REPORT_REQUEST_NAME
+
+
+def _with_placeholder(text: str | None, report_date: str) -> str | None:
+    if not text:
+        return text
+    # Dates show up raw in JSON bodies and URL-encoded in forms and query strings.
+    for encoded in {report_date, quote(report_date, safe=""), quote_plus(report_date)}:
+        text = text.replace(encoded, DATE_PLACEHOLDER)
+    return text
+
+
+def record_report_request(
+    requests: list[PlaywrightRequest],
+    download_url: str,
+    report_date: str,
+    config: Config,
+) -> None:
+    logger = logging.getLogger("rpa")
+    matches = [request for request in requests if request.url == download_url]
+    if not matches or not download_url.startswith("http"):
+        logger.info("API mode: report request not replayable (%s)", download_url[:80])
+        return
+    request = matches[-1]
+    headers = {
+        name: value
+        for name, value in request.headers.items()
+        if name.lower() in REPLAY_HEADERS or name.lower().startswith("x-")
+    }
+    recorded = {
+        "method": request.method,
+        "url": _with_placeholder(request.url, report_date),
+        "post_data": _with_placeholder(request.post_data, report_date),
+        "headers": headers,
+        "date_format": config.portal_date_format,
+    }
+    path = _request_path(config)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(recorded, indent=2), encoding="utf-8")
+    os.chmod(path, 0o600)
+    logger.info("API mode: report request recorded (%s %s)", request.method, urlsplit(request.url).path)
+
+
+def _cookie_header(state: dict, url: str) -> str:
+    parts = urlsplit(url)
+    host = parts.hostname or ""
+    path = parts.path or "/"
+    now = time.time()
+    cookies = state.get("cookies", [])
+    pairs = []
+    for cookie in cookies:
+        domain = cookie.get("domain", "").lstrip(".")
+        if host != domain and not host.endswith(f".{domain}"):
+            continue
+        if not path.startswith(cookie.get("path", "/")):
+            continue
+        if cookie.get("secure") and parts.scheme != "https":
+            continue
+        expires = cookie.get("expires", -1)
+        if expires not in (-1, None) and expires < now:
+            continue
+        pairs.append(f"{cookie['name']}={cookie['value']}")
+    return "; ".join(pairs)
+
+
+def _suggested_filename(headers: Message) -> str | None:
+    filename = headers.get_filename()
+    if filename:
+        return Path(filename).name
+    match = re.search(r"filename\*=UTF-8''([^;]+)", headers.get("Content-Disposition", ""))
+    return Path(match.group(1)).name if match else None
+
+
+@span("portal.api_fetch")
+def fetch_report_via_api(config: Config, run_ctx: RunContext, report_date: str) -> Path:
+    logger = logging.getLogger("rpa")
+    request_path = _request_path(config)
+    if not request_path.exists():
+        raise ReportApiError("no recorded report request yet")
+    recorded = json.loads(request_path.read_text(encoding="utf-8"))
+    if recorded.get("date_format") != config.portal_date_format:
+        raise ReportApiError("recorded request uses a different PORTAL_DATE_FORMAT")
+
+    url = recorded["url"].replace(DATE_PLACEHOLDER, quote(report_date, safe=""))
+    body = recorded.get("post_data")
+    if body:
+        encode = quote_plus if "urlencoded" in recorded["headers"].get("content-type", "") else str
+        body = body.replace(DATE_PLACEHOLDER, encode(report_date))
+
+    headers = dict(recorded["headers"])
+    if config.portal_needs_login:
+        state = load_session_state(config, "portal")
+        if not state:
+            raise ReportApiError("no saved portal session")
+        headers["Cookie"] = _cookie_header(state, url)
+
+    request = Request(
+        url,
+        data=body.encode("utf-8") if body else None,
+        headers=headers,
+        method=recorded["method"],
+    )
+    started = time.perf_counter()
+    try:
+        with urlopen(request, timeout=config.nav_timeout_ms / 1000) as response:
+            content_type = response.headers.get("Content-Type", "")
+            suggested = _suggested_filename(response.headers)
+            # An HTML answer means the portal served its login or an error page.
+            if "text/html" in content_type and not suggested:
+                raise ReportApiError(f"unexpected {content_type} response (session rejected?)")
+            suggested = suggested or "reporte.xlsx"
+            dest = run_ctx.downloads_dir / f"{run_ctx.run_dir.name}_{suggested}"
+            with dest.open("wb") as handle:
+                while block := response.read(1024 * 1024):
+                    handle.write(block)
+    except (URLError, OSError) as exc:
+        raise ReportApiError(str(exc)) from exc
+
+    if dest.stat().st_size == 0:
+        dest.unlink()
+        raise ReportApiError("empty report response")
+    logger.info(
+        "API mode: report downloaded without browser in %.2fs: %s",
+        time.perf_counter() - started,
+        dest,
+    )
+    return dest
@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import csv
+import html
+import json
+import logging
+import re
+from datetime import datetime
+from pathlib import Path
+
+from .metrics import METRICS_NAME, percentile
+from .transform import linix_output_path
+
+INDEX_NAME = ".report_index.json"
+RUN_DIR_RE = re.compile(r"^\d{8}_\d{6}$")
+LOG_LINE_RE = re.compile(r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}),\d+ \| \w+ \| (.*)$")
+
+STAGES = ("download", "transform", "oracle", "linix")
+# Metrics where a higher value is not a slowdown (report volume).
+VOLUME_METRICS = {"records"}
+TREND_METRICS = (
+    "total_s",
+    *(f"{stage}_s" for stage in STAGES),
+    "records",
+    "s_per_1k_records",
+    "oracle_p95_ms",
+)
+# Older runs have no metrics.json: stage ends are taken from these log lines.
+LOG_STAGE_MARKERS = (
+    ("download", "Downloaded file saved"),
+    ("download", "API mode: report downloaded"),
+    ("download", "Report jobs downloaded"),
+    ("transform", "Transformed file saved"),
+    ("oracle", "Oracle output saved"),
+    ("linix", "Run completed OK."),
+)
+
+
+def _signature(run_dir: Path) -> list[int]:
+    signature = []
+    for name in ("bot.log", METRICS_NAME):
+        path = run_dir / name
+        stat = path.stat() if path.exists() else None
+        signature.extend([stat.st_mtime_ns, stat.st_size] if stat else [0, 0])
+    return signature
+
+
+def _count_lines(path: Path) -> int | None:
+    if not path.exists():
+        return None
+    with path.open("rb") as handle:
+        return sum(1 for _ in handle)
+
+
+def _read_log(run_dir: Path) -> list[tuple[datetime, str]]:
+    path = run_dir / "bot.log"
+    if not path.exists():
+        return []
+    entries = []
+    with path.open("r", encoding="utf-8", errors="replace") as handle:
+        for line in handle:
+            match = LOG_LINE_RE.match(line.rstrip("\n"))
+            if match:
+                entries.append((datetime.strptime(match.group(1), "%Y-%m-%d %H:%M:%S"), match.group(2)))
+    return entries
+
+
+def _log_status(entries: list[tuple[datetime, str]]) -> str:
+    for _, message in reversed(entries):
+        if message.startswith("Run completed OK"):
+            return "ok"
+        if message.startswith(("Run failed", "Unexpected error")):
+            return "failed"
+    return "unknown"
+
+
+def _log_stage_durations(entries: list[tuple[datetime, str]]) -> dict[str, float]:
+    durations: dict[str, float] = {}
+    if not entries:
+        return durations
+    previous = entries[0][0]
+    for stamp, message in entries:
+        for stage, marker in LOG_STAGE_MARKERS:
+            if message.startswith(marker):
+                durations[f"{stage}_s"] = durations.get(f"{stage}_s", 0.0) + (stamp - previous).total_seconds()
+                previous = stamp
+                break
+    return durations
+
+
+def summarize_run(run_dir: Path) -> dict:
+    entries = _read_log(run_dir)
+    summary: dict = {
+        "run": run_dir.name,
+        "started_at": datetime.strptime(run_dir.name, "%Y%m%d_%H%M%S").isoformat(),
+        "status": _log_status(entries),
+        "source": "log",
+        "total_s": (entries[-1][0] - entries[0][0]).total_seconds() if entries else None,
+        "records": _count_lines(linix_output_path(run_dir / "outputs")),
+        "oracle_p95_ms": None,
+    }
+    summary.update({f"{stage}_s": None for stage in STAGES})
+
+    metrics_path = run_dir / METRICS_NAME
+    if metrics_path.exists():
+        metrics = json.loads(metrics_path.read_text(encoding="utf-8"))
+        spans = metrics.get("spans", {})
+        latencies = metrics.get("latencies", {})
+        summary["source"] = "metrics"
+        summary["total_s"] = metrics.get("total_s")
+        for stage in STAGES:
+            summary[f"{stage}_s"] = spans.get(f"stage.{stage}", {}).get("total_s")
+        parsed = spans.get("transform.parse", {}).get("rows")
+        if parsed and summary["records"] is None:
+            summary["records"] = parsed
+        oracle_p95 = [item["p95_ms"] for name, item in latencies.items() if name.startswith("oracle.")]
+        summary["oracle_p95_ms"] = max(oracle_p95) if oracle_p95 else None
+    else:
+        summary.update(_log_stage_durations(entries))
+
+    if summary["records"] and summary["total_s"]:
+        summary["s_per_1k_records"] = round(summary["total_s"] / summary["records"] * 1000, 3)
+    else:
+        summary["s_per_1k_records"] = None
+    return summary
+
+
+def scan_runs(runs_dir: Path, index_path: Path | None = None) -> list[dict]:
+    # Runs are parsed once and cached by the size/mtime of bot.log and
+    # metrics.json, so a rescan only reads new or still-running runs.
+    logger = logging.getLogger("rpa")
+    index_path = index_path or runs_dir / INDEX_NAME
+    index: dict[str, dict] = {}
+    if index_path.exists():
+        index = json.loads(index_path.read_text(encoding="utf-8")).get("runs", {})
+
+    updated: dict[str, dict] = {}
+    parsed = 0
+    for run_dir in sorted(path for path in runs_dir.iterdir() if path.is_dir() and RUN_DIR_RE.match(path.name)):
+        signature = _signature(run_dir)
+        cached = index.get(run_dir.name)
+        if cached and cached["signature"] == signature:
+            updated[run_dir.name] = cached
+            continue
+        updated[run_dir.name] = {"signature": signature, "summary": summarize_run(run_dir)}
+        parsed += 1
+
+    tmp_path = index_path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps({"runs": updated}, indent=2), encoding="utf-8")
+    tmp_path.replace(index_path)
+    logger.info("Report index: %s runs, %s parsed, %s from cache", len(updated), parsed, len(updated) - parsed)
+    return [entry["summary"] for entry in updated.values()]
+
+
+def _p50(values: list[float]) -> float | None:
+    return percentile(values, 50) if values else None
+
+
+def trend_summary(runs: list[dict], window: int, threshold: float) -> list[dict]:
+    # Compares the median of the latest `window` successful runs with the
+    # `window` runs before them.
+    ok_runs = [run for run in runs if run["status"] == "ok"]
+    rows = []
+    for metric in TREND_METRICS:
+        values = [run[metric] for run in ok_runs if run.get(metric) is not None]
+        if not values:
+            continue
+        recent = _p50(values[-window:])
+        previous = _p50(values[-2 * window : -window])
+        change = (recent - previous) / previous if previous else None
+        rows.append(
+            {
+                "metric": metric,
+                "runs": len(values),
+                "p50": round(percentile(values, 50), 3),
+                "p95": round(percentile(values, 95), 3),
+                "recent_p50": round(recent, 3),
+                "previous_p50": round(previous, 3) if previous is not None else None,
+                "change_pct": round(change * 100, 1) if change is not None else None,
+                "regression": bool(change is not None and change > threshold and metric not in VOLUME_METRICS),
+            }
+        )
+    return rows
+
+
+def _write_csv(path: Path, rows: list[dict]) -> None:
+    with path.open("w", encoding="utf-8", newline="") as handle:
+        if not rows:
+            return
+        writer = csv.DictWriter(handle, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def _sparkline(values: list[float], width: int = 240, height: int = 40) -> str:
+    if len(values) < 2:
+        return ""
+    low, high = min(values), max(values)
+    spread = (high - low) or 1
+    step = width / (len(values) - 1)
+    points = " ".join(
+        f"{index * step:.1f},{height - (value - low) / spread * (height - 4) - 2:.1f}"
+        for index, value in enumerate(values)
+    )
+    return (
+        f'<svg width="{width}" height="{height}"><polyline fill="none" stroke="#2563eb" '
+        f'stroke-width="1.5" points="{points}"/></svg>'
+    )
+
+
+def _html_table(rows: list[dict], highlight: str | None = None) -> str:
+    if not rows:
+        return "<p>Sin datos.</p>"
+    columns = [column for column in rows[0] if column != "trend"]
+    header = "".join(f"<th>{html.escape(column)}</th>" for column in columns)
+    if "trend" in rows[0]:
+        header += "<th>trend</th>"
+    body = []
+    for row in rows:
+        css = ' class="bad"' if highlight and row.get(highlight) else ""
+        cells = "".join(f"<td>{html.escape('' if row[c] is None else str(row[c]))}</td>" for c in columns)
+        if "trend" in row:
+            cells += f"<td>{row['trend']}</td>"
+        body.append(f"<tr{css}>{cells}</tr>")
+    return f"<table><tr>{header}</tr>{''.join(body)}</table>"
+
+
+def write_report(runs: list[dict], trends: list[dict], output_dir: Path) -> Path:
+    output_dir.mkdir(parents=True, exist_ok=True)
+    _write_csv(output_dir / "runs.csv", runs)
+    _write_csv(output_dir / "summary.csv", trends)
+
+    ok_runs = [run for run in runs if run["status"] == "ok"]
+    trend_rows = [
+        {
+            **row,
+            "trend": _sparkline([run[row["metric"]] for run in ok_runs if run.get(row["metric"]) is not None]),
+        }
+        for row in trends
+    ]
+    page = f"""<!DOCTYPE html>
+<html lang="es"><head><meta charset="utf-8"><title>RPA - historico de ejecuciones</title>
+<style>
+body {{ font-family: Segoe UI, Arial, sans-serif; margin: 24px; }}
+table {{ border-collapse: collapse; margin-bottom: 24px; font-size: 13px; }}
+th, td {{ border: 1px solid #ddd; padding: 4px 8px; text-align: right; }}
+th {{ background: #f3f4f6; }}
+tr.bad td {{ background: #fee2e2; }}
+</style></head><body>
+<h1>Historico de ejecuciones</h1>
+<p>Generado {datetime.now():%Y-%m-%d %H:%M}. {len(runs)} ejecuciones, {len(ok_runs)} exitosas.</p>
+<h2>Tendencias (ejecuciones exitosas)</h2>
+{_html_table(trend_rows, highlight="regression")}
+<h2>Ejecuciones</h2>
+{_html_table(list(reversed(runs)), highlight=None)}
+</body></html>
+"""
+    path = output_dir / "index.html"
+    path.write_text(page, encoding="utf-8")
+    return path
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+# minute hour day-of-month month day-of-week (0 or 7 = Sunday), as in cron.
+_FIELDS = (("minute", 0, 59), ("hour", 0, 23), ("day", 1, 31), ("month", 1, 12), ("weekday", 0, 7))
+# Far enough for any valid expression (e.g. "0 0 29 2 *" only matches in leap years).
+_SEARCH_DAYS = 366 * 8
+
+
+@dataclass(frozen=True)
+class CronExpr:
+    text: str
+    minutes: frozenset[int]
+    hours: frozenset[int]
+    days: frozenset[int]
+    months: frozenset[int]
+    weekdays: frozenset[int]
+    any_day: bool
+    any_weekday: bool
+
+    def matches_day(self, day: datetime) -> bool:
+        weekday = (day.weekday() + 1) % 7
+        in_days = day.day in self.days
+        in_weekdays = weekday in self.weekdays
+        # Like cron: when both day fields are restricted, either one matching is enough.
+        if self.any_day or self.any_weekday:
+            return in_days and in_weekdays
+        return in_days or in_weekdays
+
+
+def _parse_field(text: str, name: str, low: int, high: int) -> set[int]:
+    values: set[int] = set()
+    for part in text.split(","):
+        base, _, step_text = part.partition("/")
+        step = int(step_text) if step_text else 1
+        if base == "*":
+            start, end = low, high
+        elif "-" in base:
+            start_text, end_text = base.split("-", 1)
+            start, end = int(start_text), int(end_text)
+        else:
+            start = int(base)
+            end = high if step_text else start
+        if step < 1 or start < low or end > high or start > end:
+            raise ValueError(f"Invalid {name} field: {part!r}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+def parse_cron(text: str) -> CronExpr:
+    parts = text.split()
+    if len(parts) != len(_FIELDS):
+        raise ValueError(f"Cron expression needs 5 fields (minute hour day month weekday): {text!r}")
+    try:
+        minutes, hours, days, months, weekdays = (
+            _parse_field(part, name, low, high) for part, (name, low, high) in zip(parts, _FIELDS)
+        )
+    except ValueError as exc:
+        raise ValueError(f"Invalid cron expression {text!r}: {exc}") from exc
+    if 7 in weekdays:
+        weekdays = (weekdays - {7}) | {0}
+    return CronExpr(
+        text=text,
+        minutes=frozenset(minutes),
+        hours=frozenset(hours),
+        days=frozenset(days),
+        months=frozenset(months),
+        weekdays=frozenset(weekdays),
+        any_day=parts[2] == "*",
+        any_weekday=parts[4] == "*",
+    )
+
+
+def parse_schedule(text: str) -> list[CronExpr]:
+    return [parse_cron(item.strip()) for item in text.split(";") if item.strip()]
+
+
+def next_match(expr: CronExpr, after: datetime) -> datetime:
+    # Walks day by day, then hour and minute inside a matching day.
+    start = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    day = start.replace(hour=0, minute=0)
+    for _ in range(_SEARCH_DAYS):
+        if day.month in expr.months and expr.matches_day(day):
+            for hour in sorted(expr.hours):
+                for minute in sorted(expr.minutes):
+                    candidate = day.replace(hour=hour, minute=minute)
+                    if candidate >= start:
+                        return candidate
+        day += timedelta(days=1)
+    raise ValueError(f"Cron expression never matches: {expr.text!r}")
+
+
+def next_run(schedule: list[CronExpr], after: datetime) -> datetime:
+    return min(next_match(expr, after) for expr in schedule)
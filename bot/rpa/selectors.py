@@ -19,6 +19,8 @@ CORE_LOGIN_SUCCESS = "css=div.home"  # AJUSTAR SELECTOR
 CORE_SECTION1_UPLOAD_INPUT = "css=input[type=file]"  # AJUSTAR SELECTOR
 CORE_SECTION1_CONTABILIZAR_BUTTON = "css=button#contabilizar"  # AJUSTAR SELECTOR
 CORE_SECTION1_SUCCESS_MESSAGE = "css=div.alert-success"  # AJUSTAR SELECTOR
+# Opcional: elemento que aparece cuando el core termino de procesar el archivo
+CORE_SECTION1_UPLOAD_DONE = ""  # AJUSTAR SELECTOR
 CORE_SECTION1_FIELD_SELECTORS = {
     "company": "css=input#company",  # AJUSTAR SELECTOR
     "period": "css=input#period",  # AJUSTAR SELECTOR
@@ -28,6 +30,8 @@ CORE_SECTION1_FIELD_SELECTORS = {
 CORE_SECTION2_UPLOAD_INPUT = "css=input[type=file]"  # AJUSTAR SELECTOR
 CORE_SECTION2_CONTABILIZAR_BUTTON = "css=button#contabilizar"  # AJUSTAR SELECTOR
 CORE_SECTION2_SUCCESS_MESSAGE = "css=div.alert-success"  # AJUSTAR SELECTOR
+# Opcional: elemento que aparece cuando el core termino de procesar el archivo
+CORE_SECTION2_UPLOAD_DONE = ""  # AJUSTAR SELECTOR
 CORE_SECTION2_FIELD_SELECTORS = {
     "company": "css=input#company",  # AJUSTAR SELECTOR
     "period": "css=input#period",  # AJUSTAR SELECTOR
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from .config import Config
+
+if TYPE_CHECKING:
+    from playwright.async_api import BrowserContext as AsyncBrowserContext
+    from playwright.async_api import Page as AsyncPage
+    from playwright.sync_api import Browser, BrowserContext, Page
+
+
+def session_state_path(config: Config, name: str) -> Path:
+    # Encrypted (DPAPI) and plaintext states use different names, so switching
+    # SESSION_PLAINTEXT never tries to read one format as the other.
+    suffix = "json" if config.session_plaintext else "dpapi"
+    return config.session_dir / f"{name}_state.{suffix}"
+
+
+def _protect(data: bytes, name: str) -> bytes:
+    # DPAPI ties the file to the Windows account of the bot: another user, or a
+    # copy taken to another machine, cannot decrypt it.
+    import win32crypt
+
+    return win32crypt.CryptProtectData(data, f"rpa session {name}", None, None, None, 0)
+
+
+def _unprotect(data: bytes) -> bytes:
+    import win32crypt
+
+    return win32crypt.CryptUnprotectData(data, None, None, None, 0)[1]
+
+
+def load_session_state(config: Config, name: str) -> dict | None:
+    if not config.session_reuse:
+        return None
+    path = session_state_path(config, name)
+    if not path.exists():
+        return None
+    logger = logging.getLogger("rpa")
+    age_min = (time.time() - path.stat().st_mtime) / 60
+    if age_min > config.session_max_age_min:
+        logger.info("Session state for %s expired (%.0f min old)", name, age_min)
+        clear_session_state(config, name)
+        return None
+    try:
+        data = path.read_bytes()
+        if not config.session_plaintext:
+            data = _unprotect(data)
+        return json.loads(data.decode("utf-8"))
+    except Exception as exc:
+        logger.warning("Session state for %s unreadable, logging in again: %s", name, exc)
+        clear_session_state(config, name)
+        return None
+
+
+def _write_state(state: dict, config: Config, name: str) -> None:
+    path = session_state_path(config, name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = json.dumps(state).encode("utf-8")
+    if config.session_plaintext:
+        # Opt-in: the cookies are only protected by the file mode, which has
+        # no effect on Windows.
+        os.chmod(path.parent, 0o700)
+    else:
+        data = _protect(data, name)
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_bytes(data)
+    if config.session_plaintext:
+        os.chmod(tmp_path, 0o600)
+    tmp_path.replace(path)
+    logging.getLogger("rpa").info("Session state saved for %s", name)
+
+
+def save_session_state(context: BrowserContext, config: Config, name: str) -> None:
+    if not config.session_reuse:
+        return
+    _write_state(context.storage_state(), config, name)
+
+
+async def save_session_state_async(context: AsyncBrowserContext, config: Config, name: str) -> None:
+    if not config.session_reuse:
+        return
+    _write_state(await context.storage_state(), config, name)
+
+
+def clear_session_state(config: Config, name: str) -> None:
+    session_state_path(config, name).unlink(missing_ok=True)
+
+
+def new_browser_context(browser: Browser, config: Config, name: str) -> BrowserContext:
+    state = load_session_state(config, name)
+    if state:
+        logging.getLogger("rpa").info("Reusing session state for %s", name)
+    return browser.new_context(accept_downloads=True, storage_state=state)
+
+
+def session_is_active(page: Page, url: str, login_selector: str, ready_selector: str) -> bool:
+    # Opens a protected page and waits for whichever shows up first: the login
+    # form (session rejected) or the expected content (session still valid).
+    from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+    if not page.context.cookies():
+        return False
+    page.goto(url, wait_until="domcontentloaded")
+    login = page.locator(login_selector)
+    try:
+        login.or_(page.locator(ready_selector)).first.wait_for(state="visible")
+    except PlaywrightTimeoutError:
+        logging.getLogger("rpa").info("Saved session not confirmed at %s", url)
+        return False
+    if login.first.is_visible():
+        logging.getLogger("rpa").info("Saved session rejected at %s", url)
+        return False
+    return True
+
+
+async def session_is_active_async(
+    page: AsyncPage, url: str, login_selector: str, ready_selector: str
+) -> bool:
+    from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+    if not await page.context.cookies():
+        return False
+    await page.goto(url, wait_until="domcontentloaded")
+    login = page.locator(login_selector)
+    try:
+        await login.or_(page.locator(ready_selector)).first.wait_for(state="visible")
+    except PlaywrightTimeoutError:
+        logging.getLogger("rpa").info("Saved session not confirmed at %s", url)
+        return False
+    if await login.first.is_visible():
+        logging.getLogger("rpa").info("Saved session rejected at %s", url)
+        return False
+    return True
@@ -4,17 +4,29 @@ import logging
 import re
 from dataclasses import dataclass
 from datetime import date, datetime
+from functools import lru_cache
+from itertools import chain, islice
 from pathlib import Path
-from typing import Iterable
+from typing import Callable, Generator, Iterable, Iterator, Sequence, TypeVar
 
-from openpyxl import load_workbook
 from openpyxl.utils.datetime import from_excel
 
+from .metrics import span
+from .readers import ROW_READERS, select_reader
+
 
 class TransformError(Exception):
     pass
 
 
+class EmptyReportError(TransformError):
+    # None of the downloaded reports had data rows.
+    pass
+
+
+T = TypeVar("T")
+
+
 @dataclass(frozen=True)
 class ReportRecord:
     cedula: str
@@ -29,6 +41,24 @@ class TransformResult:
     records: list[ReportRecord]
 
 
+HEADER_SCAN_ROWS = 20
+COLUMN_BLOCK_ROWS = 2000
+
+DATE_FORMATS = ("%d/%m/%Y", "%m/%d/%Y", "%d-%m-%Y", "%Y-%m-%d")
+DATE_CACHE_SIZE = 4096
+
+_last_date_format = DATE_FORMATS[0]
+# Earlier formats that also match a value parsed with the given one. The cascade
+# in _format_date would pick them first, so shortcuts must rule them out.
+_DATE_SHADOWS = {
+    fmt: [earlier for earlier in DATE_FORMATS[:idx] if re.sub(r"%.", "", earlier) == re.sub(r"%.", "", fmt)]
+    for idx, fmt in enumerate(DATE_FORMATS)
+}
+_NON_DIGIT_RE = re.compile(r"\D")
+_ASCII_NON_DIGITS = str.maketrans("", "", "".join(chr(c) for c in range(128) if not chr(c).isdigit()))
+
+RecordFilter = Callable[[ReportRecord], bool]
+
 REQUIRED_COLUMNS = {
     "IDENTIFICACION": "cedula",
     "MONTO": "monto",
@@ -53,6 +83,42 @@ def _normalize_digits(value: object, field_name: str) -> str:
     return digits if digits else text
 
 
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def _format_date_with(text: str, fmt: str) -> str | None:
+    try:
+        parsed = datetime.strptime(text, fmt)
+    except ValueError:
+        return None
+    for earlier in _DATE_SHADOWS[fmt]:
+        try:
+            datetime.strptime(text, earlier)
+            return None
+        except ValueError:
+            continue
+    return parsed.strftime("%d%m%Y")
+
+
+def _parse_date_text(text: str) -> str | None:
+    global _last_date_format
+    # Reports usually use a single format, so the last one that worked is tried
+    # first; _format_date_with rejects it when the cascade would pick another.
+    last_fmt = _last_date_format
+    formatted = _format_date_with(text, last_fmt)
+    if formatted is not None:
+        return formatted
+    for fmt in DATE_FORMATS:
+        if fmt == last_fmt:
+            continue
+        try:
+            parsed = datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+        _last_date_format = fmt
+        return parsed.strftime("%d%m%Y")
+    return None
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE, typed=True)
 def _format_date(value: object) -> str:
     if value is None:
         raise TransformError("Fecha vacia")
@@ -66,15 +132,70 @@ def _format_date(value: object) -> str:
             return dt.strftime("%d%m%Y")
         except Exception:
             pass
-    text = str(value).strip()
-    for fmt in ("%d/%m/%Y", "%m/%d/%Y", "%d-%m-%Y", "%Y-%m-%d"):
-        try:
-            return datetime.strptime(text, fmt).strftime("%d%m%Y")
-        except ValueError:
-            continue
+    formatted = _parse_date_text(str(value).strip())
+    if formatted is not None:
+        return formatted
     raise TransformError(f"Formato de fecha no soportado: {value}")
 
 
+def _strip_non_digits(text: str) -> str:
+    digits = text.translate(_ASCII_NON_DIGITS)
+    if digits.isascii():
+        return digits
+    return _NON_DIGIT_RE.sub("", digits)
+
+
+def _normalize_digits_column(values: list[object], field_name: str) -> list[str]:
+    seen: dict[tuple[type, object], str] = {}
+    result: list[str] = []
+    for value in values:
+        key = (type(value), value)
+        normalized = seen.get(key)
+        if normalized is None:
+            if value is None:
+                raise TransformError(f"Campo '{field_name}' vacio")
+            if isinstance(value, (int, float)):
+                normalized = str(int(round(value)))
+            else:
+                text = str(value).strip()
+                digits = _strip_non_digits(text)
+                normalized = digits if digits else text
+            seen[key] = normalized
+        result.append(normalized)
+    return result
+
+
+def _detect_date_format(values: list[object]) -> str | None:
+    for value in values:
+        if isinstance(value, str):
+            text = value.strip()
+            for fmt in DATE_FORMATS:
+                try:
+                    datetime.strptime(text, fmt)
+                    return fmt
+                except ValueError:
+                    continue
+            return None
+    return None
+
+
+def _format_date_column(values: list[object]) -> list[str]:
+    fmt = _detect_date_format(values)
+    seen: dict[tuple[type, object], str] = {}
+    result: list[str] = []
+    for value in values:
+        key = (type(value), value)
+        formatted = seen.get(key)
+        if formatted is None:
+            if fmt and isinstance(value, str):
+                formatted = _format_date_with(value.strip(), fmt)
+            if formatted is None:
+                formatted = _format_date(value)
+            seen[key] = formatted
+        result.append(formatted)
+    return result
+
+
 def _find_header_row(rows: Iterable[tuple]) -> tuple[int, dict[str, int]]:
     for idx, row in enumerate(rows, start=1):
         headers = [_normalize_header(cell) for cell in row]
@@ -84,32 +205,158 @@ def _find_header_row(rows: Iterable[tuple]) -> tuple[int, dict[str, int]]:
     raise TransformError("No se encontraron columnas requeridas en el XLSX.")
 
 
-def _read_records(input_path: Path) -> list[ReportRecord]:
-    wb = load_workbook(input_path, read_only=True, data_only=True)
-    ws = wb.active
+def _cell(row: tuple, index: int) -> object:
+    return row[index] if index < len(row) else None
 
-    header_row_idx, header_map = _find_header_row(ws.iter_rows(max_row=20, values_only=True))
 
-    records: list[ReportRecord] = []
-    for row in ws.iter_rows(min_row=header_row_idx + 1, values_only=True):
-        if not row or all(cell is None or str(cell).strip() == "" for cell in row):
-            continue
-        cedula = _normalize_digits(row[header_map["IDENTIFICACION"]], "Identificacion")
-        monto = _normalize_digits(row[header_map["MONTO"]], "Monto")
-        plazo = _normalize_digits(row[header_map["PLAZO"]], "Plazo")
-        fecha = _format_date(row[header_map["FECHASOLICITUD"]])
-        records.append(
-            ReportRecord(
-                cedula=cedula,
-                monto=monto,
-                plazo=plazo,
-                fecha=fecha,
-            )
+def _split_header(rows: Iterator[tuple]) -> tuple[dict[str, int], Iterator[tuple]]:
+    head = list(islice(rows, HEADER_SCAN_ROWS))
+    header_row_idx, header_map = _find_header_row(head)
+    return header_map, chain(head[header_row_idx:], rows)
+
+
+def _normalize_rows(rows: Iterable[tuple], indexes: tuple[int, ...]) -> Iterator[ReportRecord]:
+    cedula_idx, monto_idx, plazo_idx, fecha_idx = indexes
+    for row in rows:
+        cedula = _normalize_digits(_cell(row, cedula_idx), "Identificacion")
+        monto = _normalize_digits(_cell(row, monto_idx), "Monto")
+        plazo = _normalize_digits(_cell(row, plazo_idx), "Plazo")
+        fecha = _format_date(_cell(row, fecha_idx))
+        yield ReportRecord(
+            cedula=cedula,
+            monto=monto,
+            plazo=plazo,
+            fecha=fecha,
         )
 
-    if not records:
-        raise TransformError("El XLSX no tiene filas de datos.")
-    return records
+
+def _normalize_columns(rows: Iterable[tuple], indexes: tuple[int, ...]) -> Iterator[ReportRecord]:
+    cedula_idx, monto_idx, plazo_idx, fecha_idx = indexes
+    for block in iter_chunks(rows, COLUMN_BLOCK_ROWS):
+        cedulas = _normalize_digits_column([_cell(row, cedula_idx) for row in block], "Identificacion")
+        montos = _normalize_digits_column([_cell(row, monto_idx) for row in block], "Monto")
+        plazos = _normalize_digits_column([_cell(row, plazo_idx) for row in block], "Plazo")
+        fechas = _format_date_column([_cell(row, fecha_idx) for row in block])
+        for cedula, monto, plazo, fecha in zip(cedulas, montos, plazos, fechas):
+            yield ReportRecord(cedula=cedula, monto=monto, plazo=plazo, fecha=fecha)
+
+
+def _iter_records(
+    input_path: Path,
+    xlsx_engine: str = "openpyxl",
+    columnar: bool = False,
+    record_filter: RecordFilter | None = None,
+) -> Generator[ReportRecord, None, int]:
+    # Returns the number of data rows read, before record_filter.
+    logger = logging.getLogger("rpa")
+    reader_name = select_reader(input_path, xlsx_engine)
+    logger.info("Reading %s with '%s' reader", input_path.name, reader_name)
+    rows = ROW_READERS[reader_name](input_path)
+
+    cache_before = _format_date.cache_info()
+    count = 0
+    # In streaming modes the span also covers the time the consumer holds each chunk.
+    with span("transform.parse", file=input_path.name, reader=reader_name) as parse_span:
+        try:
+            header_map, data_rows = _split_header(rows)
+            indexes = (
+                header_map["IDENTIFICACION"],
+                header_map["MONTO"],
+                header_map["PLAZO"],
+                header_map["FECHASOLICITUD"],
+            )
+            data_rows = (
+                row
+                for row in data_rows
+                if row and not all(cell is None or str(cell).strip() == "" for cell in row)
+            )
+            normalize = _normalize_columns if columnar else _normalize_rows
+            for record in normalize(data_rows, indexes):
+                count += 1
+                if record_filter is None or record_filter(record):
+                    yield record
+        finally:
+            rows.close()
+            parse_span.set(rows=count)
+            cache_after = _format_date.cache_info()
+            logger.info(
+                "Date cache: %s hits, %s misses, %s cached values",
+                cache_after.hits - cache_before.hits,
+                cache_after.misses - cache_before.misses,
+                cache_after.currsize,
+            )
+
+    if not count:
+        logger.warning("%s has no data rows", input_path.name)
+    return count
+
+
+def _iter_merged_records(
+    input_paths: Path | Sequence[Path],
+    xlsx_engine: str = "openpyxl",
+    columnar: bool = False,
+    record_filter: RecordFilter | None = None,
+) -> Iterator[ReportRecord]:
+    # Several downloads (report types or date ranges) merge into one LINIX file,
+    # in the order given.
+    if isinstance(input_paths, Path):
+        input_paths = [input_paths]
+    count = 0
+    for input_path in input_paths:
+        count += yield from _iter_records(input_path, xlsx_engine, columnar, record_filter)
+    # One empty report (e.g. a report type with no movements that day) is fine
+    # as long as another one brought data.
+    if not count:
+        raise EmptyReportError("El XLSX no tiene filas de datos.")
+
+
+def _read_records(
+    input_paths: Path | Sequence[Path],
+    xlsx_engine: str = "openpyxl",
+    columnar: bool = False,
+    record_filter: RecordFilter | None = None,
+) -> list[ReportRecord]:
+    return list(_iter_merged_records(input_paths, xlsx_engine, columnar, record_filter))
+
+
+def iter_chunks(items: Iterable[T], size: int) -> Iterator[list[T]]:
+    chunk: list[T] = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _linix_line(record: ReportRecord, periodicidad: str) -> str:
+    fields = [
+        record.cedula,
+        record.monto,
+        record.plazo,
+        record.fecha,
+        "",
+        "",
+        periodicidad,
+        "",
+    ]
+    return "|".join(fields) + "\n"
+
+
+def linix_output_path(output_dir: Path) -> Path:
+    return output_dir / "cargue linix produccion.csv"
+
+
+def parse_linix_line(line: str) -> ReportRecord:
+    cedula, monto, plazo, fecha = line.rstrip("\n").split("|")[:4]
+    return ReportRecord(cedula=cedula, monto=monto, plazo=plazo, fecha=fecha)
+
+
+def read_linix_records(linix_path: Path, encoding: str) -> Iterator[ReportRecord]:
+    with linix_path.open("r", encoding=encoding, newline="\n") as handle:
+        for line in handle:
+            yield parse_linix_line(line)
 
 
 def _write_linix_file(
@@ -118,31 +365,50 @@ def _write_linix_file(
     output_encoding: str,
     periodicidad: str,
 ) -> Path:
-    output_path = output_dir / "cargue linix produccion.csv"
+    output_path = linix_output_path(output_dir)
     with output_path.open("w", encoding=output_encoding, newline="\n") as output_file:
         for record in records:
-            fields = [
-                record.cedula,
-                record.monto,
-                record.plazo,
-                record.fecha,
-                "",
-                "",
-                periodicidad,
-                "",
-            ]
-            output_file.write("|".join(fields) + "\n")
+            output_file.write(_linix_line(record, periodicidad))
     return output_path
 
 
+def stream_transform(
+    input_paths: Path | Sequence[Path],
+    output_dir: Path,
+    output_encoding: str,
+    periodicidad: str,
+    chunk_size: int,
+    xlsx_engine: str = "openpyxl",
+    columnar: bool = False,
+    record_filter: RecordFilter | None = None,
+) -> Iterator[list[ReportRecord]]:
+    # The LINIX file is written as records are read; it is complete once the
+    # generator is exhausted.
+    logger = logging.getLogger("rpa")
+    linix_path = linix_output_path(output_dir)
+    total = 0
+    with linix_path.open("w", encoding=output_encoding, newline="\n") as output_file:
+        for chunk in iter_chunks(
+            _iter_merged_records(input_paths, xlsx_engine, columnar, record_filter), chunk_size
+        ):
+            for record in chunk:
+                output_file.write(_linix_line(record, periodicidad))
+            total += len(chunk)
+            yield chunk
+    logger.info("Transformed file saved: %s (%s records)", linix_path, total)
+
+
 def transform_file(
-    input_path: Path,
+    input_paths: Path | Sequence[Path],
     output_dir: Path,
     output_encoding: str,
     periodicidad: str,
+    xlsx_engine: str = "openpyxl",
+    columnar: bool = False,
+    record_filter: RecordFilter | None = None,
 ) -> TransformResult:
     logger = logging.getLogger("rpa")
-    records = _read_records(input_path)
+    records = _read_records(input_paths, xlsx_engine, columnar, record_filter)
     linix_path = _write_linix_file(records, output_dir, output_encoding, periodicidad)
     logger.info("Transformed file saved: %s", linix_path)
     return TransformResult(linix_file=linix_path, records=records)
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import argparse
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+# One line per imported module: "import time: self [us] | cumulative | name".
+IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S.*)$")
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m bot.startup_bench",
+        description="Mide el tiempo de arranque (python -X importtime) de un modulo del bot.",
+    )
+    parser.add_argument("--module", default="bot.main", help="Modulo a importar (por defecto bot.main)")
+    parser.add_argument("--top", type=int, default=15, help="Modulos mas lentos a mostrar (por defecto 15)")
+    parser.add_argument("--repeat", type=int, default=5, help="Repeticiones para medir el arranque (por defecto 5)")
+    return parser.parse_args()
+
+
+def _import_times(module: str) -> list[tuple[str, int, int, int]]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    entries = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            depth = len(match.group(3)) // 2
+            entries.append((match.group(4).strip(), int(match.group(1)), int(match.group(2)), depth))
+    return entries
+
+
+def _startup_seconds(module: str, repeat: int) -> list[float]:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", f"import {module}"], check=True)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def main() -> None:
+    args = _parse_args()
+    entries = _import_times(args.module)
+    if not entries:
+        raise SystemExit("No se obtuvo salida de -X importtime.")
+
+    top_level = [entry for entry in entries if entry[3] == 0]
+    total_us = sum(cumulative for _, _, cumulative, _ in top_level)
+    timings = _startup_seconds(args.module, max(1, args.repeat))
+    heavy = {"playwright", "cx_Oracle", "pywinauto", "openpyxl"}
+    loaded = sorted(heavy & {name.split(".")[0] for name, _, _, _ in entries})
+
+    print(f"Modulo: {args.module}")
+    print(f"Arranque (proceso completo): mediana {statistics.median(timings) * 1000:.0f} ms en {len(timings)} ejecuciones")
+    print(f"Imports: {total_us / 1000:.0f} ms acumulados, {len(entries)} modulos")
+    print(f"Dependencias pesadas cargadas: {', '.join(loaded) or 'ninguna'}")
+    print(f"\nTop {args.top} por tiempo acumulado (ms, incluye sus propios imports):")
+    nested = [entry for entry in entries if entry[0] != args.module]
+    for name, _, cumulative, depth in sorted(nested, key=lambda entry: entry[2], reverse=True)[: args.top]:
+        print(f"{cumulative / 1000:8.1f}  {'  ' * depth}{name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Callable
+
+from openpyxl import Workbook
+
+from .rpa.readers import ROW_READERS
+from .rpa.transform import (
+    COLUMN_BLOCK_ROWS,
+    REQUIRED_COLUMNS,
+    _format_date,
+    _format_date_column,
+    _format_date_with,
+    _normalize_columns,
+    _normalize_digits,
+    _normalize_digits_column,
+    _normalize_rows,
+    _split_header,
+    iter_chunks,
+)
+
+# Portal report layout: a title line above the header and extra columns
+# around the four the bot reads.
+HEADER = ["NUMERO", "IDENTIFICACION", "NOMBRE", "MONTO", "PLAZO", "FECHA SOLICITUD", "ESTADO"]
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m bot.transform_bench",
+        description=(
+            "Compara los lectores del reporte (openpyxl, xml, csv) o la normalizacion por filas "
+            "y por columnas sobre reportes sinteticos."
+        ),
+    )
+    parser.add_argument(
+        "suite",
+        nargs="?",
+        choices=("readers", "normalize"),
+        default="readers",
+        help="readers: lectores del reporte; normalize: normalizacion de columnas (por defecto readers)",
+    )
+    parser.add_argument(
+        "--rows",
+        default="10000,100000,1000000",
+        help="Filas por reporte, separadas por coma (por defecto 10000,100000,1000000)",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones por medicion; se toma la mejor (por defecto 3)")
+    parser.add_argument(
+        "--workdir",
+        type=Path,
+        default=Path(tempfile.gettempdir()) / "rpa_transform_bench",
+        help="Carpeta para los reportes generados; se reutilizan entre ejecuciones",
+    )
+    parser.add_argument("--seed", type=int, default=7, help="Semilla de los datos sinteticos (por defecto 7)")
+    return parser.parse_args()
+
+
+def _report_rows(rows: int, seed: int) -> list[list]:
+    rng = random.Random(seed)
+    start = date(2024, 1, 1)
+    data = []
+    for idx in range(1, rows + 1):
+        cedula = rng.randint(1_000_000, 1_999_999_999)
+        monto = rng.randint(100, 50_000) * 1000
+        data.append(
+            [
+                idx,
+                # Mixed cell types, as the portal exports them.
+                f"{cedula:,}".replace(",", ".") if idx % 3 == 0 else cedula,
+                f"CLIENTE {idx}",
+                f"$ {monto:,}" if idx % 5 == 0 else monto,
+                rng.choice((6, 12, 24, 36, 48)),
+                (start + timedelta(days=rng.randint(0, 700))).strftime("%d/%m/%Y"),
+                "APROBADO",
+            ]
+        )
+    return data
+
+
+def _write_xlsx(path: Path, data: list[list]) -> None:
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Reporte")
+    ws.append(["Reporte de desembolsos"])
+    ws.append([])
+    ws.append(HEADER)
+    for row in data:
+        ws.append(row)
+    wb.save(path)
+
+
+def _write_csv(path: Path, data: list[list]) -> None:
+    with path.open("w", encoding="utf-8-sig", newline="") as handle:
+        writer = csv.writer(handle, delimiter=";")
+        writer.writerow(["Reporte de desembolsos"])
+        writer.writerow([])
+        writer.writerow(HEADER)
+        writer.writerows(data)
+
+
+def _reports(workdir: Path, rows: int, seed: int) -> tuple[Path, Path]:
+    xlsx_path = workdir / f"reporte_{rows}_{seed}.xlsx"
+    csv_path = workdir / f"reporte_{rows}_{seed}.csv"
+    if not xlsx_path.exists() or not csv_path.exists():
+        started = time.perf_counter()
+        data = _report_rows(rows, seed)
+        _write_xlsx(xlsx_path, data)
+        _write_csv(csv_path, data)
+        print(f"  generado en {time.perf_counter() - started:.1f}s: {xlsx_path.name}, {csv_path.name}")
+    return xlsx_path, csv_path
+
+
+def _best_of_result(repeat: int, func: Callable[[], object]) -> tuple[float, object]:
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def _read_only(reader: str, path: Path) -> Callable[[], int]:
+    def run() -> int:
+        return sum(1 for _ in ROW_READERS[reader](path))
+
+    return run
+
+
+def _read_and_normalize(reader: str, path: Path) -> list:
+    header_map, rows = _split_header(iter(ROW_READERS[reader](path)))
+    indexes = tuple(header_map[column] for column in REQUIRED_COLUMNS)
+    return list(_normalize_rows(rows, indexes))
+
+
+def _blocks(values: list[object]) -> list[list[object]]:
+    # The columnar mode normalizes blocks of COLUMN_BLOCK_ROWS rows.
+    return list(iter_chunks(values, COLUMN_BLOCK_ROWS))
+
+
+def _uncached(func: Callable[[], list]) -> Callable[[], list]:
+    # Every timing starts with empty date caches, as a new run does.
+    def run() -> list:
+        _format_date.cache_clear()
+        _format_date_with.cache_clear()
+        return func()
+
+    return run
+
+
+def _bench_normalize(rows: int, seed: int, repeat: int) -> None:
+    data = _report_rows(rows, seed)
+    indexes = tuple(HEADER.index(name) for name in ("IDENTIFICACION", "MONTO", "PLAZO", "FECHA SOLICITUD"))
+    columns = {
+        "Identificacion": [row[indexes[0]] for row in data],
+        "Monto": [row[indexes[1]] for row in data],
+        "Plazo": [row[indexes[2]] for row in data],
+    }
+    fechas = [row[indexes[3]] for row in data]
+
+    cases = {
+        "digitos (3 columnas)": (
+            lambda: [[_normalize_digits(value, name) for value in values] for name, values in columns.items()],
+            lambda: [
+                [item for block in _blocks(values) for item in _normalize_digits_column(block, name)]
+                for name, values in columns.items()
+            ],
+        ),
+        "fecha": (
+            lambda: [_format_date(value) for value in fechas],
+            lambda: [item for block in _blocks(fechas) for item in _format_date_column(block)],
+        ),
+        "registro completo": (
+            lambda: list(_normalize_rows(data, indexes)),
+            lambda: list(_normalize_columns(data, indexes)),
+        ),
+    }
+    print(f"  {'':<22} {'por filas':>10} {'columnas':>10}")
+    for name, (row_wise, columnar) in cases.items():
+        row_seconds, row_result = _best_of_result(repeat, _uncached(row_wise))
+        column_seconds, column_result = _best_of_result(repeat, _uncached(columnar))
+        same = "igual" if row_result == column_result else "DIFERENTE"
+        print(
+            f"  {name:<22} {row_seconds:9.3f}s {column_seconds:9.3f}s  "
+            f"x{row_seconds / column_seconds:.1f}  {same}"
+        )
+
+
+def main() -> None:
+    args = _parse_args()
+    args.workdir.mkdir(parents=True, exist_ok=True)
+    repeat = max(1, args.repeat)
+
+    for rows in [int(item) for item in args.rows.split(",") if item.strip()]:
+        if args.suite == "normalize":
+            print(f"\n{rows} filas")
+            _bench_normalize(rows, args.seed, repeat)
+            continue
+        print(f"\n{rows} filas")
+        xlsx_path, csv_path = _reports(args.workdir, rows, args.seed)
+        inputs = {"openpyxl": xlsx_path, "xml": xlsx_path, "csv": csv_path}
+
+        results = {}
+        for reader, path in inputs.items():
+            # Large reports are read once; repeating them only adds minutes.
+            seconds, count = _best_of_result(1 if rows >= 1_000_000 else repeat, _read_only(reader, path))
+            results[reader] = seconds
+            print(
+                f"  {reader:<9} {seconds:8.2f}s  {count / seconds:>10,.0f} filas/s  "
+                f"({path.stat().st_size / 1_048_576:.1f} MB)"
+            )
+        baseline = results["openpyxl"]
+        print("  vs openpyxl: " + ", ".join(f"{name} x{baseline / seconds:.1f}" for name, seconds in results.items()))
+
+        # Every reader must yield the same records once normalized.
+        if rows <= 100_000:
+            reference = _read_and_normalize("openpyxl", xlsx_path)
+            same = all(_read_and_normalize(reader, path) == reference for reader, path in inputs.items())
+            print(f"  registros iguales entre lectores: {'si' if same else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+-- Tables used by ORACLE_BATCH_MODE=true. Install in the ORACLE_SCHEMA schema
+-- (or the ORACLE_USER schema when ORACLE_SCHEMA is empty).
+--
+-- Both are global temporary tables: rows are private to the session and are
+-- removed at the end of the transaction, so pooled sessions never see another
+-- run's batch.
+
+-- One row per record of the batch, loaded by the bot with executemany.
+-- If the name is changed, set ORACLE_BATCH_TABLE and c_tabla_lote in
+-- 02_rpa_lote.sql to the same value.
+CREATE GLOBAL TEMPORARY TABLE RPA_DESEMBOLSOS_TMP (
+    SEQ    NUMBER(10) NOT NULL,
+    CEDULA NUMBER(15) NOT NULL,
+    VALOR  NUMBER(18) NOT NULL,
+    CONSTRAINT RPA_DESEMBOLSOS_TMP_PK PRIMARY KEY (SEQ)
+) ON COMMIT DELETE ROWS;
+
+-- Rows returned by the per-record procedure, one row per column value, in the
+-- order they were fetched. RPA_LOTE pivots them back into the original columns.
+CREATE GLOBAL TEMPORARY TABLE RPA_LOTE_RESULTADO (
+    FILA      NUMBER(10) NOT NULL,
+    COLUMNA   NUMBER(4)  NOT NULL,
+    VALOR_NUM NUMBER,
+    VALOR_TXT VARCHAR2(4000),
+    VALOR_FEC DATE,
+    CONSTRAINT RPA_LOTE_RESULTADO_PK PRIMARY KEY (FILA, COLUMNA)
+) ON COMMIT DELETE ROWS;
@@ -0,0 +1,165 @@
+-- Batch wrappers for ORACLE_BATCH_MODE=true. Requires 01_rpa_lote_tablas.sql
+-- and the per-record procedures SP_DOCUMENTOSOPO / SP_CTAHORRO
+-- (p_cedula IN NUMBER, p_valor IN NUMBER, p_cursor OUT SYS_REFCURSOR).
+--
+-- SP_DOCUMENTOSOPO_LOTE and SP_CTAHORRO_LOTE run the per-record procedure for
+-- every row of RPA_DESEMBOLSOS_TMP in SEQ order and return all the rows in one
+-- cursor with the same columns and types, so the CSV files match the
+-- per-record mode byte for byte.
+
+CREATE OR REPLACE PACKAGE RPA_LOTE AS
+    PROCEDURE ejecutar(p_proc IN VARCHAR2, p_cursor OUT SYS_REFCURSOR);
+END RPA_LOTE;
+/
+
+CREATE OR REPLACE PACKAGE BODY RPA_LOTE AS
+    c_tabla_lote CONSTANT VARCHAR2(128) := 'RPA_DESEMBOLSOS_TMP';
+
+    -- DBMS_SQL column type codes supported in the per-record cursors.
+    c_tipo_varchar2 CONSTANT PLS_INTEGER := 1;
+    c_tipo_number   CONSTANT PLS_INTEGER := 2;
+    c_tipo_date     CONSTANT PLS_INTEGER := 12;
+    c_tipo_char     CONSTANT PLS_INTEGER := 96;
+
+    -- Columns of the first non-empty cursor; every cursor of a batch comes
+    -- from the same procedure, so they all have the same shape.
+    g_columnas PLS_INTEGER;
+    g_desc     DBMS_SQL.DESC_TAB2;
+
+    PROCEDURE llamar(
+        p_proc   IN VARCHAR2,
+        p_cedula IN NUMBER,
+        p_valor  IN NUMBER,
+        p_cursor OUT SYS_REFCURSOR
+    ) IS
+    BEGIN
+        CASE p_proc
+            WHEN 'SP_DOCUMENTOSOPO' THEN SP_DOCUMENTOSOPO(p_cedula, p_valor, p_cursor);
+            WHEN 'SP_CTAHORRO' THEN SP_CTAHORRO(p_cedula, p_valor, p_cursor);
+            ELSE RAISE_APPLICATION_ERROR(-20001, 'RPA_LOTE: procedimiento no soportado ' || p_proc);
+        END CASE;
+    END llamar;
+
+    PROCEDURE guardar_filas(p_fuente IN OUT SYS_REFCURSOR, p_fila IN OUT NUMBER) IS
+        v_cur  INTEGER;
+        v_cols PLS_INTEGER;
+        v_desc DBMS_SQL.DESC_TAB2;
+        v_num  NUMBER;
+        v_txt  VARCHAR2(4000);
+        v_fec  DATE;
+    BEGIN
+        v_cur := DBMS_SQL.TO_CURSOR_NUMBER(p_fuente);
+        DBMS_SQL.DESCRIBE_COLUMNS2(v_cur, v_cols, v_desc);
+        FOR i IN 1 .. v_cols LOOP
+            IF v_desc(i).col_type = c_tipo_number THEN
+                DBMS_SQL.DEFINE_COLUMN(v_cur, i, v_num);
+            ELSIF v_desc(i).col_type = c_tipo_date THEN
+                DBMS_SQL.DEFINE_COLUMN(v_cur, i, v_fec);
+            ELSIF v_desc(i).col_type IN (c_tipo_varchar2, c_tipo_char) THEN
+                DBMS_SQL.DEFINE_COLUMN(v_cur, i, v_txt, 4000);
+            ELSE
+                DBMS_SQL.CLOSE_CURSOR(v_cur);
+                RAISE_APPLICATION_ERROR(
+                    -20002,
+                    'RPA_LOTE: tipo de columna no soportado en ' || v_desc(i).col_name
+                );
+            END IF;
+        END LOOP;
+
+        WHILE DBMS_SQL.FETCH_ROWS(v_cur) > 0 LOOP
+            IF g_columnas IS NULL THEN
+                g_columnas := v_cols;
+                g_desc := v_desc;
+            END IF;
+            p_fila := p_fila + 1;
+            FOR i IN 1 .. v_cols LOOP
+                v_num := NULL;
+                v_txt := NULL;
+                v_fec := NULL;
+                IF v_desc(i).col_type = c_tipo_number THEN
+                    DBMS_SQL.COLUMN_VALUE(v_cur, i, v_num);
+                ELSIF v_desc(i).col_type = c_tipo_date THEN
+                    DBMS_SQL.COLUMN_VALUE(v_cur, i, v_fec);
+                ELSE
+                    DBMS_SQL.COLUMN_VALUE(v_cur, i, v_txt);
+                END IF;
+                INSERT INTO RPA_LOTE_RESULTADO (FILA, COLUMNA, VALOR_NUM, VALOR_TXT, VALOR_FEC)
+                VALUES (p_fila, i, v_num, v_txt, v_fec);
+            END LOOP;
+        END LOOP;
+        DBMS_SQL.CLOSE_CURSOR(v_cur);
+    END guardar_filas;
+
+    -- Column expression that restores the original type, so the driver
+    -- converts the values exactly as it does for the per-record cursor.
+    FUNCTION columna_sql(p_pos IN PLS_INTEGER) RETURN VARCHAR2 IS
+        v_col  DBMS_SQL.DESC_REC2 := g_desc(p_pos);
+        v_expr VARCHAR2(200);
+    BEGIN
+        IF v_col.col_type = c_tipo_number THEN
+            v_expr := 'MAX(CASE WHEN COLUMNA = ' || p_pos || ' THEN VALOR_NUM END)';
+            IF v_col.col_precision > 0 THEN
+                v_expr := 'CAST(' || v_expr || ' AS NUMBER('
+                    || v_col.col_precision || ',' || v_col.col_scale || '))';
+            ELSIF v_col.col_scale <> -127 THEN
+                v_expr := 'CAST(' || v_expr || ' AS NUMBER(*,' || v_col.col_scale || '))';
+            END IF;
+        ELSIF v_col.col_type = c_tipo_date THEN
+            v_expr := 'MAX(CASE WHEN COLUMNA = ' || p_pos || ' THEN VALOR_FEC END)';
+        ELSE
+            v_expr := 'CAST(MAX(CASE WHEN COLUMNA = ' || p_pos || ' THEN VALOR_TXT END) AS '
+                || CASE WHEN v_col.col_type = c_tipo_char THEN 'CHAR(' ELSE 'VARCHAR2(' END
+                || GREATEST(v_col.col_max_len, 1) || '))';
+        END IF;
+        RETURN v_expr || ' AS "' || REPLACE(v_col.col_name, '"') || '"';
+    END columna_sql;
+
+    PROCEDURE ejecutar(p_proc IN VARCHAR2, p_cursor OUT SYS_REFCURSOR) IS
+        v_lote   SYS_REFCURSOR;
+        v_fuente SYS_REFCURSOR;
+        v_cedula NUMBER;
+        v_valor  NUMBER;
+        v_fila   NUMBER := 0;
+        v_sql    VARCHAR2(32767);
+    BEGIN
+        g_columnas := NULL;
+        DELETE FROM RPA_LOTE_RESULTADO;
+
+        OPEN v_lote FOR 'SELECT CEDULA, VALOR FROM ' || c_tabla_lote || ' ORDER BY SEQ';
+        LOOP
+            FETCH v_lote INTO v_cedula, v_valor;
+            EXIT WHEN v_lote%NOTFOUND;
+            llamar(p_proc, v_cedula, v_valor, v_fuente);
+            guardar_filas(v_fuente, v_fila);
+        END LOOP;
+        CLOSE v_lote;
+
+        IF g_columnas IS NULL THEN
+            OPEN p_cursor FOR SELECT * FROM DUAL WHERE 1 = 0;
+            RETURN;
+        END IF;
+
+        v_sql := 'SELECT ';
+        FOR i IN 1 .. g_columnas LOOP
+            IF i > 1 THEN
+                v_sql := v_sql || ', ';
+            END IF;
+            v_sql := v_sql || columna_sql(i);
+        END LOOP;
+        v_sql := v_sql || ' FROM RPA_LOTE_RESULTADO GROUP BY FILA ORDER BY FILA';
+        OPEN p_cursor FOR v_sql;
+    END ejecutar;
+END RPA_LOTE;
+/
+
+CREATE OR REPLACE PROCEDURE SP_DOCUMENTOSOPO_LOTE(p_cursor OUT SYS_REFCURSOR) AS
+BEGIN
+    RPA_LOTE.ejecutar('SP_DOCUMENTOSOPO', p_cursor);
+END SP_DOCUMENTOSOPO_LOTE;
+/
+
+CREATE OR REPLACE PROCEDURE SP_CTAHORRO_LOTE(p_cursor OUT SYS_REFCURSOR) AS
+BEGIN
+    RPA_LOTE.ejecutar('SP_CTAHORRO', p_cursor);
+END SP_CTAHORRO_LOTE;
+/
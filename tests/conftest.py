@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+from typing import Callable
+
+import pytest
+
+from . import fake_cx_oracle
+
+# bot.rpa.oracle_proc imports cx_Oracle at module level; the tests swap the
+# module it uses for a FakeModule, so the real driver is never needed.
+sys.modules.setdefault("cx_Oracle", fake_cx_oracle)
+
+BASE_ENV = {
+    "PORTAL_URL": "http://portal.test",
+    "PORTAL_NEEDS_LOGIN": "false",
+    "ENABLE_LINIX": "false",
+    "ENABLE_ORACLE": "true",
+    "ORACLE_USER": "rpa",
+    "ORACLE_PASSWORD": "rpa",
+    "ORACLE_DSN": "db.test/RPA",
+}
+
+
+@pytest.fixture
+def make_config(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Callable:
+    from bot.rpa import config as config_module
+
+    monkeypatch.chdir(tmp_path)
+    # Keep a developer's .env out of the tests.
+    monkeypatch.setattr(config_module, "load_dotenv", lambda *args, **kwargs: False)
+    counter = iter(range(1000))
+
+    def make(**env: str) -> config_module.Config:
+        for name, value in {**BASE_ENV, **env}.items():
+            monkeypatch.setenv(name, value)
+        return config_module.load_config(tmp_path / "runs" / f"run_{next(counter)}")
+
+    return make
+
+
+@pytest.fixture
+def fake_oracle(monkeypatch: pytest.MonkeyPatch) -> Callable[..., fake_cx_oracle.FakeModule]:
+    from bot.rpa import oracle_proc
+
+    def install(**kwargs) -> fake_cx_oracle.FakeModule:
+        module = fake_cx_oracle.FakeModule(fake_cx_oracle.FakeDatabase(**kwargs))
+        monkeypatch.setattr(oracle_proc, "cx_Oracle", module)
+        return module
+
+    return install
@@ -0,0 +1,171 @@
+"""In-memory stand-in for the parts of cx_Oracle used by bot.rpa.oracle_proc.
+
+SP_DOCUMENTOSOPO / SP_CTAHORRO return rows derived from (cedula, valor), and the
+*_LOTE procedures return the same rows for every record of the batch table, as
+sql/02_rpa_lote.sql does. Every call that would reach the database is counted
+in FakeDatabase.calls.
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from decimal import Decimal
+from typing import Callable
+
+SPOOL_ATTRVAL_WAIT = 1
+
+
+class DatabaseError(Exception):
+    pass
+
+
+def documentos_rows(cedula: int, valor: int) -> list[tuple]:
+    # 0, 1 or 2 rows per record, with None and datetime values like the real cursor.
+    return [
+        (cedula, valor, f"DS-{cedula}-{line}", None if line else datetime(2025, 1, 1 + cedula % 28))
+        for line in range(cedula % 3)
+    ]
+
+
+def ahorros_rows(cedula: int, valor: int) -> list[tuple]:
+    return [(cedula, f"AH{cedula:010d}", Decimal(valor) / 100)]
+
+
+class FakeDatabase:
+    def __init__(
+        self,
+        latency: Callable[[str, list], float] | None = None,
+        fail_cedula: int | None = None,
+    ) -> None:
+        self.latency = latency
+        self.fail_cedula = fail_cedula
+        self.calls: Counter[str] = Counter()
+        self._lock = threading.Lock()
+        self.procs = {
+            "SP_DOCUMENTOSOPO": documentos_rows,
+            "SP_CTAHORRO": ahorros_rows,
+        }
+
+    def count(self, kind: str) -> None:
+        with self._lock:
+            self.calls[kind] += 1
+
+    @property
+    def round_trips(self) -> int:
+        return sum(self.calls.values())
+
+    def rows_for(self, proc: str, cedula: int, valor: int) -> list[tuple]:
+        if cedula == self.fail_cedula:
+            raise DatabaseError(f"ORA-20000: fallo simulado para {cedula}")
+        return self.procs[proc](cedula, valor)
+
+
+class FakeCursor:
+    def __init__(self, connection: FakeConnection) -> None:
+        self.connection = connection
+        self.arraysize = 100
+        self._rows: list[tuple] = []
+
+    def execute(self, sql: str) -> None:
+        self.connection.db.count("execute")
+        if re.match(r"DELETE FROM \S+$", sql):
+            self.connection.batch.clear()
+            return
+        raise DatabaseError(f"ORA-00900: unexpected statement {sql!r}")
+
+    def executemany(self, sql: str, rows: list[list]) -> None:
+        self.connection.db.count("executemany")
+        if not sql.startswith("INSERT INTO "):
+            raise DatabaseError(f"ORA-00900: unexpected statement {sql!r}")
+        self.connection.batch.extend(tuple(row) for row in rows)
+
+    def callproc(self, name: str, params: list) -> None:
+        db = self.connection.db
+        db.count("callproc")
+        *args, out_cursor = params
+        if db.latency:
+            time.sleep(db.latency(name, args))
+        base = name.rsplit(".", 1)[-1]
+        if base.endswith("_LOTE"):
+            proc = base[: -len("_LOTE")]
+            rows = []
+            for _, cedula, valor in sorted(self.connection.batch):
+                rows.extend(db.rows_for(proc, cedula, valor))
+        else:
+            rows = db.rows_for(base, *args)
+        out_cursor._rows = rows
+
+    def fetchall(self) -> list[tuple]:
+        rows, self._rows = self._rows, []
+        return rows
+
+
+class FakeConnection:
+    def __init__(self, db: FakeDatabase) -> None:
+        self.db = db
+        # Contents of the session-private batch table (SEQ, CEDULA, VALOR).
+        self.batch: list[tuple] = []
+        self.closed = False
+
+    def cursor(self) -> FakeCursor:
+        return FakeCursor(self)
+
+    def ping(self) -> None:
+        self.db.count("ping")
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class FakePool:
+    def __init__(self, db: FakeDatabase, max: int) -> None:
+        self.db = db
+        self.max = max
+        self.closed = False
+        self.acquired = 0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> FakeConnection:
+        with self._lock:
+            if self.acquired >= self.max:
+                raise DatabaseError("ORA-24418: pool exhausted")
+            self.acquired += 1
+        return FakeConnection(self.db)
+
+    def release(self, conn: FakeConnection) -> None:
+        with self._lock:
+            self.acquired -= 1
+
+    def close(self, force: bool = False) -> None:
+        self.closed = True
+
+
+class FakeModule:
+    """Module-like object with the cx_Oracle API, bound to one FakeDatabase."""
+
+    DatabaseError = DatabaseError
+    SPOOL_ATTRVAL_WAIT = SPOOL_ATTRVAL_WAIT
+
+    def __init__(self, db: FakeDatabase) -> None:
+        self.db = db
+        self.connections: list[FakeConnection] = []
+        self.pools: list[FakePool] = []
+
+    def init_oracle_client(self, lib_dir: str | None = None) -> None:
+        pass
+
+    def connect(self, user: str, password: str, dsn: str) -> FakeConnection:
+        self.db.count("connect")
+        conn = FakeConnection(self.db)
+        self.connections.append(conn)
+        return conn
+
+    def SessionPool(self, **kwargs) -> FakePool:  # noqa: N802 - cx_Oracle name
+        self.db.count("connect")
+        pool = FakePool(self.db, kwargs["max"])
+        self.pools.append(pool)
+        return pool
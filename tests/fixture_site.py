@@ -0,0 +1,351 @@
+from __future__ import annotations
+
+import os
+import secrets
+import threading
+import time
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURE_USER = "rpa"
+FIXTURE_PASSWORD = "rpa"
+XLSX_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+LONG_POLL_S = 5
+
+
+def _html(title: str, body: str, assets: str = "") -> bytes:
+    return (
+        f'<!doctype html><html><head><meta charset="utf-8"><title>{title}</title></head>'
+        f"<body>{body}{assets}</body></html>"
+    ).encode("utf-8")
+
+
+def _login_form(action: str) -> str:
+    return (
+        f'<form method="post" action="{action}">'
+        '<input id="username" name="username"><input id="password" name="password" type="password">'
+        '<button type="submit">Ingresar</button></form>'
+    )
+
+
+REPORTS_BODY = """
+<button id="reports">Reportes</button>
+<div id="filtros" hidden>
+  <select id="tipoReporte"><option>Desembolsos</option></select>
+  <input id="fechaInicio"><input id="fechaFin">
+  <button id="generar">Generar</button>
+</div>
+<script>
+document.getElementById("reports").onclick = () => { document.getElementById("filtros").hidden = false; };
+document.getElementById("generar").onclick = () => {
+  const query = new URLSearchParams({
+    inicio: document.getElementById("fechaInicio").value,
+    fin: document.getElementById("fechaFin").value,
+  });
+  location.href = "/portal/descarga?" + query;
+};
+</script>
+"""
+
+SITE_CSS = """
+@font-face { font-family: "Corporativa"; src: url("/static/fuente.woff2") format("woff2"); }
+body { font-family: "Corporativa", sans-serif; }
+"""
+
+# Loaded from another host (localhost instead of 127.0.0.1), like a third-party tag.
+ANALYTICS_JS = """
+fetch(new URL("/collect", document.currentScript.src), {method: "POST", mode: "no-cors", body: "pv"});
+"""
+
+
+def _section_body(section: int) -> str:
+    # Contabilizar stays disabled until the server processed the attached file.
+    # A status long-poll stays open the whole time, as on the real core.
+    return f"""
+<input id="company"><input id="period"><input type="file" id="archivo">
+<button id="contabilizar" disabled>Contabilizar</button>
+<div class="alert-success" hidden>Contabilizado</div>
+<script>
+const archivo = document.getElementById("archivo");
+const boton = document.getElementById("contabilizar");
+archivo.onchange = async () => {{
+  await fetch("/core/procesar?seccion={section}", {{method: "POST", body: archivo.files[0]}});
+  boton.disabled = false;
+}};
+(async () => {{
+  for (;;) {{
+    await fetch("/core/estado").catch(() => new Promise((resolve) => setTimeout(resolve, 1000)));
+  }}
+}})();
+boton.onclick = async () => {{
+  boton.disabled = true;
+  await fetch("/core/contabilizar?seccion={section}", {{method: "POST"}});
+  document.querySelector(".alert-success").hidden = false;
+}};
+</script>
+"""
+
+
+class FixtureSite:
+    """Local stand-in for the portal and the core, with the markup of bot/rpa/selectors.py.
+
+    Every response waits ``latency_ms`` (network round trip) plus its size at
+    ``bandwidth_kbs`` KB/s (0: no limit), and a login POST also ``login_ms``
+    (server-side authentication). The home and reports pages carry a font,
+    ``images`` images of ``asset_kb`` KB and a third-party analytics script,
+    which is what lean mode blocks. The core takes ``process_ms`` to process
+    an attached file and ``post_ms`` to post a section, while its pages keep
+    a status long-poll open. The counters tell how many requests, bytes and
+    logins a run cost, and ``posted`` which core sections were posted, in
+    order.
+    """
+
+    def __init__(
+        self,
+        report: bytes,
+        latency_ms: int = 50,
+        login_ms: int = 800,
+        bandwidth_kbs: int = 0,
+        images: int = 12,
+        asset_kb: int = 150,
+        process_ms: int = 1500,
+        post_ms: int = 1000,
+    ) -> None:
+        self.report = report
+        self.latency_ms = latency_ms
+        self.login_ms = login_ms
+        self.bandwidth_kbs = bandwidth_kbs
+        self.images = images
+        self.asset = os.urandom(asset_kb * 1024)
+        self.process_ms = process_ms
+        self.post_ms = post_ms
+        self._lock = threading.Lock()
+        self._sessions: set[str] = set()
+        self.reset_counters()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.site = self  # type: ignore[attr-defined]
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def third_party_url(self) -> str:
+        return self.url.replace("127.0.0.1", "localhost")
+
+    def page_assets(self) -> str:
+        images = "".join(f'<img src="/static/banner_{idx}.png" width="120">' for idx in range(self.images))
+        return (
+            f'<link rel="stylesheet" href="/static/site.css">{images}'
+            f'<script src="{self.third_party_url}/analytics.js"></script>'
+        )
+
+    def start(self) -> FixtureSite:
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fixture", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> FixtureSite:
+        return self.start()
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.stop()
+
+    def reset_counters(self) -> None:
+        with self._lock:
+            self.requests = 0
+            self.bytes_sent = 0
+            self.logins = 0
+            self.posted: list[str] = []
+
+    def expire_sessions(self) -> None:
+        # As the real portal does overnight: saved cookies stop being accepted.
+        with self._lock:
+            self._sessions.clear()
+
+    def sent(self, size: int) -> None:
+        with self._lock:
+            self.requests += 1
+            self.bytes_sent += size
+
+    def post_section(self, section: str) -> None:
+        with self._lock:
+            self.posted.append(section)
+
+    def new_session(self) -> str:
+        sid = secrets.token_hex(16)
+        with self._lock:
+            self._sessions.add(sid)
+            self.logins += 1
+        return sid
+
+    def has_session(self, cookie_header: str | None, name: str) -> bool:
+        morsel = SimpleCookie(cookie_header or "").get(name)
+        with self._lock:
+            return morsel is not None and morsel.value in self._sessions
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    _ROUTES = {
+        ("GET", "/portal/login"): "_portal_login_page",
+        ("POST", "/portal/login"): "_portal_login",
+        ("GET", "/portal/inicio"): "_portal_home",
+        ("GET", "/portal/reportes"): "_portal_reports",
+        ("GET", "/portal/descarga"): "_portal_download",
+        ("GET", "/static/site.css"): "_site_css",
+        ("GET", "/analytics.js"): "_analytics",
+        ("POST", "/collect"): "_collect",
+        ("GET", "/core/login"): "_core_login_page",
+        ("POST", "/core/login"): "_core_login",
+        ("GET", "/core/inicio"): "_core_home",
+        ("GET", "/core/seccion1"): "_core_section",
+        ("GET", "/core/seccion2"): "_core_section",
+        ("POST", "/core/procesar"): "_core_process",
+        ("POST", "/core/contabilizar"): "_core_post",
+        ("GET", "/core/estado"): "_core_status",
+    }
+
+    @property
+    def site(self) -> FixtureSite:
+        return self.server.site  # type: ignore[attr-defined]
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+    def do_GET(self) -> None:  # noqa: N802 - http.server name
+        self._dispatch("GET")
+
+    def do_POST(self) -> None:  # noqa: N802 - http.server name
+        self._dispatch("POST")
+
+    def _dispatch(self, method: str) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        self.body = self.rfile.read(length) if length else b""
+        time.sleep(self.site.latency_ms / 1000)
+        path = urlsplit(self.path).path
+        route = self._ROUTES.get((method, path))
+        if route is None and method == "GET" and path.startswith("/static/"):
+            route = "_asset"
+        if route is None:
+            self._send(404, b"not found", "text/plain")
+            return
+        getattr(self, route)()
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: dict[str, str] | None = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        # Counted before writing, so the client never sees a response its
+        # counters do not include yet.
+        self.site.sent(len(body))
+        if self.site.bandwidth_kbs:
+            time.sleep(len(body) / (self.site.bandwidth_kbs * 1024))
+        self.wfile.write(body)
+
+    def _redirect(self, location: str, headers: dict[str, str] | None = None) -> None:
+        self._send(303, b"", "text/plain", {"Location": location, **(headers or {})})
+
+    def _authenticated(self, cookie: str) -> bool:
+        return self.site.has_session(self.headers.get("Cookie"), cookie)
+
+    def _login(self, cookie: str, home: str) -> bool:
+        form = parse_qs(self.body.decode("utf-8"))
+        if form.get("username") != [FIXTURE_USER] or form.get("password") != [FIXTURE_PASSWORD]:
+            return False
+        time.sleep(self.site.login_ms / 1000)
+        sid = self.site.new_session()
+        self._redirect(home, {"Set-Cookie": f"{cookie}={sid}; Path=/; Max-Age=28800; HttpOnly"})
+        return True
+
+    def _portal_login_page(self) -> None:
+        self._send(200, _html("Portal", _login_form("/portal/login")), "text/html")
+
+    def _portal_login(self) -> None:
+        if not self._login("portal_sid", "/portal/inicio"):
+            self._portal_login_page()
+
+    def _portal_home(self) -> None:
+        if not self._authenticated("portal_sid"):
+            self._portal_login_page()
+            return
+        body = '<div class="dashboard"><a href="/portal/reportes">Reportes</a></div>'
+        self._send(200, _html("Inicio", body, self.site.page_assets()), "text/html")
+
+    def _portal_reports(self) -> None:
+        # Like the real portal, a rejected session gets the login form back.
+        if not self._authenticated("portal_sid"):
+            self._portal_login_page()
+            return
+        self._send(200, _html("Reportes", REPORTS_BODY, self.site.page_assets()), "text/html")
+
+    def _portal_download(self) -> None:
+        if not self._authenticated("portal_sid"):
+            self._redirect("/portal/login")
+            return
+        self._send(200, self.site.report, XLSX_TYPE, {"Content-Disposition": 'attachment; filename="reporte.xlsx"'})
+
+    def _site_css(self) -> None:
+        self._send(200, SITE_CSS.encode("utf-8"), "text/css")
+
+    def _asset(self) -> None:
+        # Banner images and the font share one payload; only the size matters here.
+        self._send(200, self.site.asset, "application/octet-stream", {"Cache-Control": "no-store"})
+
+    def _analytics(self) -> None:
+        body = ANALYTICS_JS.encode("utf-8") + b"//" + b"x" * len(self.site.asset)
+        self._send(200, body, "text/javascript", {"Cache-Control": "no-store"})
+
+    def _collect(self) -> None:
+        self._send(204, b"", "text/plain")
+
+    def _core_login_page(self) -> None:
+        self._send(200, _html("Core", _login_form("/core/login")), "text/html")
+
+    def _core_login(self) -> None:
+        if not self._login("core_sid", "/core/inicio"):
+            self._core_login_page()
+
+    def _core_home(self) -> None:
+        if not self._authenticated("core_sid"):
+            self._core_login_page()
+            return
+        self._send(200, _html("Core", '<div class="home">Core financiero</div>'), "text/html")
+
+    def _core_section(self) -> None:
+        if not self._authenticated("core_sid"):
+            self._core_login_page()
+            return
+        section = int(urlsplit(self.path).path[-1])
+        self._send(200, _html(f"Seccion {section}", _section_body(section)), "text/html")
+
+    def _core_process(self) -> None:
+        if not self._authenticated("core_sid"):
+            self._send(401, b"", "text/plain")
+            return
+        time.sleep(self.site.process_ms / 1000)
+        self._send(200, b"procesado", "text/plain")
+
+    def _core_status(self) -> None:
+        time.sleep(LONG_POLL_S)
+        self._send(200, b"{}", "application/json")
+
+    def _core_post(self) -> None:
+        if not self._authenticated("core_sid"):
+            self._send(401, b"", "text/plain")
+            return
+        time.sleep(self.site.post_ms / 1000)
+        self.site.post_section("seccion" + parse_qs(urlsplit(self.path).query)["seccion"][0])
+        self._send(200, b"contabilizado", "text/plain")
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from datetime import date
+
+import pytest
+
+from bot.main import run_backfill, run_pipeline
+from bot.rpa.checkpoint import Checkpoint
+from bot.rpa.transform import EmptyReportError
+
+HEADER = "IDENTIFICACION;MONTO;PLAZO;FECHA SOLICITUD\n"
+
+
+def _fake_download(chunk_config, chunk_ctx, jobs):
+    # The portal returns the header only for days without disbursements.
+    report = chunk_ctx.downloads_dir / "reporte.csv"
+    rows = "" if jobs[0].start.weekday() >= 5 else f"{jobs[0].start:%d%m}001;1500000;12;{jobs[0].start:%d/%m/%Y}\n"
+    report.write_text(HEADER + rows, encoding="utf-8")
+    return [report]
+
+
+def test_empty_backfill_chunks_count_as_zero_records(make_config, fake_oracle, monkeypatch):
+    from bot.rpa import portal_jobs
+
+    monkeypatch.setattr(portal_jobs, "download_portal_reports", _fake_download)
+    fake_oracle()
+    config = make_config(BACKFILL_CHUNK_DAYS="1")
+
+    # Saturday, Sunday and Monday.
+    run_backfill(config, config.run_context, None, date(2026, 9, 5), date(2026, 9, 7))
+
+    chunk_dirs = sorted(config.run_context.run_dir.glob("chunk_*"))
+    assert [path.name for path in chunk_dirs] == [
+        "chunk_20260905_20260905",
+        "chunk_20260906_20260906",
+        "chunk_20260907_20260907",
+    ]
+    for chunk_dir in chunk_dirs:
+        checkpoint = Checkpoint(chunk_dir)
+        assert checkpoint.is_complete("transform") and checkpoint.is_complete("oracle")
+    sizes = [Checkpoint(path).output("transform", "linix").stat().st_size for path in chunk_dirs]
+    assert sizes[0] == sizes[1] == 0 and sizes[2] > 0
+
+
+def test_empty_report_is_an_error_outside_backfill(make_config, fake_oracle):
+    fake_oracle()
+    config = make_config()
+    run_ctx = config.run_context
+    report = run_ctx.downloads_dir / "reporte.csv"
+    report.write_text(HEADER, encoding="utf-8")
+
+    with pytest.raises(EmptyReportError):
+        run_pipeline(config, run_ctx, Checkpoint(run_ctx.run_dir), None, download=lambda *_: [report])
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+from http.cookiejar import CookieJar
+from urllib.parse import urlencode
+from urllib.request import HTTPCookieProcessor, build_opener
+
+import pytest
+
+from bot.main import _download_in_context
+from bot.rpa.download import PORTAL_SESSION, _reports_ready_selector
+from bot.rpa.logging_utils import configure_evidence
+from bot.rpa.selectors import PORTAL_LOGIN_USERNAME
+from bot.rpa.sessions import new_browser_context, session_is_active, session_state_path
+
+from .fixture_site import FIXTURE_PASSWORD, FIXTURE_USER, FixtureSite
+
+REPORT = b"PK\x03\x04 reporte"
+
+
+@pytest.fixture
+def site():
+    with FixtureSite(REPORT, latency_ms=0, login_ms=0, process_ms=0, post_ms=0) as fixture:
+        yield fixture
+
+
+@pytest.fixture
+def browser():
+    sync_api = pytest.importorskip("playwright.sync_api")
+    with sync_api.sync_playwright() as playwright:
+        try:
+            launched = playwright.chromium.launch()
+        except sync_api.Error as exc:
+            pytest.skip(f"Chromium is not installed: {str(exc).splitlines()[0]}")
+        yield launched
+        launched.close()
+
+
+@pytest.fixture
+def portal_config(make_config, site):
+    config = make_config(
+        PORTAL_URL=f"{site.url}/portal/reportes",
+        PORTAL_LOGIN_URL=f"{site.url}/portal/login",
+        PORTAL_NEEDS_LOGIN="true",
+        PORTAL_USERNAME=FIXTURE_USER,
+        PORTAL_PASSWORD=FIXTURE_PASSWORD,
+        PORTAL_REPORT_TYPE_TEXT="Desembolsos",
+        SESSION_REUSE="true",
+        SESSION_PLAINTEXT="true",
+        EVIDENCE_LEVEL="off",
+        HEADLESS="true",
+    )
+    configure_evidence(config)
+    return config
+
+
+def _browser():
+    return build_opener(HTTPCookieProcessor(CookieJar()))
+
+
+def _get(opener, url: str) -> str:
+    with opener.open(url) as response:
+        return response.read().decode("utf-8")
+
+
+def _login(opener, url: str) -> str:
+    data = urlencode({"username": FIXTURE_USER, "password": FIXTURE_PASSWORD}).encode()
+    with opener.open(url, data=data) as response:
+        return response.read().decode("utf-8")
+
+
+def test_portal_requires_login_and_serves_the_report(site):
+    opener = _browser()
+
+    assert 'id="username"' in _get(opener, f"{site.url}/portal/reportes")
+    assert 'class="dashboard"' in _login(opener, f"{site.url}/portal/login")
+    assert 'id="tipoReporte"' in _get(opener, f"{site.url}/portal/reportes")
+    with opener.open(f"{site.url}/portal/descarga?inicio=01/01/2025&fin=01/01/2025") as response:
+        assert response.headers["Content-Disposition"] == 'attachment; filename="reporte.xlsx"'
+        assert response.read() == REPORT
+    assert site.logins == 1
+
+
+def test_expired_sessions_get_the_login_form_again(site):
+    opener = _browser()
+    _login(opener, f"{site.url}/portal/login")
+    site.expire_sessions()
+
+    assert 'id="username"' in _get(opener, f"{site.url}/portal/reportes")
+
+
+def test_wrong_credentials_do_not_log_in(site):
+    opener = _browser()
+    data = urlencode({"username": FIXTURE_USER, "password": "otra"}).encode()
+    with opener.open(f"{site.url}/portal/login", data=data) as response:
+        assert 'id="username"' in response.read().decode("utf-8")
+    assert site.logins == 0
+
+
+def test_pages_carry_the_assets_lean_mode_blocks(site):
+    opener = _browser()
+    page = _login(opener, f"{site.url}/portal/login")
+
+    assert page.count("<img ") == site.images
+    assert f"{site.third_party_url}/analytics.js" in page
+    site.reset_counters()
+    with opener.open(f"{site.url}/static/banner_3.png") as response:
+        assert response.read() == site.asset
+    assert (site.requests, site.bytes_sent) == (1, len(site.asset))
+
+
+def test_core_sections_process_the_file_before_posting(site):
+    opener = _browser()
+
+    assert 'id="username"' in _get(opener, f"{site.url}/core/seccion2")
+    assert 'class="home"' in _login(opener, f"{site.url}/core/login")
+    page = _get(opener, f"{site.url}/core/seccion2")
+    assert 'type="file"' in page and 'id="contabilizar" disabled' in page
+    assert "/core/procesar?seccion=2" in page
+    with opener.open(f"{site.url}/core/procesar?seccion=2", data=b"cedula;valor\n") as response:
+        assert response.read() == b"procesado"
+    with opener.open(f"{site.url}/core/contabilizar?seccion=2", data=b"") as response:
+        assert response.status == 200
+    assert site.posted == ["seccion2"]
+
+
+def test_saved_session_is_active_until_the_portal_expires_it(browser, site, portal_config):
+    _download_in_context(browser, portal_config, portal_config.run_context)
+    assert site.logins == 1
+    assert session_state_path(portal_config, PORTAL_SESSION).exists()
+
+    context = new_browser_context(browser, portal_config, PORTAL_SESSION)
+    try:
+        page = context.new_page()
+        args = (portal_config.portal_url, PORTAL_LOGIN_USERNAME, _reports_ready_selector())
+        assert session_is_active(page, *args)
+        site.expire_sessions()
+        assert not session_is_active(page, *args)
+    finally:
+        context.close()
+
+
+def test_expired_saved_session_falls_back_to_a_full_login(browser, site, portal_config):
+    run_ctx = portal_config.run_context
+    _download_in_context(browser, portal_config, run_ctx)
+    site.reset_counters()
+    _download_in_context(browser, portal_config, run_ctx)
+    assert site.logins == 0
+
+    site.expire_sessions()
+    [report_path] = _download_in_context(browser, portal_config, run_ctx)
+
+    assert site.logins == 1
+    assert report_path.read_bytes() == REPORT
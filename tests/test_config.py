@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import pytest
+
+from bot.rpa import config as config_module
+
+# A .env written for the full pipeline, with what --transform-only does not use
+# missing or wrong.
+PIPELINE_ENV = {
+    "PORTAL_NEEDS_LOGIN": "true",
+    "ENABLE_ORACLE": "true",
+    "ENABLE_LINIX": "true",
+    "CORE_UPLOAD_MODE": "both",
+    "CORE_SECTION1_FIELDS_JSON": "{",
+    "DAEMON_SCHEDULE": "every morning",
+    "EVIDENCE_LEVEL": "verbose",
+}
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(config_module, "load_dotenv", lambda *args, **kwargs: False)
+    for name in ("PORTAL_URL", "ORACLE_USER", "ORACLE_PASSWORD", "ORACLE_DSN", "LINIX_APP_PATH"):
+        monkeypatch.delenv(name, raising=False)
+    for name, value in PIPELINE_ENV.items():
+        monkeypatch.setenv(name, value)
+    return monkeypatch
+
+
+def test_transform_only_ignores_the_other_stages(env, tmp_path):
+    env.setenv("TRANSFORM_XLSX_ENGINE", "xml")
+    env.setenv("OUTPUT_ENCODING", "latin-1")
+
+    config = config_module.load_transform_config(tmp_path / "run")
+
+    assert (config.transform_xlsx_engine, config.output_encoding) == ("xml", "latin-1")
+    assert not config.enable_oracle and not config.enable_linix and not config.enable_ledger
+    with pytest.raises(ValueError):
+        config_module.load_config(tmp_path / "run_full")
+
+
+@pytest.mark.parametrize(
+    ("name", "value"),
+    [("TRANSFORM_XLSX_ENGINE", "pandas"), ("OUTPUT_ENCODING", "utf-9")],
+)
+def test_transform_only_still_validates_transform_settings(env, tmp_path, name, value):
+    env.setenv(name, value)
+
+    with pytest.raises(ValueError, match=name):
+        config_module.load_transform_config(tmp_path / "run")
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, replace
+from pathlib import Path
+
+import pytest
+
+from bot.rpa import core_upload
+from bot.rpa.core_upload import (
+    CoreSectionsError,
+    _Section,
+    _UploadTraffic,
+    _upload_sections_interleaved,
+    _wait_upload_processed,
+)
+
+
+@dataclass(eq=False)
+class FakeRequest:
+    url: str
+    method: str = "GET"
+    resource_type: str = "fetch"
+
+
+class FakeLocator:
+    def __init__(self, form_target: dict | None) -> None:
+        self.first = self
+        self.form_target = form_target
+
+    def evaluate(self, script: str) -> dict | None:
+        return self.form_target
+
+
+class FakePage:
+    url = "https://core.test/seccion1"
+
+    def __init__(self, form_target: dict | None = None) -> None:
+        self.form_target = form_target
+        self.listeners: dict[str, list] = {}
+
+    def locator(self, selector: str) -> FakeLocator:
+        return FakeLocator(self.form_target)
+
+    def on(self, event: str, handler) -> None:
+        self.listeners.setdefault(event, []).append(handler)
+
+    def remove_listener(self, event: str, handler) -> None:
+        self.listeners[event].remove(handler)
+
+    def emit(self, event: str, request: FakeRequest) -> None:
+        for handler in list(self.listeners.get(event, [])):
+            handler(request)
+
+
+class EnabledButtonPage(FakePage):
+    # Contabilizar is enabled from the start; the upload request is dispatched
+    # during a later Playwright call, as the real driver does.
+    def __init__(self, events: dict[str, list[tuple[str, FakeRequest]]]) -> None:
+        super().__init__()
+        self.events = events
+        self.polls = 0
+
+    def locator(self, selector: str) -> FakeLocator:
+        locator = super().locator(selector)
+        locator.count = lambda: self._call("count") or 1
+        locator.is_enabled = lambda: self._call("is_enabled") or True
+        return locator
+
+    def wait_for_timeout(self, timeout: float) -> None:
+        self.polls += 1
+        self._call("wait_for_timeout")
+
+    def _call(self, name: str) -> None:
+        queue = self.events.get(name, [])
+        if queue:
+            self.emit(*queue.pop(0))
+
+
+def _start_all(page: FakePage, requests: list[FakeRequest]) -> None:
+    for request in requests:
+        page.emit("request", request)
+
+
+BACKGROUND = [
+    FakeRequest("https://core.test/estado"),  # long-poll
+    FakeRequest("https://www.google-analytics.com/collect", "POST"),
+    FakeRequest("https://core.test/logo.png", "GET", "image"),
+]
+
+
+def test_without_a_form_only_same_origin_writes_count():
+    page = FakePage()
+    traffic = _UploadTraffic(page, "input[type=file]")
+    upload = FakeRequest("https://core.test/api/procesar", "POST")
+
+    _start_all(page, [*BACKGROUND, upload])
+
+    assert traffic.pending == {upload}
+    page.emit("requestfinished", upload)
+    assert not traffic.pending
+    traffic.close()
+    assert all(not handlers for handlers in page.listeners.values())
+
+
+def test_form_action_and_method_select_the_upload():
+    page = FakePage({"action": "https://core.test/cargar", "method": "POST"})
+    traffic = _UploadTraffic(page, "input[type=file]")
+    upload = FakeRequest("https://core.test/cargar", "POST", "document")
+
+    _start_all(page, [*BACKGROUND, FakeRequest("https://core.test/otra", "POST"), upload])
+
+    assert traffic.pending == {upload}
+    assert traffic.started == 1
+
+
+@pytest.mark.parametrize("starts_in", ["is_enabled", "wait_for_timeout"])
+def test_an_enabled_button_waits_for_the_upload_requests(make_config, starts_in):
+    config = make_config()
+    upload = FakeRequest("https://core.test/api/procesar", "POST")
+    events = {starts_in: [("request", upload)]}
+    events.setdefault("wait_for_timeout", []).append(("requestfinished", upload))
+    page = EnabledButtonPage(events)
+    traffic = _UploadTraffic(page, "input[type=file]")
+
+    _wait_upload_processed(page, config, _section(1), traffic)
+
+    assert traffic.started == 1
+    assert not traffic.pending
+    assert not events["wait_for_timeout"]
+
+
+class NoTraffic:
+    def __init__(self, page: object, upload_selector: str) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class SectionPage:
+    def __init__(self, clicks: list[str], fail_upload: bool = False, context: object = None) -> None:
+        self.clicks = clicks
+        self.fail_upload = fail_upload
+        self.context = context
+        self.url = ""
+
+    def goto(self, url: str, **kwargs) -> None:
+        self.url = url
+
+    def wait_for_selector(self, selector: str, **kwargs) -> None:
+        pass
+
+    def set_input_files(self, selector: str, path: str) -> None:
+        if self.fail_upload:
+            raise RuntimeError("upload rejected")
+
+    def click(self, selector: str) -> None:
+        self.clicks.append(self.url)
+
+    def close(self) -> None:
+        pass
+
+
+class SectionContext:
+    def __init__(self, second_page: SectionPage) -> None:
+        self.second_page = second_page
+
+    def new_page(self) -> SectionPage:
+        return self.second_page
+
+
+def _section(number: int) -> _Section:
+    return _Section(
+        f"core_section{number}", f"https://core.test/seccion{number}", {}, {}, "input", "button", "div", ""
+    )
+
+
+# parallel posts the sections together, so an upload failure posts none;
+# ordered posts the sections before the failed one, as sequential does.
+@pytest.mark.parametrize("mode, posted", [("parallel", []), ("ordered", ["https://core.test/seccion1"])])
+def test_a_failed_upload_stops_posting_the_other_sections(make_config, monkeypatch, mode, posted):
+    monkeypatch.setattr(core_upload, "_UploadTraffic", NoTraffic)
+    monkeypatch.setattr(core_upload, "_wait_upload_processed", lambda *args: None)
+    monkeypatch.setattr(core_upload, "safe_screenshot", lambda *args: None)
+    config = replace(make_config(), dry_run=False, core_upload_mode=mode)
+    clicks: list[str] = []
+    page = SectionPage(clicks, context=SectionContext(SectionPage(clicks, fail_upload=True)))
+
+    with pytest.raises(CoreSectionsError, match="core_section2: upload rejected"):
+        _upload_sections_interleaved(page, config, config.run_context, [_section(1), _section(2)], Path("cargue.csv"))
+
+    assert clicks == posted
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import logging
+
+import pytest
+
+from bot.rpa import logging_utils
+from bot.rpa.logging_utils import EVIDENCE_ERROR, EVIDENCE_KEY, configure_evidence, flush_evidence, safe_screenshot
+
+
+class FakePage:
+    def __init__(self) -> None:
+        self.url = "http://core.test/seccion1"
+        self.screenshots = 0
+
+    def title(self) -> str:
+        return "Seccion 1"
+
+    def screenshot(self, **options) -> bytes:
+        self.screenshots += 1
+        return b"\x89PNG"
+
+
+@pytest.fixture
+def on_error_config(make_config, monkeypatch):
+    # configure_evidence rebinds the module policy; restore it after the test.
+    monkeypatch.setattr(logging_utils, "_POLICY", logging_utils._POLICY)
+    monkeypatch.setattr(logging_utils, "_RECENT", logging_utils._RECENT)
+    config = make_config(EVIDENCE_LEVEL="on_error", EVIDENCE_ERROR_CONTEXT="2")
+    configure_evidence(config)
+    return config
+
+
+def test_on_error_skips_step_screenshots(on_error_config):
+    page = FakePage()
+
+    for step in ("login", "upload", "before_contabilizar"):
+        safe_screenshot(page, on_error_config.run_context, step)
+    safe_screenshot(page, on_error_config.run_context, "after_success", EVIDENCE_KEY)
+    flush_evidence()
+
+    assert page.screenshots == 0
+    assert list(on_error_config.run_context.screenshots_dir.iterdir()) == []
+
+
+def test_on_error_logs_the_last_steps_with_the_error(on_error_config, caplog):
+    page = FakePage()
+    run_ctx = on_error_config.run_context
+
+    for step in ("login", "upload", "before_contabilizar"):
+        safe_screenshot(page, run_ctx, step)
+    with caplog.at_level(logging.INFO, logger="rpa"):
+        safe_screenshot(page, run_ctx, "core_error", EVIDENCE_ERROR)
+    flush_evidence()
+
+    assert page.screenshots == 1
+    assert [path.name for path in run_ctx.screenshots_dir.iterdir()] == ["core_error.png"]
+    steps = [record.getMessage() for record in caplog.records if record.getMessage().startswith("  ")]
+    assert len(steps) == 2
+    assert "upload http://core.test/seccion1 'Seccion 1'" in steps[0]
+    assert "before_contabilizar" in steps[1]
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import importlib
+import sys
+import threading
+import time
+import types
+from pathlib import Path
+
+import pytest
+
+from bot.main import run_pipeline
+from bot.rpa.checkpoint import Checkpoint
+from bot.rpa.ledger import STATUS_PENDING, STATUS_POSTED, Ledger, record_key
+from bot.rpa.transform import ReportRecord, _linix_line, linix_output_path
+
+
+def _records(count: int, first: int = 1) -> list[ReportRecord]:
+    return [ReportRecord(str(5_000_000 + i), "1000000", "12", "02012025") for i in range(first, first + count)]
+
+
+def _status(ledger: Ledger, record: ReportRecord) -> tuple[str, str] | None:
+    return ledger._conn.execute(
+        "SELECT run_id, status FROM ledger WHERE key = ?", (record_key(record),)
+    ).fetchone()
+
+
+@pytest.fixture
+def linix_calls(monkeypatch: pytest.MonkeyPatch) -> list[list[str]]:
+    # Stands in for the pywinauto flow; records the lines it was asked to load.
+    calls: list[list[str]] = []
+
+    def run_linix_flow(config, run_ctx, linix_file, on_loaded=None, **kwargs) -> None:
+        calls.append(linix_file.read_text(encoding="utf-8").splitlines())
+        if on_loaded is not None:
+            on_loaded(linix_file)
+
+    module = types.ModuleType("bot.rpa.linix_app")
+    module.run_linix_flow = run_linix_flow
+    monkeypatch.setitem(sys.modules, "bot.rpa.linix_app", module)
+    return calls
+
+
+@pytest.fixture
+def linix_app(monkeypatch: pytest.MonkeyPatch):
+    # The real module, with pywinauto (Windows only) replaced by empty stand-ins;
+    # tests stub the UI steps they reach.
+    pywinauto = types.ModuleType("pywinauto")
+    pywinauto.Application = pywinauto.Desktop = object
+    pywinauto.keyboard = types.SimpleNamespace(send_keys=lambda keys: None)
+    base_wrapper = types.ModuleType("pywinauto.base_wrapper")
+    base_wrapper.BaseWrapper = object
+    monkeypatch.setitem(sys.modules, "pywinauto", pywinauto)
+    monkeypatch.setitem(sys.modules, "pywinauto.base_wrapper", base_wrapper)
+    monkeypatch.delitem(sys.modules, "bot.rpa.linix_app", raising=False)
+    module = importlib.import_module("bot.rpa.linix_app")
+    yield module
+    sys.modules.pop("bot.rpa.linix_app", None)
+
+
+def _staged_run(config, ledger: Ledger, records: list[ReportRecord]) -> Checkpoint:
+    # A run that got past the transform stage: its LINIX file is checkpointed
+    # and its records are pending in the ledger under its run id.
+    run_ctx = config.run_context
+    report = run_ctx.downloads_dir / "reporte.xlsx"
+    report.write_bytes(b"")
+    linix_file = linix_output_path(run_ctx.outputs_dir)
+    linix_file.write_text("".join(_linix_line(record, "1") for record in records), encoding="utf-8")
+    for record in records:
+        ledger.accept(record, run_ctx.run_id)
+    ledger.commit()
+    checkpoint = Checkpoint(run_ctx.run_dir)
+    checkpoint.mark_complete("download", {"report": report})
+    checkpoint.mark_complete("transform", {"linix": linix_file})
+    return checkpoint
+
+
+def test_oracle_only_run_leaves_records_pending(make_config, tmp_path: Path):
+    config = make_config(ENABLE_ORACLE="false", ENABLE_LINIX="false")
+    ledger = Ledger(tmp_path / "ledger.sqlite3")
+    records = _records(3)
+    checkpoint = _staged_run(config, ledger, records)
+
+    run_pipeline(config, config.run_context, checkpoint, ledger)
+
+    assert {_status(ledger, record)[1] for record in records} == {STATUS_PENDING}
+
+
+def test_resume_skips_records_posted_by_another_run(make_config, tmp_path: Path, linix_calls):
+    ledger = Ledger(tmp_path / "ledger.sqlite3")
+    linix_env = {"ENABLE_ORACLE": "false", "ENABLE_LINIX": "true", "LINIX_APP_PATH": "linix.exe", "LINIX_WINDOW_TITLE": "LINIX"}
+    run_a = make_config(**linix_env)
+    records = _records(4)
+    checkpoint_a = _staged_run(run_a, ledger, records)
+
+    # Run B re-stages and posts the first two records while run A is stopped.
+    run_b = make_config(**linix_env)
+    for record in records[:2]:
+        ledger.accept(record, run_b.run_context.run_id)
+    ledger.mark_posted(run_b.run_context.run_id, records[:2])
+
+    run_pipeline(run_a, run_a.run_context, Checkpoint(run_a.run_context.run_dir), ledger)
+
+    assert linix_calls == [[_linix_line(record, "1").rstrip("\n") for record in records[2:]]]
+    assert [_status(ledger, record) for record in records] == [
+        (run_b.run_context.run_id, STATUS_POSTED),
+        (run_b.run_context.run_id, STATUS_POSTED),
+        (run_a.run_context.run_id, STATUS_POSTED),
+        (run_a.run_context.run_id, STATUS_POSTED),
+    ]
+    # The rewritten LINIX file is checkpointed, so a later resume keeps it.
+    assert Checkpoint(run_a.run_context.run_dir).is_complete("transform")
+    assert checkpoint_a.run_dir == run_a.run_context.run_dir
+
+
+def test_shards_loaded_before_a_failure_stay_posted(make_config, tmp_path: Path, monkeypatch, linix_app):
+    ledger = Ledger(tmp_path / "ledger.sqlite3")
+    linix_env = {"ENABLE_ORACLE": "false", "ENABLE_LINIX": "true", "LINIX_APP_PATH": "linix.exe", "LINIX_WINDOW_TITLE": "LINIX"}
+    run_a = make_config(**linix_env, LINIX_SHARD_SIZE="2")
+    records = _records(6)
+    _staged_run(run_a, ledger, records)
+    loaded: list[str] = []
+
+    def load_solicitudes(config, window, waiter, file_path, timeout_sec) -> None:
+        if file_path.name.endswith("_002.csv"):
+            raise RuntimeError("LINIX no responde")
+        loaded.append(file_path.name)
+
+    monkeypatch.setattr(linix_app, "_connect_app", lambda config: None)
+    monkeypatch.setattr(linix_app, "_get_window", lambda app, config, timeout_sec: None)
+    monkeypatch.setattr(linix_app, "_Waiter", lambda app, window, config: None)
+    monkeypatch.setattr(linix_app, "_open_section1_and_fill", lambda config, window, waiter: None)
+    monkeypatch.setattr(linix_app, "_load_solicitudes", load_solicitudes)
+
+    with pytest.raises(linix_app.LinixError):
+        run_pipeline(run_a, run_a.run_context, Checkpoint(run_a.run_context.run_dir), ledger)
+
+    assert len(loaded) == 1
+    assert [_status(ledger, record)[1] for record in records] == [STATUS_POSTED] * 2 + [STATUS_PENDING] * 4
+    # A later run that is not a --resume stages only the records LINIX never got.
+    run_b = make_config(**linix_env)
+    assert [ledger.accept(record, run_b.run_context.run_id) for record in records] == [False] * 2 + [True] * 4
+
+
+def test_shared_ledger_accepts_from_concurrent_runs(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    # Two profiles sharing LEDGER_PATH stage records at transform pace; each
+    # transform outlasts the busy timeout, so neither may hold the write lock
+    # for its whole transform.
+    from bot.rpa import ledger as ledger_module
+
+    monkeypatch.setattr(ledger_module, "BUSY_TIMEOUT_S", 1)
+    monkeypatch.setattr(ledger_module, "COMMIT_EVERY", 50)
+    path = tmp_path / "ledger.sqlite3"
+    errors: list[BaseException] = []
+
+    def stage(run_id: str, first: int) -> None:
+        ledger = Ledger(path)
+        try:
+            for record in _records(1000, first):
+                ledger.accept(record, run_id)
+                time.sleep(0.002)
+            ledger.commit()
+        except BaseException as exc:
+            errors.append(exc)
+        finally:
+            ledger.close()
+
+    threads = [threading.Thread(target=stage, args=(f"run_{n}", n * 10_000)) for n in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    ledger = Ledger(path)
+    assert sum(count for _, _, count, _ in ledger.summary()) == 2000
+    ledger.close()
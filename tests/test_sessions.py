@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import os
+from dataclasses import replace
+
+import pytest
+
+from bot.rpa import sessions
+
+STATE = {"cookies": [{"name": "portal_sid", "value": "secreto123", "domain": "portal.test", "path": "/"}], "origins": []}
+
+
+class FakeContext:
+    def storage_state(self) -> dict:
+        return STATE
+
+
+def _xor(data: bytes, *args: object) -> bytes:
+    return bytes(byte ^ 0x5A for byte in data)
+
+
+def test_plaintext_state_round_trips(make_config):
+    config = make_config(SESSION_REUSE="true", SESSION_PLAINTEXT="true")
+
+    sessions.save_session_state(FakeContext(), config, "portal")
+
+    assert sessions.session_state_path(config, "portal").name == "portal_state.json"
+    assert sessions.load_session_state(config, "portal") == STATE
+
+
+def test_protected_state_keeps_cookies_out_of_the_file(make_config, monkeypatch):
+    monkeypatch.setattr(sessions, "_protect", _xor)
+    monkeypatch.setattr(sessions, "_unprotect", _xor)
+    config = replace(make_config(SESSION_REUSE="true", SESSION_PLAINTEXT="true"), session_plaintext=False)
+
+    sessions.save_session_state(FakeContext(), config, "portal")
+
+    path = sessions.session_state_path(config, "portal")
+    assert path.name == "portal_state.dpapi"
+    assert b"secreto123" not in path.read_bytes()
+    assert sessions.load_session_state(config, "portal") == STATE
+
+
+def test_unreadable_state_means_a_full_login(make_config, monkeypatch):
+    def fail(data: bytes) -> bytes:
+        raise OSError("Key not valid for use in specified state")
+
+    monkeypatch.setattr(sessions, "_protect", _xor)
+    monkeypatch.setattr(sessions, "_unprotect", fail)
+    config = replace(make_config(SESSION_REUSE="true", SESSION_PLAINTEXT="true"), session_plaintext=False)
+    sessions.save_session_state(FakeContext(), config, "portal")
+
+    assert sessions.load_session_state(config, "portal") is None
+    assert not sessions.session_state_path(config, "portal").exists()
+
+
+@pytest.mark.skipif(os.name == "nt", reason="DPAPI is available on Windows")
+def test_session_reuse_without_dpapi_needs_the_plaintext_opt_in(make_config):
+    with pytest.raises(ValueError, match="SESSION_PLAINTEXT"):
+        make_config(SESSION_REUSE="true")
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pytest
+from openpyxl import Workbook
+
+from bot.rpa.config import RunContext
+from bot.rpa.portal_jobs import job_stem
+from bot.rpa.transform import TransformError, _read_records
+
+HEADER = "IDENTIFICACION;MONTO;PLAZO;FECHA SOLICITUD\n"
+
+
+def _report(path: Path, *rows: str) -> Path:
+    path.write_text(HEADER + "".join(f"{row}\n" for row in rows), encoding="utf-8")
+    return path
+
+
+def test_an_empty_report_is_skipped_when_another_has_data(tmp_path):
+    empty = _report(tmp_path / "otro.csv")
+    full = _report(tmp_path / "desembolsos.csv", "1000001;1500000;12;01/02/2025")
+
+    records = _read_records([empty, full])
+
+    assert [record.cedula for record in records] == ["1000001"]
+
+
+def test_all_reports_empty_is_an_error(tmp_path):
+    with pytest.raises(TransformError):
+        _read_records([_report(tmp_path / "a.csv"), _report(tmp_path / "b.csv")])
+
+
+@pytest.mark.parametrize("xlsx_engine", ["openpyxl", "xml"])
+def test_csv_and_xlsx_read_decimal_amounts_alike(tmp_path, xlsx_engine):
+    csv_path = _report(tmp_path / "desembolsos.csv", "1000001;1500000.00;12;01/02/2025")
+    workbook = Workbook()
+    workbook.active.append(HEADER.strip().split(";"))
+    workbook.active.append(["1000001", 1500000.0, 12, "01/02/2025"])
+    xlsx_path = tmp_path / "desembolsos.xlsx"
+    workbook.save(xlsx_path)
+
+    from_csv = _read_records(csv_path, xlsx_engine)
+    from_xlsx = _read_records(xlsx_path, xlsx_engine)
+
+    assert from_csv == from_xlsx
+    assert from_csv[0].monto == "1500000"
+
+
+def test_job_stems_differ_for_types_with_the_same_slug(make_config):
+    config = make_config(
+        PORTAL_REPORT_JOBS_JSON=json.dumps(
+            [{"type": "Desembolsos A", "from": "2026-09-01"}, {"type": "desembolsos-a", "from": "2026-09-01"}]
+        )
+    )
+    run_ctx: RunContext = config.run_context
+
+    stems = [job_stem(job, run_ctx, index) for index, job in enumerate(config.portal_report_jobs)]
+
+    assert len(set(stems)) == 2
+
+
+def test_duplicated_report_jobs_are_rejected(make_config):
+    job = {"type": "Desembolsos", "from": "2026-09-01", "to": "2026-09-03"}
+
+    with pytest.raises(ValueError, match="duplicated report job"):
+        make_config(PORTAL_REPORT_JOBS_JSON=json.dumps([job, job]))